@@ -0,0 +1,190 @@
+# benchmark.py
+# Headless benchmarks for the data and render paths, on synthetic registries
+# run -
+# python benchmark.py [--sizes 1k 100k 1M] [--out results.json]
+# python benchmark.py --diff before.json after.json
+#
+# Each size runs in a fresh interpreter so caches and peak memory start clean.
+# Results are JSON with sorted keys: commit them, diff them, or use --diff.
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bench")
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "team2.py")
+SIZES = ["1k", "100k", "1M"]
+LOOKUPS = 1000
+RERUNS = 5
+SLOWER = 1.10  # --diff flags metrics that got more than 10% worse
+
+
+def _timed(fn, repeat=1):
+    """(median seconds, last result) over `repeat` calls"""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def run_size(path):
+    """All metrics for one registry file; called in a child process with DASHBOARD_DATA=path"""
+    import numpy as np
+    import pandas as pd
+    from streamlit.testing.v1 import AppTest
+
+    import data_loader
+    from cohort import SurgeryDates, build_cube, rows_in_range
+    from patient_finder import PatientFinder
+    from patient_index import PatientIndex
+    from risk_engine import RiskScores
+    from terms import TermIndex
+    from view_model import ViewTable
+    from warmup import start_warmup
+
+    m = {}
+    # Full script first, while every cache is cold: what the first visitor waits for
+    # (the first paint), then until the background warmup has built everything else
+    at = AppTest.from_file(APP, default_timeout=3600)
+    started = time.perf_counter()
+    m["app_first_run_s"], _ = _timed(at.run)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    start_warmup(data_loader.load_patients(), started).wait()  # the app's own warmup
+    m["app_fully_ready_s"] = time.perf_counter() - started
+    m["app_rerun_s"], _ = _timed(at.run, RERUNS)
+    at.switch_page("pages/1_Cohort_Overview.py")
+    m["cohort_page_first_run_s"], _ = _timed(at.run)
+    m["cohort_page_rerun_s"], _ = _timed(at.run, RERUNS)
+
+    # Data path, stage by stage
+    m["load_csv_s"], (df, _) = _timed(lambda: data_loader._load_from_csv(path))
+    raw = pd.read_csv(path, usecols=lambda c: c in data_loader.DATE_COLUMNS, dtype=str)
+    m["date_parse_s"], _ = _timed(lambda: [data_loader.parse_dates(raw[c]) for c in raw.columns])
+    snap = os.path.join(BENCH_DIR, "stage.feather")
+    m["snapshot_build_s"], _ = _timed(lambda: data_loader.build_snapshot(path, "bench", snap))
+    m["load_snapshot_s"], df = _timed(lambda: data_loader.read_snapshot(snap), 3)
+    m["load_stream_s"], _ = _timed(lambda: data_loader._load_streaming(path))
+    m["prep_index_s"], index = _timed(lambda: PatientIndex(df))
+    m["prep_views_s"], views = _timed(lambda: ViewTable(df))
+    m["prep_finder_s"], finder = _timed(lambda: PatientFinder(df, index))
+    m["risk_scoring_s"], risk = _timed(lambda: RiskScores(df), 3)
+    m["cohort_cube_s"], _ = _timed(lambda: build_cube(df, risk.scores), 3)
+    m["term_index_s"], terms = _timed(lambda: TermIndex(df))
+    top = list(terms.counts().index[:4])
+    m["term_query_ms"], _ = _timed(lambda: terms.match(top[:2], top[2:]), 5)
+    m["term_query_ms"] *= 1000
+    data = data_loader.LoadedData(df=df, version="bench", load_seconds=0.0)
+    m["surgery_index_s"], dates = _timed(lambda: SurgeryDates(df))
+    data.derived("surgery_dates", lambda d: dates)
+    dated = dates.dates[dates.dated_from:]
+    if len(dated):
+        # The middle half of the surgery dates, as the cohort page's date filter asks for it
+        start, end = (pd.Timestamp(dated[len(dated) // 4]), pd.Timestamp(dated[3 * len(dated) // 4]))
+        m["date_range_ms"], _ = _timed(lambda: rows_in_range(data, None, start, end, True), 5)
+        m["date_range_ms"] *= 1000
+
+    # Per-interaction costs (medians over many random patients)
+    rng = np.random.default_rng(0)
+    ids = index.ids[rng.integers(0, len(index.ids), LOOKUPS)]
+    lookup, _ = _timed(lambda: [views.view(index.rows(i)[-1]) for i in ids])
+    m["patient_lookup_us"] = lookup / LOOKUPS * 1e6
+    queries = ids[:100]
+    prefix, _ = _timed(lambda: [finder.search(i[:4], prefix=True) for i in queries])
+    contains, _ = _timed(lambda: [finder.search(i[2:5]) for i in queries])
+    m["search_prefix_ms"] = prefix / len(queries) * 1000
+    m["search_contains_ms"] = contains / len(queries) * 1000
+    m["rows"] = len(df)
+    m["peak_rss_mb"] = data_loader._peak_rss_mb()
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in m.items()}
+
+
+def registry(size):
+    """Synthetic export for `size`, generated once and reused across runs"""
+    from synthetic_registry import parse_size, write_csv
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f"registry_{size}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {size} rows -> {path}", file=sys.stderr)
+        write_csv(path + ".tmp", parse_size(size))
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(sizes):
+    import pandas as pd
+    import streamlit as st
+    results = {}
+    for size in sizes:
+        path = registry(size)
+        env = dict(os.environ, DASHBOARD_DATA=path, DASHBOARD_LOADER="snapshot")
+        # Snapshot up to date first: the cold app run then measures a server restart,
+        # not a snapshot build (that one is timed separately)
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(APP), "data_loader.py"), path],
+                       env=env, check=True, stdout=subprocess.DEVNULL)
+        out = subprocess.run([sys.executable, __file__, "--run", path], env=env, check=True,
+                             stdout=subprocess.PIPE, text=True).stdout
+        results[size] = json.loads(out.strip().splitlines()[-1])
+        print(f"{size}: {results[size]}", file=sys.stderr)
+    return {
+        "meta": {
+            "commit": _commit(),
+            "date": dt.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "streamlit": st.__version__,
+            "machine": f"{platform.machine()} x{os.cpu_count()}",
+        },
+        "results": results,
+    }
+
+
+def diff(before, after):
+    """Side-by-side table of two result files; lower is better for every timing"""
+    lines = [f"{'size':<6} {'metric':<26} {'before':>12} {'after':>12} {'ratio':>7}"]
+    for size, metrics in after["results"].items():
+        old = before["results"].get(size, {})
+        for name, value in metrics.items():
+            if name not in old or name == "rows":
+                continue
+            ratio = value / old[name] if old[name] else float("inf")
+            flag = "  slower" if ratio > SLOWER else ""
+            lines.append(f"{size:<6} {name:<26} {old[name]:>12.4f} {value:>12.4f} {ratio:>6.2f}x{flag}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark load, prep, lookup, scoring and full-script runs")
+    parser.add_argument("--sizes", nargs="+", default=SIZES)
+    parser.add_argument("--out", help="results file (default .bench/results-<commit>.json)")
+    parser.add_argument("--diff", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_size(args.run), sort_keys=True))
+    elif args.diff:
+        with open(args.diff[0]) as a, open(args.diff[1]) as b:
+            print(diff(json.load(a), json.load(b)))
+    else:
+        report = run_suite(args.sizes)
+        out = args.out or os.path.join(BENCH_DIR, f"results-{report['meta']['commit']}.json")
+        with open(out, "w") as fh:
+            json.dump(report, fh, indent=1, sort_keys=True)
+            fh.write("\n")
+        print(f"Wrote {out}")
@@ -0,0 +1,271 @@
+# cohort.py
+# Pre-aggregated cohort summaries for the Cohort Overview page
+import math
+
+import numpy as np
+import pandas as pd
+
+from data_loader import register_patcher
+from risk_engine import RiskScores, get_risk_scores
+
+DIMENSIONS = ["Gender_label", "Race_label", "Ethnicity_label", "Premature_label"]
+# Complication name -> column; flags are 0/1, sepsis counts when a sepsis date is recorded
+COMPLICATIONS = {
+    "CLABSI": "CompCLABSI",
+    "UTI": "CompUTI",
+    "Wound infection": "CompWoundInf",
+    "Sepsis": "CompSepsisDt",
+}
+RISK_BIN_WIDTH = 0.5
+# Label -> interval column (data_loader.INTERVAL_COLUMNS), in the order events follow surgery
+INTERVALS = {
+    "Surgery to bleed": "DaysToBleed",
+    "Surgery to sepsis": "DaysToSepsis",
+    "Surgery to discharge": "DaysToDischarge",
+}
+INTERVAL_BINS = 60  # bars per interval histogram
+MAX_POINTS = 2000
+CUBE_KEYS = ["SurgeryMonth", *DIMENSIONS, "RiskBin"]
+
+
+def _cube_rows(df, scores):
+    """One row per encounter: the cube keys plus 0/1 measures.
+
+    Measures count surgeries (encounters), so a repeat patient counts once per
+    surgery; `count_patients` gives distinct patients for a set of rows.
+    """
+    if "CardSurgDt" in df.columns:
+        month = df["CardSurgDt"].dt.to_period("M").dt.to_timestamp()
+    else:
+        month = pd.Series(pd.NaT, index=df.index)
+    frame = pd.DataFrame({"SurgeryMonth": month.to_numpy()})
+    for col in DIMENSIONS:
+        frame[col] = df[col].to_numpy()
+    frame["RiskBin"] = np.floor(scores / RISK_BIN_WIDTH) * RISK_BIN_WIDTH
+    frame["Surgeries"] = 1
+    frame["Premature"] = (df["Premature"] == 1).fillna(False).to_numpy(dtype=int) if "Premature" in df.columns else 0
+    for name, col in COMPLICATIONS.items():
+        if col not in df.columns:
+            frame[name] = 0
+        elif col.endswith("Dt"):
+            frame[name] = df[col].notna().to_numpy(dtype=int)
+        else:
+            frame[name] = (df[col] == 1).fillna(False).to_numpy(dtype=int)
+    return frame
+
+
+def build_cube(df, scores):
+    """Group the registry once by surgery month x demographic labels x risk bin.
+
+    Every cohort chart is a further (tiny) group-by over this cube, so changing a
+    filter never touches the raw frame.
+    """
+    return _cube_rows(df, scores).groupby(CUBE_KEYS, observed=True, dropna=False, sort=True).sum().reset_index()
+
+
+def get_cohort_cube(data):
+    return data.derived("cohort_cube", lambda d: build_cube(d.df, get_risk_scores(d).scores))
+
+
+def patch_cube(cube, old, new, batch):
+    """Subtract the replaced rows' cells and add the changed rows' cells - the cube
+    stays exact without re-grouping the registry"""
+    removed = build_cube(batch.old_rows, RiskScores(batch.old_rows).scores)
+    measures = removed.columns.difference(CUBE_KEYS)
+    removed[measures] = -removed[measures]
+    added = build_cube(batch.rows, get_risk_scores(new).scores[batch.changed])
+    merged = pd.concat([cube, removed, added], ignore_index=True)
+    merged = merged.groupby(CUBE_KEYS, observed=True, dropna=False, sort=True).sum().reset_index()
+    return merged[merged["Surgeries"] != 0].reset_index(drop=True)
+
+
+register_patcher("cohort_cube", patch_cube)
+
+
+class CubeCells:
+    """Which cube cell every row falls into, so the cube of any row subset (e.g. a
+    term query) is a handful of bincounts instead of a new group-by"""
+    __slots__ = ("keys", "cells", "measures")
+
+    def __init__(self, df, scores):
+        frame = _cube_rows(df, scores)
+        grouped = frame.groupby(CUBE_KEYS, observed=True, dropna=False, sort=True)
+        self.cells = grouped.ngroup().to_numpy()
+        self.keys = grouped.size().reset_index()[CUBE_KEYS]
+        self.measures = {col: frame[col].to_numpy(dtype=np.int32) for col in frame.columns if col not in CUBE_KEYS}
+
+    def cube(self, rows):
+        """Same layout as `build_cube`, over `rows` only"""
+        cells = self.cells[rows]
+        cube = self.keys.copy()
+        for col, values in self.measures.items():
+            cube[col] = np.bincount(cells, weights=values[rows], minlength=len(cube)).astype(np.int64)
+        return cube[cube["Surgeries"] > 0].reset_index(drop=True)
+
+
+def get_cube_cells(data):
+    # No patcher: only built once a subset is asked for, and rebuilt after an ingest
+    return data.derived("cube_cells", lambda d: CubeCells(d.df, get_risk_scores(d).scores))
+
+
+def slice_cube(cube, start=None, end=None, include_undated=True):
+    """Cube rows whose surgery month falls in [start, end]"""
+    month = cube["SurgeryMonth"]
+    mask = month.notna()
+    if start is not None:
+        mask &= month >= pd.Timestamp(start).to_period("M").to_timestamp()
+    if end is not None:
+        mask &= month <= pd.Timestamp(end)
+    if include_undated:
+        mask |= month.isna()
+    return cube[mask]
+
+
+NAT_NS = np.iinfo(np.int64).min  # NaT as int64, below every real date
+
+
+def _month_start_ns(when, months_later=0):
+    return (pd.Timestamp(when).to_period("M") + months_later).to_timestamp().value
+
+
+class SurgeryDates:
+    """Rows sorted by surgery date: a date range is two binary searches and a slice.
+
+    Undated rows (NaT sorts first as int64) sit before `dated_from`.
+    """
+    __slots__ = ("order", "dates", "dated_from")
+
+    def __init__(self, df):
+        if "CardSurgDt" in df.columns:
+            ns = df["CardSurgDt"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        else:
+            ns = np.full(len(df), NAT_NS, dtype=np.int64)
+        self.order = np.argsort(ns, kind="stable")
+        self.dates = ns[self.order]
+        self.dated_from = int(np.searchsorted(self.dates, NAT_NS, side="right"))
+
+    def bounds(self, start=None, end=None):
+        """[lo, hi) in ns for whole months start..end, as `slice_cube` filters the cube"""
+        lo = NAT_NS + 1 if start is None else _month_start_ns(start)
+        hi = np.iinfo(np.int64).max if end is None else _month_start_ns(end, months_later=1)
+        return lo, hi
+
+    def rows(self, start=None, end=None, include_undated=False):
+        """Rows in the range (in surgery date order), plus the undated ones if asked for"""
+        lo, hi = np.searchsorted(self.dates, self.bounds(start, end))
+        lo = max(int(lo), self.dated_from)
+        selected = self.order[lo:max(int(hi), lo)]
+        if include_undated:
+            selected = np.concatenate([self.order[:self.dated_from], selected])
+        return selected
+
+
+def get_surgery_dates(data):
+    # No patcher: an argsort, rebuilt on first use after an ingest
+    return data.derived("surgery_dates", lambda d: SurgeryDates(d.df))
+
+
+def rows_in_range(data, rows=None, start=None, end=None, include_undated=True):
+    """Sorted subset of `rows` (default: every row) that `slice_cube` with the same
+    arguments would keep.
+
+    The whole registry is a range scan over SurgeryDates; a smaller subset (e.g. a
+    term query) is checked against the same bounds row by row.
+    """
+    n = len(data.df)
+    if start is None and end is None and include_undated:
+        return np.arange(n) if rows is None else rows
+    dates = get_surgery_dates(data)
+    if rows is None:
+        keep = np.zeros(n, dtype=bool)
+        keep[dates.rows(start, end, include_undated)] = True
+        return np.flatnonzero(keep)
+    if "CardSurgDt" not in data.df.columns:
+        return rows if include_undated else rows[:0]
+    ns = data.df["CardSurgDt"].to_numpy(dtype="datetime64[ns]").view(np.int64)[rows]
+    lo, hi = dates.bounds(start, end)
+    mask = (ns >= lo) & (ns < hi)
+    if include_undated:
+        mask = mask | (ns == NAT_NS)
+    return rows[mask]
+
+
+def get_patient_codes(data):
+    # No patcher: one factorize, rebuilt on first use after an ingest
+    return data.derived("patient_codes", lambda d: pd.factorize(d.df["PatID"])[0].astype(np.int32))
+
+
+def count_patients(data, rows):
+    """Distinct patients among `rows`"""
+    codes = get_patient_codes(data)
+    seen = np.zeros(int(codes.max()) + 1 if len(codes) else 0, dtype=bool)
+    seen[codes[rows]] = True
+    return int(np.count_nonzero(seen))
+
+
+def breakdown(cube_slice, dim):
+    """Surgery counts and complication rates (per surgery) per value of one dimension"""
+    measures = ["Surgeries", "Premature", *COMPLICATIONS]
+    out = cube_slice.groupby(dim, observed=True)[measures].sum()
+    for col in measures[1:]:
+        out[f"{col} rate"] = out[col] / out["Surgeries"].where(out["Surgeries"] > 0)
+    return out.reset_index()
+
+
+def risk_distribution(cube_slice):
+    return cube_slice.groupby("RiskBin")["Surgeries"].sum().reset_index()
+
+
+def monthly_trend(cube_slice, by=None):
+    keys = ["SurgeryMonth"] + ([by] if by else [])
+    return cube_slice.dropna(subset=["SurgeryMonth"]).groupby(keys, observed=True)["Surgeries"].sum().reset_index()
+
+
+def downsample(frame, max_points=MAX_POINTS, sum_cols=("Surgeries",), group=None):
+    """Bucket consecutive rows so a chart never ships more than `max_points` points.
+
+    Count columns are summed per bucket (totals are preserved); other columns keep
+    the bucket's first value, e.g. the first month of the bucket. With `group`, each
+    series is bucketed separately and shares the point budget.
+    """
+    if len(frame) <= max_points:
+        return frame
+    if group:
+        parts = [part for _, part in frame.groupby(group, observed=True)]
+        budget = max(1, max_points // len(parts))
+        return pd.concat([downsample(part, budget, sum_cols) for part in parts], ignore_index=True)
+    bucket = np.arange(len(frame)) // math.ceil(len(frame) / max_points)
+    agg = {col: ("sum" if col in sum_cols else "first") for col in frame.columns}
+    return frame.groupby(bucket).agg(agg).reset_index(drop=True)
+
+
+#__________________Event intervals__________________
+
+def _interval_values(df, rows, col):
+    """Recorded days for `rows` (default all rows); rows missing either date are dropped"""
+    values = df[col].to_numpy(dtype=np.float32, na_value=np.nan) if col in df.columns else np.empty(0, np.float32)
+    if rows is not None and len(values):
+        values = values[rows]
+    return values[~np.isnan(values)]
+
+
+def interval_summary(df, rows=None):
+    """Per interval: surgeries with both dates recorded and the median / quartiles in days"""
+    records = []
+    for label, col in INTERVALS.items():
+        values = _interval_values(df, rows, col)
+        q1, median, q3 = np.percentile(values, [25, 50, 75]) if len(values) else (np.nan,) * 3
+        records.append({"Interval": label, "Surgeries": len(values), "Median days": median,
+                        "25th percentile": q1, "75th percentile": q3})
+    return pd.DataFrame(records)
+
+
+def interval_histogram(df, rows, col, max_bins=INTERVAL_BINS):
+    """Surgeries per bin of whole days (bin width grows with the range), ready to plot"""
+    values = _interval_values(df, rows, col)
+    if not len(values):
+        return pd.DataFrame({"Days": [], "Surgeries": []})
+    low = math.floor(values.min())
+    width = max(1, math.ceil((math.floor(values.max()) - low + 1) / max_bins))
+    counts = np.bincount(((np.floor(values) - low) // width).astype(np.int64))
+    return pd.DataFrame({"Days": low + width * np.arange(len(counts)), "Surgeries": counts})
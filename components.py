@@ -0,0 +1,254 @@
+# components.py
+# SVG/HTML widgets for the dashboard (no blank lines inside the HTML - markdown
+# would end the HTML block there). Each is memoized on its (quantized) inputs,
+# so re-rendering the same patient or score costs a dict lookup.
+import functools
+import html
+import math
+
+import numpy as np
+import pandas as pd
+
+
+#__________________Risk gauge__________________
+
+def gauge_svg(score_0_to_10: float, large: bool = False) -> str:
+    """Gauge SVG - cached per 0.1 step of the score"""
+    return _gauge_svg(round(max(0.0, min(10.0, float(score_0_to_10))), 1), large)
+
+
+@functools.lru_cache(maxsize=256)
+def _gauge_svg(score: float, large: bool) -> str:
+    angle_deg = 180 - score * 18.0
+    if large:
+        cx, cy, r = 200, 180, 100
+        x2 = cx + r * math.cos(math.radians(angle_deg))
+        y2 = cy - r * math.sin(math.radians(angle_deg))
+        return f"""
+        <svg width="400" height="220" viewBox="0 0 400 220">
+          <path d="M30 180 A170 170 0 0 1 370 180" fill="none" stroke="#FFE0E0" stroke-width="40" />
+          <path d="M30 180 A170 170 0 0 1 250 50" fill="none" stroke="#E15259" stroke-width="40" stroke-linecap="round"/>
+          <path d="M250 50 A170 170 0 0 1 370 180" fill="none" stroke="#9DB7FF" stroke-width="40" stroke-linecap="round"/>
+          <line x1="{cx}" y1="{cy}" x2="{x2:.1f}" y2="{y2:.1f}" stroke="#1B1E28" stroke-width="8" stroke-linecap="round"/>
+          <circle cx="{cx}" cy="{cy}" r="14" fill="#1B1E28"/>
+        </svg>
+        """
+    cx, cy, r = 130, 120, 65
+    x2 = cx + r * math.cos(math.radians(angle_deg))
+    y2 = cy - r * math.sin(math.radians(angle_deg))
+    return f"""
+        <svg width="260" height="140" viewBox="0 0 260 140">
+          <path d="M20 120 A110 110 0 0 1 240 120" fill="none" stroke="#FFE0E0" stroke-width="26" />
+          <path d="M20 120 A110 110 0 0 1 160 35" fill="none" stroke="#E15259" stroke-width="26" stroke-linecap="round"/>
+          <path d="M160 35 A110 110 0 0 1 240 120" fill="none" stroke="#9DB7FF" stroke-width="26" stroke-linecap="round"/>
+          <line x1="{cx}" y1="{cy}" x2="{x2:.1f}" y2="{y2:.1f}" stroke="#1B1E28" stroke-width="6" stroke-linecap="round"/>
+          <circle cx="{cx}" cy="{cy}" r="10" fill="#1B1E28"/>
+        </svg>
+        """
+
+
+#__________________Shunt size scale__________________
+
+# Tick positions (x) for 0..4 mm - the scale is stretched between 0 and 3 mm
+SHUNT_TICKS_MM = [0, 1, 2, 3, 4]
+SHUNT_TICKS_X = [20, 95, 170, 245, 280]
+
+
+def shunt_scale_html(size_mm) -> str:
+    """Shunt size card with the marker placed at `size_mm` (cached per 0.1 mm)"""
+    if size_mm is None or pd.isna(size_mm):
+        return _shunt_scale_html(None)
+    return _shunt_scale_html(round(float(size_mm), 1))
+
+
+@functools.lru_cache(maxsize=128)
+def _shunt_scale_html(size_mm) -> str:
+    ticks = "".join(
+        f'<line x1="{x}" y1="38" x2="{x}" y2="52" stroke="#111" stroke-width="2"/><text x="{x}" y="65">{mm}</text>'
+        for mm, x in zip(SHUNT_TICKS_MM, SHUNT_TICKS_X)
+    )
+    marker = ""
+    label = "N/A"
+    if size_mm is not None:
+        x = float(np.interp(size_mm, SHUNT_TICKS_MM, SHUNT_TICKS_X))
+        marker = (f'<polygon points="{x:.1f},18 {x + 6:.1f},30 {x - 6:.1f},30" fill="#111"/>'
+                  f'<line x1="{x:.1f}" y1="30" x2="{x:.1f}" y2="46" stroke="#111" stroke-width="2"/>')
+        label = f"{size_mm:g} MM"
+    return f"""
+        <div style="margin-top:10px;">
+          <div><b>Shunt Size</b></div>
+          <div class="card" style="border-radius:14px;">
+            <svg width="300" height="70" viewBox="0 0 300 70">
+              <line x1="20" y1="45" x2="280" y2="45" stroke="#111" stroke-width="2"/>
+              <g fill="#111" font-size="12" text-anchor="middle">{ticks}</g>{marker}
+            </svg>
+            <div class="center"><span class="red">{label}</span></div>
+          </div>
+        </div>
+        """
+
+
+#__________________Vertical timeline__________________
+
+TIMELINE_TOP = 40      # px offset of the latest event
+TIMELINE_BOTTOM = 420  # px offset of the earliest event
+TIMELINE_MIN_GAP = 44  # keep labels from overlapping when dates are close
+
+
+def timeline_offsets(times_ns):
+    """Pixel offsets proportional to the dates (latest at the top), spaced at least MIN_GAP apart"""
+    values = np.array(times_ns, dtype=np.float64)
+    span = values.max() - values.min()
+    if span > 0:
+        offsets = TIMELINE_BOTTOM - (values - values.min()) / span * (TIMELINE_BOTTOM - TIMELINE_TOP)
+    else:
+        offsets = np.full(len(values), float(TIMELINE_BOTTOM))
+    order = np.argsort(-offsets, kind="stable")  # bottom (earliest) first
+    placed = offsets.copy()
+    for prev, cur in zip(order, order[1:]):
+        placed[cur] = min(placed[cur], placed[prev] - TIMELINE_MIN_GAP)
+    # If the spacing pushed labels past the top, push back down from the top
+    overflow = TIMELINE_TOP - placed.min()
+    if overflow > 0:
+        placed += overflow
+    return placed
+
+
+@functools.lru_cache(maxsize=256)
+def timeline_html(events) -> str:
+    """Vertical timeline; `events` is a tuple of (label, date text, ns since epoch or None).
+
+    Dated events sit at heights proportional to their dates; undated ones are
+    listed underneath as not recorded.
+    """
+    dated = [(label, text, ns) for label, text, ns in events if ns is not None]
+    undated = [label for label, _, ns in events if ns is None]
+    ticks = ""
+    if dated:
+        offsets = timeline_offsets([ns for _, _, ns in dated])
+        ticks = "".join(
+            f'<div class="tick" style="top:{top:.0f}px;"><div class="dot"></div>'
+            f'<div class="lbl"><b>{label}</b><br>{text}</div></div>'
+            for (label, text, _), top in zip(dated, offsets)
+        )
+    missing = ""
+    if undated:
+        missing = f'<div class="center" style="font-size:13px;color:#555;">Not recorded: {", ".join(undated)}</div>'
+    return f"""
+    <div class="card">
+        <div class="center" style="font-weight:900;">Vertical<br>Timeline of<br>Events</div>
+        <div class="timelinewrap">
+            <div class="vert">
+                <div class="hbot"></div>{ticks}
+            </div>
+        </div>{missing}
+    </div>
+    """
+
+
+@functools.lru_cache(maxsize=256)
+def intervals_html(intervals) -> str:
+    """Days from surgery to each event, under the timeline; `intervals` is PatientView.intervals"""
+    rows = "".join(f'<div class="field"><span>{label}</span><b>{text}</b></div>' for label, text in intervals)
+    return f'<div class="card"><div class="center" style="font-weight:900;">Time from surgery</div>{rows}</div>'
+
+
+#__________________Side-by-side comparison__________________
+
+# (row label, PatientView field), top to bottom
+COMPARE_FIELDS = [
+    ("Sex", "sex"),
+    ("Premature", "premature"),
+    ("Age at surgery (days)", "age_at_surgery"),
+    ("Surgery", "surgery_date"),
+    ("CLABSI", "clabsi"),
+    ("UTI", "uti"),
+    ("Wound infection", "wound_infection"),
+    ("Sepsis", "sepsis_date"),
+    ("Post-op bleed", "bleed_date"),
+    ("Cardiac arrest", "cardiac_arrest_date"),
+    ("Discharge", "discharge_date"),
+    ("Surgery to bleed", "days_to_bleed"),
+    ("Surgery to sepsis", "days_to_sepsis"),
+    ("Surgery to discharge", "days_to_discharge"),
+    ("Syndrome present", "syndrome_label"),
+    ("Abnormalities", "abnormalities"),
+]
+
+
+@functools.lru_cache(maxsize=64)
+def comparison_html(patients) -> str:
+    """One aligned table for several encounters, emitted as a single element.
+
+    `patients` is a tuple of (PatientView, risk score, risk factor names). Gauges and
+    timelines come from the memoized builders above, so N patients cost about one render.
+    """
+    def row(label, cells):
+        return f'<tr><th>{label}</th>{"".join(f"<td>{c}</td>" for c in cells)}</tr>'
+
+    head = "".join(f"<th>{html.escape(view.pat_id)}</th>" for view, _, _ in patients)
+    rows = [
+        row("Risk", (f'{gauge_svg(score)}<div class="center red">{score:.1f} / 10</div>' for _, score, _ in patients)),
+        row("Risk factors", (html.escape(", ".join(factors) or "None recorded") for _, _, factors in patients)),
+        *(row(label, (html.escape(str(getattr(view, field))) for view, _, _ in patients)) for label, field in COMPARE_FIELDS),
+        row("Timeline", (timeline_html(view.timeline_events) for view, _, _ in patients)),
+    ]
+    return (f'<div class="comparewrap"><table class="compare"><thead><tr><th></th>{head}</tr></thead>'
+            f'<tbody>{"".join(rows)}</tbody></table></div>')
+
+
+#__________________Printable summary card__________________
+
+# (label, PatientView field) of the Patient Info panel
+SUMMARY_INFO_FIELDS = [
+    ("Sex", "sex"),
+    ("Race", "race"),
+    ("Ethnicity", "ethnicity"),
+    ("Date of Birth", "dob"),
+    ("Age at Surgery (days)", "age_at_surgery"),
+]
+
+
+def summary_card_html(view, score, factors) -> str:
+    """Static copy of the dashboard panels for one encounter, for printing (export.py).
+
+    Risk gauge, Patient Info, the Cardiac/Septic event boxes, abnormalities and the
+    timeline in one element that carries its own theme class (theme.get_print_css).
+    """
+    def esc(value):
+        return html.escape(str(value))
+
+    theme = "theme-boy" if view.sex == "Boy" else "theme-girl"
+    premature = '<span class="pill-blue">Premature</span>' if view.premature == "Yes" else ""
+    icons = (f'<div class="iconrow"><div class="iconbox{" sel" if view.sex == "Girl" else ""}">♀️</div>'
+             f'<div class="iconbox2">👶</div><div class="iconbox3{" sel" if view.sex == "Boy" else ""}">♂️</div></div>')
+    fields = "".join(f'<div class="field"><span>{label}</span><b>{esc(getattr(view, name))}</b></div>'
+                     for label, name in SUMMARY_INFO_FIELDS)
+    info = (f'<div class="pinkpanel"><div class="headerpink">Patient Info</div>'
+            f'<div style="padding:6px 10px;">{premature}</div>{icons}'
+            f'<div class="card">{fields}{shunt_scale_html(view.shunt_size).strip()}</div></div>')
+    events = (
+        f'<div class="eventtitle">Cardiac Event</div><div class="eventbox">'
+        f'<div class="center" style="font-weight:900;">💔 &nbsp; Date & Time - {esc(view.cardiac_arrest_date)}</div>'
+        f'<div style="height:1px;background:#111;margin:8px 4px;"></div>'
+        f'<div class="center" style="font-weight:900;">sudden Hypoxemia Notes - </div>'
+        f'<div class="center" style="font-style:italic;">{esc(view.sh_notes)}</div>'
+        f'<div class="center" style="font-weight:900;margin-top:6px;">Cardiac Anatomy Notes - </div>'
+        f'<div class="center" style="font-style:italic;">{esc(view.cardiac_notes)}</div></div>'
+        f'<div class="eventtitle">Septic Event</div><div class="eventbox">'
+        f'<div class="center" style="font-weight:900;">🚩 &nbsp; Date & Time - {esc(view.sepsis_date)}</div>'
+        f'<div style="height:1px;background:#111;margin:8px 4px;"></div>'
+        f'<div class="field"><span>CompCLABSI</span><b>{esc(view.clabsi)}</b></div>'
+        f'<div class="field"><span>CompUTI</span><b>{esc(view.uti)}</b></div>'
+        f'<div class="field"><span>CompWoundInf</span><b>{esc(view.wound_infection)}</b></div></div>'
+        f'<div class="card" style="margin-top:12px;">'
+        f'<div style="text-decoration:underline;font-weight:900;">Syndrome Present: {esc(view.syndrome_label)}</div>'
+        f'Fetal Drug Exposure: {esc(view.fetal_drug_exposure)}<br>Abnormalities: {esc(view.abnormalities)}</div>'
+    )
+    risk = (f'<div class="summaryrisk">{gauge_svg(score).strip()}<div><div class="red" style="font-size:32px;">'
+            f'{score:.1f} / 10</div><div>Risk factors: {esc(", ".join(factors) or "None recorded")}</div></div></div>')
+    timeline = "".join(line.strip() for line in timeline_html(view.timeline_events).splitlines())
+    timeline += intervals_html(view.intervals)
+    return (f'<section class="summary {theme}"><h2>Patient {esc(view.pat_id)}'
+            f'<small>Surgery {esc(view.surgery_date)}</small></h2>{risk}'
+            f'<div class="summarycols"><div>{info}</div><div>{events}</div><div>{timeline}</div></div></section>')
@@ -0,0 +1,625 @@
+# data_loader.py
+# Typed, cached loading of the patient registry used by team2.py
+import argparse
+import copy
+import csv
+import dataclasses
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = os.environ.get("DASHBOARD_DATA", "MS_copy_DeID_Complete.csv")
+# "snapshot" (default) reads a prepared Feather copy of the CSV, "csv" always parses the CSV,
+# "stream" parses the CSV in chunks and leaves the free-text columns on disk (see LazyText),
+# "shared" attaches to a frame + indexes published once for several server processes (shared.py)
+LOADER_MODE = os.environ.get("DASHBOARD_LOADER", "snapshot")
+
+#__________________Schema__________________
+
+# Integer codes and 0/1 flags - nullable so blanks stay missing instead of turning the column into floats
+INT_COLUMNS = {
+    "Gender": "Int8",
+    "Race": "Int8",
+    "Ethnicity": "Int8",
+    "Premature": "Int8",
+    "CompCLABSI": "Int8",
+    "CompUTI": "Int8",
+    "CompWoundInf": "Int8",
+    "AgeAtSurgeryDays": "Int32",
+}
+FLOAT_COLUMNS = {"Shunt Size": "float32"}
+DATE_COLUMNS = [
+    "DOB",
+    "CardSurgDt",
+    "CompReopBleedDtTm",
+    "CompSepsisDt",
+    "CardArrestDtTm",
+    "End of Interstage/BTTS Period/Admission",
+]
+# Formats the registry export writes, tried in order (see parse_dates)
+DATE_FORMATS = ["%m/%d/%Y", "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S"]
+# Columns the dashboard can run without (a warning is shown instead)
+OPTIONAL_COLUMNS = ("SyndromeTerm",)
+DISCHARGE_COLUMN = "End of Interstage/BTTS Period/Admission"
+SURGERY_COLUMN = "CardSurgDt"
+# Interval column -> event date; days from surgery to the event, NaN when either date is missing
+INTERVAL_COLUMNS = {
+    "DaysToBleed": "CompReopBleedDtTm",
+    "DaysToSepsis": "CompSepsisDt",
+    "DaysToDischarge": DISCHARGE_COLUMN,
+}
+
+GENDER_MAP = {0: "Girl", 1: "Boy"}
+PREMATURE_MAP = {0: "No", 1: "Yes"}
+RACE_MAP = {1: 'White', 2: 'Black', 3: 'Asian', 4: 'American Indian', 5: 'Native Hawaiian', 6: 'Other Pacific Islander'}
+ETHNICITY_MAP = {0: 'Non-Hispanic', 1: 'Hispanic/Latino', 2: 'Other/Unknown'}
+# Free-text abnormality columns and the placeholder values that mean "nothing recorded"
+ABNORMALITY_COLUMNS = ["NCAA1", "NCAA2", "NCAA3", "NCAA4", "NCAA5", "ChromAbTerm"]
+ABSENT_TERMS = {"NULL", "—", "", "0", 0, "No chromosomal abnormality identified"}
+NO_SYNDROME = "No syndromic abnormality identified"
+FETAL_DRUG_EXPOSURE = "Fetal drug exposure"
+MISSING_COLUMN = "Column Not Found"  # filled into an absent OPTIONAL_COLUMNS column
+# Placeholders that mean "nothing recorded", compared after normalization (see normalize_term)
+NOT_A_TERM = {str(t).casefold() for t in ABSENT_TERMS} | {NO_SYNDROME.casefold(), MISSING_COLUMN.casefold(), "nan"}
+
+# Fixed categories so every load (and every chunk of a load) ends up with identical dtypes
+GENDER_DTYPE = pd.CategoricalDtype(["Girl", "Boy", "Unknown"])
+PREMATURE_DTYPE = pd.CategoricalDtype(["No", "Yes", "Unknown"])
+RACE_DTYPE = pd.CategoricalDtype(list(RACE_MAP.values()) + ["Other/Unknown"])
+ETHNICITY_DTYPE = pd.CategoricalDtype(list(ETHNICITY_MAP.values()))
+YES_NO_DTYPE = pd.CategoricalDtype(["No", "Yes"])
+
+# Everything the panels read - the snapshot is opened with only these columns
+DASHBOARD_COLUMNS = [
+    "PatID", "Gender", "Race", "Ethnicity", "Premature", "DOB", "AgeAtSurgeryDays", "Shunt Size",
+    "CardSurgDt", "CompReopBleedDtTm", "CompSepsisDt", "CardArrestDtTm", DISCHARGE_COLUMN,
+    "CompCLABSI", "CompUTI", "CompWoundInf", "SyndromeTerm", "ChromAbTerm",
+    "NCAA1", "NCAA2", "NCAA3", "NCAA4", "NCAA5",
+    "Cardiac Anatomy Notes", "SH Notes",
+    "Gender_label", "Premature_label", "Race_label", "Ethnicity_label",
+    "Syndrome_Present_bool", "Fetal_Drug_Exposure_label", *INTERVAL_COLUMNS,
+]
+# Wide free-text columns shown for one patient at a time - the stream loader reads them on demand
+LAZY_COLUMNS = ["Cardiac Anatomy Notes", "SH Notes"]
+STREAM_CHUNK_ROWS = 100_000
+# Free-text columns are always read as text: a delta whose NCAA cells are blank or "0"
+# would otherwise parse them as floats and no longer match the full load (see ingest.py)
+TEXT_COLUMNS = [*ABNORMALITY_COLUMNS, "SyndromeTerm", *LAZY_COLUMNS]
+CSV_DTYPES = {"PatID": str, **{col: str for col in TEXT_COLUMNS}}
+# Bumped when prepare_frame (or a structure shared.py publishes) changes, so older snapshots are rebuilt
+SNAPSHOT_SCHEMA = 7
+
+
+@dataclasses.dataclass(frozen=True)
+class LoadedData:
+    """Prepared patient frame plus the version it was built from.
+
+    Structures derived from the frame (indexes, scores, aggregates) are cached on
+    the object via `derived()`, so they live exactly as long as this data version.
+    """
+    df: pd.DataFrame
+    version: str
+    load_seconds: float
+    missing_columns: tuple = ()
+    deltas: int = 0  # incremental exports applied on top of the source file (see ingest.py)
+    text: object = None  # LazyText for LAZY_COLUMNS when they are not in `df` (stream loader)
+    path: str = ""  # source file; derived structures may persist themselves next to it
+    _derived: dict = dataclasses.field(default_factory=dict, repr=False, compare=False)
+    _building: dict = dataclasses.field(default_factory=dict, repr=False, compare=False)  # name -> lock
+    _lock: object = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def derived(self, name, build):
+        """Return the structure `name`, calling `build(self)` the first time it is asked for.
+
+        One lock per name: a session waits for a structure another thread is building,
+        but never for unrelated ones (see warmup.py).
+        """
+        with self._lock:
+            if name in self._derived:
+                return self._derived[name]
+            building = self._building.setdefault(name, threading.Lock())
+        with building:
+            with self._lock:
+                if name in self._derived:
+                    return self._derived[name]
+            value = build(self)
+            with self._lock:
+                self._derived[name] = value
+            return value
+
+    def is_built(self, name):
+        """Whether `derived(name, ...)` would return without building"""
+        with self._lock:
+            return name in self._derived
+
+    def with_delta(self, df, batch, text=None):
+        """Next data version after a delta: derived structures are patched, not rebuilt.
+
+        Structures without a registered patcher are dropped and rebuilt on next use.
+        `text` replaces the LazyText when the delta carried notes for it. Patching
+        writes updated rows in place (see `grow`), so a session still rendering this
+        version may already see them corrected; appended rows stay invisible to it.
+        """
+        new = LoadedData(df=df, version=f"{self.version.split('+')[0]}+{self.deltas + 1}",
+                         load_seconds=self.load_seconds, missing_columns=self.missing_columns,
+                         deltas=self.deltas + 1, text=self.text if text is None else text, path=self.path)
+        with self._lock:
+            derived = list(self._derived.items())
+        # Dict order is build order, so dependencies (e.g. risk scores for the cube) come first
+        for name, value in derived:
+            if name in PATCHERS:
+                new._derived[name] = PATCHERS[name](value, self, new, batch)
+        return new
+
+
+# name -> patch(old_value, old_data, new_data, batch) returning the value for new_data
+PATCHERS = {}
+
+
+def register_patcher(name, patch):
+    PATCHERS[name] = patch
+
+
+#__________________Growing arrays for deltas__________________
+
+SPARE_ROWS = 0.25  # extra capacity when `grow` has to reallocate
+_buffers = {}  # id(buffer) -> (weakref to it, rows in use) for every buffer `grow` allocated
+
+
+def _own_buffer(values):
+    """The `grow` buffer whose rows in use are exactly `values`, or None"""
+    buf = values.base
+    entry = _buffers.get(id(buf)) if isinstance(buf, np.ndarray) else None
+    if entry is None or entry[0]() is not buf or entry[1] != len(values):
+        return None
+    if values.dtype != buf.dtype or values.strides != buf.strides:
+        return None  # e.g. datetimes viewed as int64 by another structure
+    if values.__array_interface__["data"][0] != buf.__array_interface__["data"][0]:
+        return None
+    return buf
+
+
+def grow(values, extra):
+    """Writable view of `values` followed by the rows of `extra`.
+
+    The result lives in a buffer with rows to spare, so the next call appends
+    into it: only a full buffer, or an array `grow` did not allocate (e.g. a
+    memory-mapped snapshot column), is copied, and appends cost O(len(extra))
+    amortized. Writing rows of the result changes `values` as well.
+    """
+    values = np.asarray(values)
+    n, k = len(values), len(extra)
+    buf = _own_buffer(values)
+    if buf is None or len(buf) < n + k:
+        buf = np.empty((int((n + k) * (1 + SPARE_ROWS)) + 16,) + values.shape[1:], dtype=values.dtype)
+        buf[:n] = values
+    buf[n:n + k] = extra
+    key = id(buf)
+    _buffers[key] = (weakref.ref(buf, lambda _, key=key: _buffers.pop(key, None)), n + k)
+    return buf[:n + k]
+
+
+#__________________Parsing and label derivation__________________
+
+def _label(codes, mapping, dtype, default):
+    return pd.Categorical(codes.map(mapping).fillna(default), dtype=dtype)
+
+
+def normalize_term(value):
+    """Lower-cased, whitespace-collapsed term, or "" for blanks and placeholders"""
+    if value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    key = re.sub(r"\s+", " ", str(value)).strip().casefold()
+    return "" if key in NOT_A_TERM else key
+
+
+def named_terms(values):
+    """True where a term column names an actual term, i.e. normalize_term is not empty"""
+    codes, uniques = pd.factorize(values)
+    named = np.array([normalize_term(v) != "" for v in uniques] + [False], dtype=bool)
+    return named[codes]  # code -1 (missing) picks the trailing False
+
+
+def _in_ns_range(dates):
+    """Mask of datetime64 values (any unit) that datetime64[ns] can hold.
+
+    Casting anything outside 1677-2262 to [ns] wraps around silently instead of failing.
+    """
+    lo = np.datetime64(pd.Timestamp.min.ceil("s")).astype(dates.dtype)
+    hi = np.datetime64(pd.Timestamp.max.floor("s")).astype(dates.dtype)
+    return (dates >= lo) & (dates <= hi)
+
+
+def _to_ns(dates):
+    dates = np.asarray(dates)
+    return np.where(_in_ns_range(dates), dates, np.datetime64("NaT")).astype("datetime64[ns]")
+
+
+def parse_dates(values):
+    """datetime64[ns] array from date strings; NaT where blank, unparseable or out of range.
+
+    Each of DATE_FORMATS is one vectorized Arrow pass over the column, so a column
+    mixing dates with and without times parses completely (pd.to_datetime infers
+    one format from the first value and turns the rest into NaT). The rare value
+    matching none of them is parsed by pandas, once per distinct string - as is a
+    two-digit year, which Arrow's %Y reads as the year 20 rather than 2020.
+    """
+    values = pd.Series(values)
+    if not (pd.api.types.is_string_dtype(values) or values.dtype == object):
+        # Already dates, or an all-blank column read as floats
+        return _to_ns(pd.to_datetime(values, errors="coerce").to_numpy())
+    try:
+        text = pc.utf8_trim_whitespace(pa.array(values, from_pandas=True))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return _to_ns(pd.to_datetime(values, errors="coerce", format="mixed").to_numpy())
+    parsed = None
+    for fmt in DATE_FORMATS:
+        attempt = pc.strptime(text, format=fmt, unit="s", error_is_null=True)
+        parsed = attempt if parsed is None else pc.coalesce(parsed, attempt)
+    seconds = parsed.to_numpy(zero_copy_only=False)
+    valid = _in_ns_range(seconds)
+    dates = np.where(valid, seconds, np.datetime64("NaT")).astype("datetime64[ns]")
+    present = pc.not_equal(text, "").fill_null(False).to_numpy(zero_copy_only=False)
+    leftover = np.flatnonzero(~valid & present)
+    if len(leftover):
+        codes, uniques = pd.factorize(values.to_numpy(dtype=object)[leftover])
+        fallback = pd.to_datetime(pd.Series(uniques, dtype=object), errors="coerce", format="mixed")
+        dates[leftover] = _to_ns(fallback.to_numpy())[codes]
+    return dates
+
+
+def add_intervals(df):
+    """Add the INTERVAL_COLUMNS (fractional days, float32) from the parsed dates"""
+    missing = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    surgery = df[SURGERY_COLUMN] if SURGERY_COLUMN in df.columns else missing
+    for col, event in INTERVAL_COLUMNS.items():
+        event_dates = df[event] if event in df.columns else missing
+        df[col] = ((event_dates - surgery) / pd.Timedelta(days=1)).astype("float32")
+    return df
+
+
+def prepare_frame(df):
+    """Apply the schema and add the *_label and interval columns the dashboard displays"""
+    df['PatID'] = df['PatID'].astype(str)
+    for col, dtype in INT_COLUMNS.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").round().astype(dtype)
+    for col, dtype in FLOAT_COLUMNS.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = parse_dates(df[col])
+    add_intervals(df)
+
+    df['Gender_label'] = _label(df['Gender'], GENDER_MAP, GENDER_DTYPE, "Unknown")
+    df['Premature_label'] = _label(df['Premature'], PREMATURE_MAP, PREMATURE_DTYPE, "Unknown")
+    df['Race_label'] = _label(df['Race'], RACE_MAP, RACE_DTYPE, 'Other/Unknown')
+    df['Ethnicity_label'] = _label(df['Ethnicity'], ETHNICITY_MAP, ETHNICITY_DTYPE, 'Other/Unknown')
+
+    if 'SyndromeTerm' not in df.columns:
+        df['SyndromeTerm'] = MISSING_COLUMN
+    # Blanks and placeholders are not a syndrome (nor is a missing column)
+    df['Syndrome_Present_bool'] = named_terms(df['SyndromeTerm'])
+    df['Fetal_Drug_Exposure_label'] = pd.Categorical(
+        np.where(df['SyndromeTerm'] == FETAL_DRUG_EXPOSURE, "Yes", "No"), dtype=YES_NO_DTYPE)
+    return df
+
+
+def format_date(value, default="N/A"):
+    """Display a parsed date the way the registry export writes it"""
+    if pd.isna(value):
+        return default
+    if value.hour or value.minute:
+        return value.strftime("%m/%d/%Y %H:%M")
+    return value.strftime("%m/%d/%Y")
+
+
+def format_days(days, default="N/A"):
+    """Display an interval column value: "12 days", or one decimal when times were recorded"""
+    if pd.isna(days):
+        return default
+    text = f"{days:.0f}" if float(days).is_integer() else f"{days:.1f}"
+    return f"{text} day" if text in ("1", "-1") else f"{text} days"
+
+
+#__________________Columnar snapshot__________________
+
+def snapshot_path(path):
+    return os.path.splitext(path)[0] + ".feather"
+
+
+def snapshot_metadata(snap):
+    """Source fingerprint/version stored in the snapshot, or None if there is no snapshot"""
+    if not os.path.exists(snap):
+        return None
+    with pa.memory_map(snap) as source:
+        meta = pa.ipc.open_file(source).schema.metadata or {}
+    raw = meta.get(b"dashboard")
+    return json.loads(raw) if raw else None
+
+
+def snapshot_current(meta, version):
+    """Whether snapshot metadata is for this source version and the current schema"""
+    return bool(meta) and meta["source_version"] == version and meta.get("schema") == SNAPSHOT_SCHEMA
+
+
+def build_snapshot(path, version, snap=None):
+    """Parse + prepare the CSV once and write it as an uncompressed Feather file.
+
+    Uncompressed so the file can be memory-mapped without a decode step.
+    """
+    snap = snap or snapshot_path(path)
+    fingerprint = source_fingerprint(path)
+    df, missing = _load_from_csv(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[b"dashboard"] = json.dumps({
+        "source_fingerprint": f"{fingerprint[0]}:{fingerprint[1]}",
+        "source_version": version,
+        "missing_columns": list(missing),
+        "schema": SNAPSHOT_SCHEMA,
+    }).encode()
+    tmp = snap + ".tmp"
+    feather.write_feather(table.replace_schema_metadata(meta), tmp, compression="uncompressed")
+    os.replace(tmp, snap)
+    logger.info("Wrote snapshot %s (%d rows)", snap, table.num_rows)
+
+
+def read_snapshot(snap, columns=DASHBOARD_COLUMNS):
+    """Memory-map the snapshot and wrap the requested columns without copying them.
+
+    The Arrow buffers stay views of the mapped file (which is why the map is not
+    closed here), and split_blocks stops pandas from consolidating them into
+    fresh arrays. Text columns - most of the bytes - therefore live in the page
+    cache, shared by every process that maps the same file; only dates, null
+    masks and category codes are converted into process memory.
+    """
+    table = pa.ipc.open_file(pa.memory_map(snap)).read_all()
+    table = table.select([c for c in columns if c in table.schema.names])
+    return table.to_pandas(split_blocks=True)
+
+
+#__________________Streaming loader__________________
+
+def _record_bounds(path, block_size=1 << 24):
+    """Byte offsets where each non-blank CSV record starts and ends (header included).
+
+    A newline only ends a record outside quotes; quotes are counted per block so
+    memory stays bounded by the block size, whatever the file size.
+    """
+    ends = []
+    quotes_before = 0
+    offset = 0
+    with open(path, "rb") as fh:
+        while block := fh.read(block_size):
+            buf = np.frombuffer(block, dtype=np.uint8)
+            quotes = np.flatnonzero(buf == ord('"'))
+            newlines = np.flatnonzero(buf == ord("\n"))
+            parity = (quotes_before + np.searchsorted(quotes, newlines)) % 2
+            ends.append(newlines[parity == 0] + offset + 1)
+            quotes_before += len(quotes)
+            offset += len(buf)
+    bounds = np.concatenate([[0], *ends, [offset]]).astype(np.int64)
+    starts, stops = bounds[:-1], bounds[1:]
+    # Same rule as read_csv's skip_blank_lines: drop records that are only a line break
+    lengths = stops - starts
+    keep = lengths > 2
+    short = np.flatnonzero((lengths > 0) & (lengths <= 2))
+    if len(short):
+        with open(path, "rb") as fh:
+            for i in short:
+                fh.seek(starts[i])
+                keep[i] = bool(fh.read(int(lengths[i])).strip())
+    return starts[keep], stops[keep]
+
+
+class LazyText:
+    """Free-text columns left in the CSV, read back per row through a byte-offset index.
+
+    Costs 16 bytes per row instead of the text itself. Rows written by an ingested
+    delta (updated or appended) are not in the CSV; their text is kept in memory.
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        starts, stops = _record_bounds(path)
+        with open(path, "rb") as fh:
+            header = next(csv.reader([fh.read(int(stops[0] - starts[0])).decode()]))
+        self.columns = {col: header.index(col) for col in columns if col in header}
+        self._starts, self._stops = starts[1:], stops[1:]
+        self._rows = {}  # row -> {column: text or None} from deltas, instead of the CSV
+
+    def __len__(self):
+        return len(self._starts)
+
+    def with_rows(self, rows, text):
+        """Copy that reads `rows` from the frame `text` (aligned with them) instead of the CSV"""
+        new = copy.copy(self)
+        new._rows = dict(self._rows)
+        values = {col: text[col].to_numpy(dtype=object) for col in self.columns if col in text.columns}
+        for i, row in enumerate(np.asarray(rows).tolist()):
+            new._rows[row] = {col: (v[i] if isinstance(v[i], str) and v[i] != "" else None)
+                              for col, v in values.items()}
+        return new
+
+    def fetch(self, row):
+        """{column: text or None} for one row; empty for rows that are in neither the file nor a delta"""
+        if row in self._rows:
+            return self._rows[row]
+        if not self.columns or not 0 <= row < len(self._starts):
+            return {}
+        with open(self.path, "rb") as fh:
+            fh.seek(self._starts[row])
+            raw = fh.read(int(self._stops[row] - self._starts[row])).decode()
+        fields = next(csv.reader(io.StringIO(raw)))
+        return {col: (fields[i] if i < len(fields) and fields[i] != "" else None) for col, i in self.columns.items()}
+
+
+def _load_streaming(path):
+    """Parse only the compact dashboard columns, one chunk at a time"""
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in DASHBOARD_COLUMNS if c in header and c not in LAZY_COLUMNS]
+    chunks = [prepare_frame(chunk) for chunk in
+              pd.read_csv(path, dtype=CSV_DTYPES, usecols=usecols, chunksize=STREAM_CHUNK_ROWS)]
+    df = pd.concat(chunks, ignore_index=True) if chunks else prepare_frame(pd.DataFrame(columns=usecols))
+    text = LazyText(path, LAZY_COLUMNS)
+    if len(text) != len(df):
+        raise ValueError(f"{path}: found {len(text)} CSV records but parsed {len(df)} rows")
+    missing = tuple(col for col in OPTIONAL_COLUMNS if col not in header)
+    return df, missing, text
+
+
+#__________________Cached loading__________________
+
+def source_fingerprint(path):
+    """Cheap per-rerun check: mtime and size of the source file"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _content_hash(path, mtime_ns, size):
+    # Only re-resolved when the mtime/size changes, so touching the file without
+    # changing its content does not trigger a re-parse. A snapshot built from this
+    # exact file already knows the hash, which saves hashing a large CSV on cold start.
+    meta = snapshot_metadata(snapshot_path(path)) if LOADER_MODE == "snapshot" else None
+    if meta and meta["source_fingerprint"] == f"{mtime_ns}:{size}":
+        return meta["source_version"]
+    return _file_hash(path)
+
+
+def data_version(path=DATA_PATH):
+    return _content_hash(path, *source_fingerprint(path))
+
+
+def _load_from_snapshot(path, version):
+    snap = snapshot_path(path)
+    meta = snapshot_metadata(snap)
+    if not snapshot_current(meta, version):
+        build_snapshot(path, version, snap)
+        meta = snapshot_metadata(snap)
+    return read_snapshot(snap), tuple(meta["missing_columns"])
+
+
+def _load_from_csv(path):
+    """Read and prepare the raw CSV export (no caching)"""
+    df = pd.read_csv(path, dtype=CSV_DTYPES)
+    missing = tuple(col for col in OPTIONAL_COLUMNS if col not in df.columns)
+    return prepare_frame(df), missing
+
+
+@st.cache_resource(show_spinner="Loading patient registry...", max_entries=1)
+def _load(path, version):
+    start = time.perf_counter()
+    df = text = None
+    if LOADER_MODE == "stream":
+        df, missing, text = _load_streaming(path)
+    elif LOADER_MODE == "snapshot":
+        try:
+            df, missing = _load_from_snapshot(path, version)
+        except OSError:
+            # e.g. the data directory is read-only - fall back to parsing the CSV
+            logger.exception("Could not use snapshot for %s, reading CSV", path)
+    if df is None:
+        df, missing = _load_from_csv(path)
+    elapsed = time.perf_counter() - start
+    logger.info("Loaded %d rows from %s in %.3fs (version %s)", len(df), path, elapsed, version[:10])
+    return LoadedData(df=df, version=version, load_seconds=elapsed, missing_columns=missing, text=text, path=path)
+
+
+def load_patients(path=DATA_PATH):
+    """Return the prepared registry, shared across reruns and sessions.
+
+    The frame is only re-read when the file content changes; incremental exports
+    ingested since then are applied on top. Treat it as read-only.
+    """
+    # Imported here because ingest and shared build on this module
+    if LOADER_MODE == "shared":
+        from shared import load_shared
+        return load_shared(path)
+    from ingest import apply_pending_deltas
+    return apply_pending_deltas(_load(path, data_version(path)), path)
+
+
+#__________________Command line: build / compare__________________
+
+def _peak_rss_mb():
+    # VmHWM starts over in a new process image; ru_maxrss would carry the parent's
+    # peak (e.g. from building the snapshot) across fork/exec
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(mode, path):
+    # Runs in a fresh interpreter so peak RSS only reflects one loader
+    baseline_mb = _peak_rss_mb()
+    start = time.perf_counter()
+    text = None
+    if mode == "snapshot":
+        df = read_snapshot(snapshot_path(path))
+    elif mode == "stream":
+        df, _, text = _load_streaming(path)
+    else:
+        df, _ = _load_from_csv(path)
+    elapsed = time.perf_counter() - start
+    # Time to first render: everything one patient panel needs, notes included
+    last = len(df) - 1
+    notes = text.fetch(last) if text is not None else {c: df[c].iat[last] for c in LAZY_COLUMNS if c in df.columns}
+    first_view = time.perf_counter() - start
+    peak_mb = _peak_rss_mb()
+    print(json.dumps({"mode": mode, "rows": len(df), "seconds": round(elapsed, 3), "first_view_seconds": round(first_view, 3),
+                      "notes_loaded": sum(v is not None for v in notes.values()),
+                      "peak_rss_mb": round(peak_mb, 1), "load_rss_mb": round(peak_mb - baseline_mb, 1)}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or benchmark the registry snapshot")
+    parser.add_argument("path", nargs="?", default=DATA_PATH)
+    parser.add_argument("--compare", action="store_true", help="cold-load with every loader and report time/memory")
+    parser.add_argument("--measure", choices=["csv", "snapshot", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        _measure(args.measure, args.path)
+        sys.exit()
+    version = _file_hash(args.path)
+    meta = snapshot_metadata(snapshot_path(args.path))
+    if not snapshot_current(meta, version):
+        build_snapshot(args.path, version)
+    print(f"Snapshot up to date: {snapshot_path(args.path)}")
+    if args.compare:
+        for mode in ("csv", "snapshot", "stream"):
+            subprocess.run([sys.executable, __file__, args.path, "--measure", mode], check=True)
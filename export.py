@@ -0,0 +1,330 @@
+# export.py
+# Batch export of patient summaries - the Patient Info panel, Cardiac/Septic event boxes,
+# abnormalities and timeline - as printable HTML, PDF or CSV, for a list of PatIDs or a
+# cohort filter. Rendered by a process pool from the same view table and risk scores as
+# the dashboard; workers attach to the shared registry (shared.py), so each one holds
+# only the chunk it is rendering, and chunks are written to disk as they come back.
+# run -
+# python export.py --ids 1001 1002 1003 --format html --out summaries.html
+# python export.py --ids-file ids.txt --format pdf --out exports/summaries.pdf    (one PDF per chunk)
+# python export.py --where Gender_label=Girl --terms-all "hypoplastic left heart" --surgery-from 2015-01 --format csv
+import argparse
+import collections
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import sys
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cohort import rows_in_range
+from components import TIMELINE_BOTTOM, TIMELINE_TOP, summary_card_html, timeline_offsets
+from data_loader import DATA_PATH
+from patient_index import get_patient_index
+from risk_engine import get_risk_scores
+from shared import attach, publish
+from terms import get_term_index
+from theme import get_print_css
+from view_model import EVENT_FIELDS, FIELDS, get_view_table
+
+FORMATS = ["html", "pdf", "csv"]
+CHUNK_ROWS = 200  # patients per task (and per PDF file)
+CSV_FIELDS = [name for name in FIELDS if name not in EVENT_FIELDS and name != "syndrome_present"]
+PAGE_INCHES = (11.69, 8.27)  # A4 landscape, as the HTML prints
+
+
+#__________________Selecting patients__________________
+
+TRUE_WORDS, FALSE_WORDS = ("1", "true", "yes"), ("0", "false", "no")
+
+
+def _filter_value(values, col, text):
+    """`text` from --where as a value of the column's dtype; ValueError if it can never match"""
+    dtype = values.dtype
+    text = text.strip()
+    if pd.api.types.is_bool_dtype(dtype):
+        if text.lower() not in TRUE_WORDS + FALSE_WORDS:
+            raise ValueError(f"{col} is yes/no, not {text!r}")
+        return text.lower() in TRUE_WORDS
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = {str(c).casefold(): c for c in dtype.categories}
+        if text.casefold() not in categories:
+            raise ValueError(f"{col} is one of {', '.join(map(str, dtype.categories))}, not {text!r}")
+        return categories[text.casefold()]
+    if pd.api.types.is_numeric_dtype(dtype):
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError(f"{col} holds numbers (codes), not {text!r}; labels are in the *_label columns") from None
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return pd.Timestamp(text)
+    return text
+
+
+def select_rows(data, ids=None, where=None, all_of=(), any_of=(), start=None, end=None, all_encounters=False):
+    """Frame rows to export and the requested PatIDs that are not in the registry.
+
+    With `ids`, those patients in the given order; otherwise every patient matching
+    the cohort filter (column == value pairs, abnormality terms, surgery date range).
+    One row per patient - the latest encounter, as the dashboard opens - unless
+    `all_encounters`.
+    """
+    index = get_patient_index(data)
+    if ids is not None:
+        unknown = [pat_id for pat_id in ids if pat_id not in index]
+        known = [pat_id for pat_id in ids if pat_id in index]
+        if all_encounters:
+            rows = [index.rows(pat_id) for pat_id in known]
+            return (np.concatenate(rows).astype(np.int64) if rows else np.empty(0, dtype=np.int64)), unknown
+        return index.latest_rows_for(known), unknown
+
+    df = data.df
+    unknown = [col for col in (where or {}) if col not in df.columns]
+    if unknown:
+        raise ValueError(f"Unknown column(s) {', '.join(unknown)}; filterable columns: {', '.join(df.columns)}")
+    values = {col: _filter_value(df[col], col, text) for col, text in (where or {}).items()}
+    matched = get_term_index(data).match(all_of, any_of)
+    rows = np.arange(len(df), dtype=np.int64) if matched is None else matched.astype(np.int64)
+    for col, value in values.items():
+        rows = rows[df[col].iloc[rows].eq(value).fillna(False).to_numpy(dtype=bool)]
+    if start is not None or end is not None:
+        rows = rows_in_range(data, rows, start, end, include_undated=False)
+    if not all_encounters:
+        latest = np.zeros(len(df), dtype=bool)
+        latest[index.latest_rows()] = True
+        rows = rows[latest[rows]]
+    return rows, []
+
+
+def _where_item(text):
+    """argparse type for --where: COLUMN=VALUE -> (column, value)"""
+    col, sep, value = text.partition("=")
+    if not sep or not col.strip():
+        raise argparse.ArgumentTypeError(f"expected COLUMN=VALUE, not {text!r}")
+    return col.strip(), value
+
+
+def _month(text):
+    """argparse type for --surgery-from / --surgery-to: a date, e.g. 2015-01"""
+    try:
+        return pd.Timestamp(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a month such as 2015-01: {text!r}") from None
+
+
+#__________________Rendering (in the pool workers)__________________
+
+_worker = {}
+
+
+def _init_worker(path, version):
+    _worker["data"] = attach(path, version)
+
+
+def _render_html(patients, target):
+    return "".join(summary_card_html(view, score, factors) for view, score, factors in patients)
+
+
+def _csv_value(value):
+    # Shunt sizes are float32 in the frame: written as recorded (3.2, not 3.200000047683716),
+    # and NaN - not recorded - as an empty cell
+    if isinstance(value, float):
+        return "" if np.isnan(value) else f"{value:g}"
+    return value
+
+
+def _render_csv(patients, target):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for view, score, factors in patients:
+        writer.writerow([_csv_value(getattr(view, name)) for name in CSV_FIELDS] + [f"{score:.1f}", "; ".join(factors)])
+    return out.getvalue()
+
+
+def _pdf_page(fig, view, score, factors):
+    """One summary on a reused figure: three text columns like the dashboard, timeline on the right"""
+    def column(x, title, lines):
+        fig.text(x, 0.80, title, fontsize=13, fontweight="bold", va="top")
+        fig.text(x, 0.75, "\n".join(lines), fontsize=9.5, va="top", linespacing=1.5)
+
+    def wrap(label, value, width=48):
+        return textwrap.fill(f"{label}: {value}", width, subsequent_indent="    ")
+
+    from matplotlib.lines import Line2D
+
+    fig.clear()
+    fig.text(0.04, 0.94, f"Patient {view.pat_id}", fontsize=20, fontweight="bold")
+    fig.text(0.30, 0.945, f"Surgery {view.surgery_date}", fontsize=13, color="#555555")
+    fig.text(0.04, 0.88, f"Risk {score:.1f} / 10  -  {', '.join(factors) or 'no risk factors recorded'}",
+             fontsize=13, fontweight="bold", color="#C6002A")
+    shunt = "N/A" if np.isnan(view.shunt_size) else f"{view.shunt_size:g} mm"
+    column(0.04, "Patient Info", [
+        f"Premature: {view.premature}", f"Sex: {view.sex}", f"Race: {view.race}", f"Ethnicity: {view.ethnicity}",
+        f"Date of Birth: {view.dob}", f"Age at Surgery (days): {view.age_at_surgery}", f"Shunt Size: {shunt}",
+        "", "Time from surgery", *(f"    {label[len('Surgery '):]}: {text}" for label, text in view.intervals)])
+    column(0.30, "Events", [
+        f"Cardiac event: {view.cardiac_arrest_date}", wrap("Sudden hypoxemia notes", view.sh_notes),
+        wrap("Cardiac anatomy notes", view.cardiac_notes), "", f"Septic event: {view.sepsis_date}",
+        f"CompCLABSI: {view.clabsi}   CompUTI: {view.uti}   CompWoundInf: {view.wound_infection}", "",
+        f"Syndrome Present: {view.syndrome_label}", f"Fetal Drug Exposure: {view.fetal_drug_exposure}",
+        wrap("Abnormalities", view.abnormalities)])
+
+    # Same placement as the dashboard timeline: heights follow the dates, labels kept
+    # apart. Drawn on the figure itself - an axes per page costs more than the text.
+    fig.text(0.70, 0.80, "Timeline of Events", fontsize=13, fontweight="bold", va="top")
+    dated = [(label, text, ns) for label, text, ns in view.timeline_events if ns is not None]
+    undated = [label for label, _, ns in view.timeline_events if ns is None]
+    fig.add_artist(Line2D([0.71, 0.71], [0.08, 0.74], color="#111111", linewidth=1.5))
+    if dated:
+        for (label, text, _), top in zip(dated, timeline_offsets([ns for _, _, ns in dated])):
+            y = 0.74 - top / (TIMELINE_BOTTOM + TIMELINE_TOP) * 0.66
+            fig.add_artist(Line2D([0.71], [y], marker="o", color="#111111", markersize=5))
+            fig.text(0.725, y, f"{label}\n{text}", fontsize=9, va="center")
+    if undated:
+        fig.text(0.70, 0.05, textwrap.fill(f"Not recorded: {', '.join(undated)}", 45), fontsize=8.5, color="#555555")
+
+
+def _render_pdf(patients, target):
+    # matplotlib is only needed here; imported in the worker that renders PDFs
+    import matplotlib
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+
+    # The PDF viewer's built-in Helvetica: no glyphs to embed, which was most of the time
+    # per page (~160 ms -> ~8 ms). Latin-1 only; the registry text is English.
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)  # "Helvetica is Medium, not Normal"
+    with matplotlib.rc_context({"pdf.use14corefonts": True}):
+        fig = Figure(figsize=PAGE_INCHES)
+        with PdfPages(target) as pdf:
+            for view, score, factors in patients:
+                _pdf_page(fig, view, score, factors)
+                pdf.savefig(fig)
+    return target
+
+
+RENDERERS = {"html": _render_html, "csv": _render_csv, "pdf": _render_pdf}
+
+
+def _render_chunk(fmt, rows, target=None):
+    data = _worker["data"]
+    risk = get_risk_scores(data)
+    views = get_view_table(data).views(rows)
+    patients = [(view, float(risk.scores[row]), risk.factors_for(row)) for view, row in zip(views, rows.tolist())]
+    return len(rows), RENDERERS[fmt](patients, target)
+
+
+#__________________Writing__________________
+
+def _part_path(out, i):
+    stem, ext = os.path.splitext(out)
+    return f"{stem}-{i + 1:05d}{ext}"
+
+
+def export(rows, fmt, out, path=DATA_PATH, workers=None, chunk_rows=CHUNK_ROWS, version=None, progress=None):
+    """Render `rows` in chunks on a process pool and stream them to `out`, in order.
+
+    HTML and CSV go to the one file; PDF writes one file per chunk next to `out`.
+    At most two chunks per worker are in flight, so memory does not grow with the
+    export. Returns the files written.
+    """
+    version = version or os.path.basename(publish(path))
+    workers = workers or os.cpu_count() or 1
+    chunks = [rows[i:i + chunk_rows] for i in range(0, len(rows), chunk_rows)]
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    written = [] if fmt == "pdf" else [out]
+    sink = None if fmt == "pdf" else open(out, "w", encoding="utf-8", newline="")
+    done = 0
+
+    def collect(future):
+        nonlocal done
+        count, result = future.result()
+        done += count
+        if sink is None:
+            written.append(result)
+        else:
+            sink.write(result)
+        if progress:
+            progress(done, len(rows))
+
+    try:
+        if fmt == "html":
+            sink.write(f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Patient summaries</title>'
+                       f'{get_print_css()}</head><body>')
+        elif fmt == "csv":
+            csv.writer(sink).writerow(CSV_FIELDS + ["risk_score", "risk_factors"])
+        # spawn: the parent holds mapped files and threads that a fork would copy into every worker
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(path, version)) as pool:
+            pending = collections.deque()
+            for i, chunk in enumerate(chunks):
+                target = _part_path(out, i) if fmt == "pdf" else None
+                pending.append(pool.submit(_render_chunk, fmt, chunk, target))
+                if len(pending) >= 2 * workers:
+                    collect(pending.popleft())
+            while pending:
+                collect(pending.popleft())
+        if fmt == "html":
+            sink.write("</body></html>\n")
+    finally:
+        if sink is not None:
+            sink.close()
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export printable patient summaries for many patients at once")
+    parser.add_argument("--data", default=DATA_PATH)
+    picked = parser.add_mutually_exclusive_group()
+    picked.add_argument("--ids", nargs="+", help="PatIDs to export, in this order")
+    picked.add_argument("--ids-file", help="file with one PatID per line")
+    parser.add_argument("--where", nargs="+", default=[], type=_where_item, metavar="COLUMN=VALUE",
+                        help="cohort filter on frame columns, e.g. Gender_label=Girl Gender=1 Syndrome_Present_bool=yes; "
+                             "the value is read as the column's type (label, number, yes/no)")
+    parser.add_argument("--terms-all", nargs="+", default=[], help="abnormality terms every patient must have")
+    parser.add_argument("--terms-any", nargs="+", default=[], help="abnormality terms, at least one of which")
+    parser.add_argument("--surgery-from", type=_month, help="first surgery month, e.g. 2015-01")
+    parser.add_argument("--surgery-to", type=_month, help="last surgery month")
+    parser.add_argument("--all-encounters", action="store_true", help="every encounter, not only the latest")
+    parser.add_argument("--format", choices=FORMATS, default="html")
+    parser.add_argument("--out", help="output file (default: patient_summaries.<format>)")
+    parser.add_argument("--workers", type=int, help="processes (default: one per CPU)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="patients per task / PDF file")
+    args = parser.parse_args()
+
+    ids = args.ids
+    if args.ids_file:
+        with open(args.ids_file) as fh:
+            ids = [line.strip() for line in fh if line.strip()]
+    where = dict(args.where)
+    out = args.out or f"patient_summaries.{args.format}"
+
+    start = time.perf_counter()
+    version = os.path.basename(publish(args.data))
+    try:
+        rows, unknown = select_rows(attach(args.data, version), ids, where, args.terms_all, args.terms_any,
+                                    args.surgery_from, args.surgery_to, args.all_encounters)
+    except ValueError as exc:
+        # Option values are checked by their argparse types; what is left is a --where value the column cannot hold
+        parser.error(f"argument --where: {exc}")
+    if unknown:
+        print(f"Not in the registry ({len(unknown)}): {', '.join(unknown[:20])}{' ...' if len(unknown) > 20 else ''}",
+              file=sys.stderr)
+    if not len(rows):
+        sys.exit("No patients selected")
+    print(f"Exporting {len(rows):,} summaries as {args.format.upper()}", file=sys.stderr)
+    files = export(rows, args.format, out, args.data, args.workers, args.chunk, version,
+                   progress=lambda done, total: print(f"\r{done:,} / {total:,}", end="", file=sys.stderr))
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(f) for f in files)
+    print(f"\nWrote {len(rows):,} summaries to {len(files)} file(s), {size / 1e6:,.1f} MB, in {elapsed:.1f}s "
+          f"({len(rows) / elapsed:,.0f}/s)", file=sys.stderr)
+    for f in files[:10]:
+        print(f)
+    if len(files) > 10:
+        print(f"... and {len(files) - 10} more")
@@ -0,0 +1,298 @@
+# ingest.py
+# Incremental registry exports: append a delta CSV without re-parsing the full file
+# run -
+# python ingest.py new_rows.csv [--data MS_copy_DeID_Complete.csv] [--chunksize 50000]
+#
+# Each delta is parsed in chunks, prepared with the same schema as the full load and
+# stored as Feather files next to the source CSV (<name>.deltas/). Running dashboards
+# notice the new manifest entry on their next rerun and upsert it into the cached
+# frame, patching the derived indexes/aggregates rather than rebuilding them. Nothing is
+# copied at registry length: numpy-backed columns grow into spare rows and are updated in
+# place (data_loader.grow), Arrow text columns are spliced from slices of their chunks.
+import argparse
+import dataclasses
+import datetime as dt
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from pyarrow import feather
+
+from data_loader import (CSV_DTYPES, DATA_PATH, INTERVAL_COLUMNS, LAZY_COLUMNS, add_intervals, data_version, grow,
+                         prepare_frame, read_snapshot)
+from patient_index import get_patient_index
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 50_000
+KEY_COLUMNS = ["PatID", "CardSurgDt"]  # a delta row replaces the encounter with the same patient + surgery date
+
+
+#__________________Delta log__________________
+
+def delta_dir(path):
+    return os.path.splitext(path)[0] + ".deltas"
+
+
+def read_manifest(path):
+    """Ingested deltas for `path`: {"base_version": ..., "entries": [{"files": [...], ...}]}"""
+    manifest = os.path.join(delta_dir(path), "manifest.json")
+    if not os.path.exists(manifest):
+        return {"base_version": None, "entries": []}
+    with open(manifest) as fh:
+        return json.load(fh)
+
+
+def _write_manifest(path, manifest):
+    target = os.path.join(delta_dir(path), "manifest.json")
+    tmp = target + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh, indent=1)
+    os.replace(tmp, target)  # readers see the old or the new manifest, never half of one
+
+
+def ingest_delta(delta_csv, path=DATA_PATH, chunksize=CHUNK_ROWS):
+    """Parse a delta export chunk by chunk and record it as one manifest entry.
+
+    Memory and time scale with the delta, not with the registry.
+    """
+    base_version = data_version(path)
+    manifest = read_manifest(path)
+    if manifest["base_version"] != base_version:
+        # The full export was replaced - earlier deltas are part of it (or obsolete)
+        manifest = {"base_version": base_version, "entries": []}
+    os.makedirs(delta_dir(path), exist_ok=True)
+    seq = len(manifest["entries"]) + 1
+    files, rows = [], 0
+    for i, chunk in enumerate(pd.read_csv(delta_csv, dtype=CSV_DTYPES, chunksize=chunksize)):
+        name = f"{seq:06d}-{i:04d}.feather"
+        feather.write_feather(prepare_frame(chunk), os.path.join(delta_dir(path), name), compression="uncompressed")
+        files.append(name)
+        rows += len(chunk)
+    manifest["entries"].append({
+        "source": os.path.basename(delta_csv),
+        "files": files,
+        "rows": rows,
+        "ingested_at": dt.datetime.now().isoformat(timespec="seconds"),
+    })
+    _write_manifest(path, manifest)
+    return rows
+
+
+#__________________Applying deltas__________________
+
+@dataclasses.dataclass(frozen=True)
+class DeltaBatch:
+    """Which rows one delta touched; handed to every registered patcher"""
+    updated: np.ndarray   # positions overwritten in place
+    appended: np.ndarray  # positions of new rows at the end of the frame
+    old_rows: pd.DataFrame  # previous contents of `updated`, e.g. to subtract from aggregates
+    rows: pd.DataFrame  # new contents of `changed`, in that order - patchers never index the full frame
+
+    @property
+    def changed(self):
+        return np.concatenate([self.updated, self.appended])
+
+
+def _match_rows(data, delta):
+    """Split delta rows into (frame positions to update, delta rows for them, delta rows to append)"""
+    index = get_patient_index(data)
+    surg = data.df["CardSurgDt"].to_numpy(dtype="datetime64[ns]") if "CardSurgDt" in data.df.columns else None
+    delta_surg = delta["CardSurgDt"].to_numpy(dtype="datetime64[ns]") if surg is not None else None
+    updated, sources, appended = [], [], []
+    for i, pat_id in enumerate(delta["PatID"].to_numpy()):
+        hits = index.rows(pat_id) if pat_id in index else ()
+        if len(hits) and surg is not None:
+            when = delta_surg[i]
+            same = surg[hits] == when if not np.isnat(when) else np.isnat(surg[hits])
+            hits = hits[same]
+        if len(hits):
+            updated.append(hits[-1])
+            sources.append(i)
+        else:
+            appended.append(i)
+    return np.array(updated, dtype=np.int64), sources, appended
+
+
+def _align_dtypes(delta, df):
+    """Cast delta columns to the frame's dtypes, so the upsert and concat keep its schema"""
+    for col in delta.columns:
+        dtype, values = df[col].dtype, delta[col]
+        if values.dtype == dtype:
+            continue
+        if pd.api.types.is_string_dtype(dtype) and pd.api.types.is_float_dtype(values.dtype):
+            # Sparse text column parsed as numbers (deltas ingested before CSV_DTYPES): "0", not "0.0"
+            if ((values % 1 == 0) | values.isna()).all():
+                values = values.astype("Int64")
+        delta[col] = values.astype(dtype)
+    return delta
+
+
+#__________________Column storage__________________
+
+MAX_TEXT_CHUNKS = 1024  # a spliced text column is compacted into one chunk beyond this
+
+
+def _numpy_parts(array):
+    """The numpy buffers behind a pandas array; None for Arrow-backed and other arrays"""
+    if isinstance(array, pd.Categorical):
+        return [array._codes]
+    if isinstance(array, (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)):
+        return [array._data, array._mask]
+    if isinstance(array, (pd.arrays.NumpyExtensionArray, pd.arrays.DatetimeArray)) and array.dtype != object:
+        return [array._ndarray]
+    return None
+
+
+def _from_numpy_parts(like, parts):
+    """Array of `like`'s type and dtype over `parts`, without copying them"""
+    if isinstance(like, pd.Categorical):
+        return pd.Categorical.from_codes(parts[0], dtype=like.dtype, validate=False)
+    if len(parts) == 2:
+        return type(like)(parts[0], parts[1], copy=False)
+    return pd.Series(parts[0], copy=False).array
+
+
+def _from_chunks(like, chunked):
+    """Arrow-backed array of `like`'s type and dtype over `chunked`"""
+    if isinstance(like.dtype, pd.StringDtype):
+        return type(like)(chunked, dtype=like.dtype)
+    return type(like)(chunked)
+
+
+def _chunk_rows(chunked, rows):
+    """One-row slices of a ChunkedArray - a take would first concatenate every chunk"""
+    offsets = np.cumsum([0] + [len(c) for c in chunked.chunks])
+    which = np.searchsorted(offsets, rows, side="right") - 1
+    return [chunked.chunk(int(c)).slice(int(r - offsets[c]), 1) for r, c in zip(rows, which)]
+
+
+def _take(array, rows):
+    """`array[rows]` for a few rows, at their cost rather than the column's"""
+    if isinstance(getattr(array, "_pa_array", None), pa.ChunkedArray) and array._pa_array.num_chunks > 1:
+        pieces = _chunk_rows(array._pa_array, rows)
+        chunked = pa.chunked_array(pieces, type=array._pa_array.type) if pieces else array._pa_array.slice(0, 0)
+        return _from_chunks(array, chunked)
+    return array.take(rows)
+
+
+def _take_rows(df, rows):
+    return pd.DataFrame({col: _take(df[col].array, rows) for col in df.columns}, index=rows, copy=False)
+
+
+def _splice(chunked, rows, values, extra):
+    """`chunked` with `rows` replaced by `values` and `extra` appended, built from slices"""
+    pieces, prev = [], 0
+    for i in np.argsort(rows, kind="stable"):
+        pieces += chunked.slice(prev, rows[i] - prev).chunks + [values.slice(int(i), 1)]
+        prev = rows[i] + 1
+    pieces += chunked.slice(prev).chunks + extra.chunks
+    out = pa.chunked_array([p for p in pieces if len(p)], type=chunked.type)
+    if out.num_chunks > MAX_TEXT_CHUNKS:
+        out = pa.chunked_array([out.combine_chunks()], type=chunked.type)
+    return out
+
+
+def _upsert(array, updated, new, appended):
+    """`array` with rows `updated` set to `new` and the values of `appended` added at the end"""
+    parts = _numpy_parts(array)
+    if parts is not None:
+        grown = []
+        for part, upd, app in zip(parts, _numpy_parts(new), _numpy_parts(appended)):
+            part = grow(part, app)
+            part[updated] = upd
+            grown.append(part)
+        return _from_numpy_parts(array, grown)
+    chunked = getattr(array, "_pa_array", None)
+    if isinstance(chunked, pa.ChunkedArray):
+        as_chunks = lambda a: a._pa_array.cast(chunked.type)
+        return _from_chunks(array, _splice(chunked, updated, as_chunks(new).combine_chunks(), as_chunks(appended)))
+    # Not produced by prepare_frame (e.g. object columns): copied
+    values = pd.concat([pd.Series(array), pd.Series(appended, dtype=array.dtype)], ignore_index=True)
+    values.iloc[updated] = np.asarray(new, dtype=object)
+    return values.array
+
+
+def apply_delta(data, delta):
+    """Upsert a prepared delta frame; returns the next LoadedData"""
+    df = data.df
+    keys = [c for c in KEY_COLUMNS if c in delta.columns]
+    delta = delta.drop_duplicates(subset=keys, keep="last").reset_index(drop=True)
+    notes = delta[[c for c in LAZY_COLUMNS if c in delta.columns and c not in df.columns]]
+    present = [c for c in delta.columns if c in df.columns]
+    delta = _align_dtypes(delta[present].copy(), df)
+    for col in df.columns.difference(present, sort=False):
+        delta[col] = pd.Series([None] * len(delta), dtype=object).astype(df[col].dtype)  # missing for new rows
+    updated, sources, appended = _match_rows(data, delta)
+
+    old_rows = _take_rows(df, updated)  # before the in-place writes below
+    replacement, added = delta.iloc[sources], delta.iloc[appended]
+    columns = {}
+    for col in df.columns:
+        # A column the delta does not carry keeps its values for updated rows
+        rows = updated if col in present else updated[:0]
+        values = replacement[col].array if col in present else replacement[col].array[:0]
+        columns[col] = _upsert(df[col].array, rows, values, added[col].array)
+    df = pd.DataFrame(columns, copy=False)
+    changed = np.concatenate([updated, np.arange(len(data.df), len(df), dtype=np.int64)])
+    batch = DeltaBatch(
+        updated=updated,
+        appended=changed[len(updated):],
+        old_rows=old_rows,
+        rows=_take_rows(df, changed),
+    )
+    text = None
+    if data.text is not None:
+        # Stream loader: the notes of these rows are no longer the CSV's
+        text = data.text.with_rows(batch.changed, notes.iloc[np.concatenate([sources, appended]).astype(np.int64)])
+    return data.with_delta(df, batch, text)
+
+
+def read_delta(path, entry, columns):
+    delta = pd.concat([read_snapshot(os.path.join(delta_dir(path), name), columns) for name in entry["files"]],
+                      ignore_index=True)
+    if any(col not in delta.columns for col in INTERVAL_COLUMNS):
+        # Ingested before the interval columns existed
+        delta = add_intervals(delta)
+    return delta
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _head(path, base_version):
+    # Newest applied version on top of one base load, shared by every session
+    return {"data": None, "lock": threading.Lock()}
+
+
+def apply_pending_deltas(base, path=DATA_PATH):
+    """`base` plus every delta in the manifest; only entries not seen yet are applied"""
+    manifest = read_manifest(path)
+    if manifest["base_version"] != base.version:
+        return base
+    head = _head(path, base.version)
+    with head["lock"]:
+        data = head["data"] or base
+        for entry in manifest["entries"][data.deltas:]:
+            start = time.perf_counter()
+            delta = read_delta(path, entry, list(data.df.columns) + (LAZY_COLUMNS if data.text is not None else []))
+            data = apply_delta(data, delta)
+            logger.info("Applied delta %s (%d rows) in %.3fs", entry["source"], len(delta), time.perf_counter() - start)
+        head["data"] = data
+    return data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest an incremental registry export")
+    parser.add_argument("delta", help="CSV with new or corrected rows (same columns as the full export)")
+    parser.add_argument("--data", default=DATA_PATH, help="full export the delta applies to")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = ingest_delta(args.delta, args.data, args.chunksize)
+    print(f"Ingested {rows:,} rows from {args.delta} in {time.perf_counter() - start:.2f}s -> {delta_dir(args.data)}")
@@ -0,0 +1,150 @@
+# instrumentation.py
+# Wall-clock timing for dashboard reruns, fragments and named stages
+# run -
+# python instrumentation.py timing.jsonl   (p50/p95 per stage from a production log)
+import argparse
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger("dashboard.timing")
+if not logger.handlers:
+    # Streamlit only configures its own loggers; give ours a console handler
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+# JSON-lines file that gets one record per finished stage; unset = no file
+LOG_PATH = os.environ.get("DASHBOARD_TIMING_LOG")
+WINDOW = 500  # recent samples per stage kept in memory for p50/p95
+
+_samples = collections.defaultdict(lambda: collections.deque(maxlen=WINDOW))  # stage -> (ms, bytes, calls)
+_lock = threading.Lock()  # samples and the log file are shared by every session
+_current = contextvars.ContextVar("dashboard_stage", default=None)
+
+
+class _Payload:
+    """Markdown emitted while a stage is open"""
+    __slots__ = ("bytes", "calls", "start")
+
+    def __init__(self, start):
+        self.bytes = 0
+        self.calls = 0
+        self.start = start
+
+
+def record_duration(name, seconds, payload_bytes=0, markdown_calls=0):
+    ms = seconds * 1000
+    logger.info("%s rendered in %.1f ms", name, ms)
+    with _lock:
+        _samples[name].append((ms, payload_bytes, markdown_calls))
+        if LOG_PATH:
+            with open(LOG_PATH, "a") as fh:
+                fh.write(json.dumps({"ts": round(time.time(), 3), "stage": name, "ms": round(ms, 3),
+                                     "markdown_bytes": payload_bytes, "markdown_calls": markdown_calls}) + "\n")
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a named section of the render; markdown emitted inside is attributed to it
+    (and added to the enclosing stage/run when it finishes)"""
+    payload = _Payload(time.perf_counter())
+    token = _current.set(payload)
+    try:
+        yield payload
+    finally:
+        _current.reset(token)
+        parent = _current.get()
+        if parent is not None:
+            parent.bytes += payload.bytes
+            parent.calls += payload.calls
+        record_duration(name, time.perf_counter() - payload.start, payload.bytes, payload.calls)
+
+
+def timed(name):
+    """Log how long each call of the decorated render function takes"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_run(started):
+    """Open the root stage of a full rerun (`started` = perf_counter at script start)"""
+    payload = _Payload(started)
+    return payload, _current.set(payload)
+
+
+def end_run(run, name="full_run"):
+    payload, token = run
+    _current.reset(token)
+    record_duration(name, time.perf_counter() - payload.start, payload.bytes, payload.calls)
+
+
+def markdown(body, **kwargs):
+    """st.markdown that counts the payload it ships to the browser"""
+    payload = _current.get()
+    if payload is not None:
+        payload.bytes += len(body.encode())
+        payload.calls += 1
+    return st.markdown(body, **kwargs)
+
+
+#__________________Reporting__________________
+
+def summarize(records):
+    """p50/p95 per stage from (stage, ms, bytes, calls) tuples"""
+    frame = pd.DataFrame(records, columns=["stage", "ms", "markdown_bytes", "markdown_calls"])
+    if frame.empty:
+        return frame
+    grouped = frame.groupby("stage", sort=False)
+    out = pd.DataFrame({
+        "runs": grouped.size(),
+        "p50_ms": grouped["ms"].median(),
+        "p95_ms": grouped["ms"].quantile(0.95),
+        "last_ms": grouped["ms"].last(),
+        "markdown_bytes": grouped["markdown_bytes"].last(),
+        "markdown_calls": grouped["markdown_calls"].last(),
+    })
+    return out.round(2).sort_values("p95_ms", ascending=False)
+
+
+def stage_stats():
+    with _lock:
+        records = [(name, *sample) for name, samples in _samples.items() for sample in samples]
+    return summarize(records)
+
+
+def debug_panel():
+    """Optional sidebar table of recent stage timings (this server process)"""
+    if not st.sidebar.toggle("Show timings", key="debug_timings"):
+        return
+    stats = stage_stats()
+    st.sidebar.dataframe(stats, height=min(420, 38 + 35 * len(stats)))
+    st.sidebar.caption(f"Last {WINDOW} samples per stage. "
+                       + (f"Logging to {LOG_PATH}." if LOG_PATH else "Set DASHBOARD_TIMING_LOG to keep a JSON-lines log."))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate a DASHBOARD_TIMING_LOG file")
+    parser.add_argument("log")
+    args = parser.parse_args()
+    with open(args.log) as fh:
+        rows = [json.loads(line) for line in fh if line.strip()]
+    stats = summarize([(r["stage"], r["ms"], r.get("markdown_bytes", 0), r.get("markdown_calls", 0)) for r in rows])
+    stats.drop(columns=["last_ms"]).to_string(sys.stdout)
+    print()
@@ -0,0 +1,184 @@
+# loadtest.py
+# Start several dashboard server processes and drive them with concurrent sessions,
+# the way a load balancer would spread users over workers
+# run -
+# python loadtest.py --data .bench/registry_1M.csv --workers 1 2 4 --loaders snapshot shared
+#
+# Each session is a websocket speaking the browser's protocol: a request is one full
+# script run (rerun_script -> script_finished). Memory is read from /proc per worker:
+# RSS counts pages shared with other workers in full, PSS splits them between the
+# processes mapping them, and anonymous memory is what the worker holds privately.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "team2.py")
+BASE_PORT = 8600
+READY_TIMEOUT = 600  # seconds for a worker to load, warm up and report fully_ready
+
+
+def worker_memory(pid):
+    """RSS / PSS / anonymous MB of one process, from /proc/<pid>/smaps_rollup"""
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss", "Anonymous"):
+                out[f"{key.lower()}_mb"] = round(int(value.split()[0]) / 1024, 1)
+    return out
+
+
+def start_workers(count, loader, data, log_dir):
+    workers = []
+    for i in range(count):
+        port = BASE_PORT + i
+        log = os.path.join(log_dir, f"timing-{loader}-{port}.jsonl")
+        env = dict(os.environ, DASHBOARD_LOADER=loader, DASHBOARD_DATA=data, DASHBOARD_TIMING_LOG=log)
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", APP, "--server.port", str(port), "--server.headless", "true",
+             "--browser.gatherUsageStats", "false"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        workers.append({"port": port, "proc": proc, "log": log})
+    return workers
+
+
+def _healthy(port):
+    try:
+        with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=2) as resp:
+            return resp.status == 200
+    except OSError:
+        return False
+
+
+def _fully_ready(log):
+    # The warmup logs this stage once everything a session may need is built (warmup.py)
+    if not os.path.exists(log):
+        return False
+    with open(log) as fh:
+        return any(json.loads(line)["stage"] == "fully_ready" for line in fh if line.strip())
+
+
+async def _request(ws):
+    """One full script run; returns its latency in seconds"""
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    msg = BackMsg()
+    msg.rerun_script.query_string = ""
+    start = time.perf_counter()
+    await ws.send(msg.SerializeToString())
+    while True:
+        reply = ForwardMsg()
+        reply.ParseFromString(await ws.recv())
+        if reply.WhichOneof("type") == "script_finished":
+            return time.perf_counter() - start
+
+
+async def _session(port, deadline, latencies):
+    import websockets
+    async with websockets.connect(f"ws://localhost:{port}/_stcore/stream", subprotocols=["streamlit"],
+                                  max_size=None) as ws:
+        while time.perf_counter() < deadline:
+            latencies.append(await _request(ws))
+
+
+async def _drive(ports, sessions, seconds):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    # Round-robin, as a load balancer without affinity would spread new sessions
+    await asyncio.gather(*(_session(ports[i % len(ports)], deadline, latencies) for i in range(sessions)))
+    return latencies
+
+
+async def _first_requests(ports):
+    """One request per worker; the first one on a cold worker loads the registry"""
+    import websockets
+    times = []
+    for port in ports:
+        async with websockets.connect(f"ws://localhost:{port}/_stcore/stream", subprotocols=["streamlit"],
+                                      max_size=None) as ws:
+            times.append(await _request(ws))
+    return times
+
+
+def run_config(loader, count, data, sessions, seconds, log_dir):
+    if loader == "shared":
+        # Published up front, as a deployment would, so no worker pays for it
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(APP), "shared.py"), data], check=True,
+                       stdout=subprocess.DEVNULL)
+    workers = start_workers(count, loader, data, log_dir)
+    try:
+        deadline = time.time() + READY_TIMEOUT
+        while not all(_healthy(w["port"]) for w in workers):
+            if time.time() > deadline:
+                raise RuntimeError("workers did not come up")
+            time.sleep(0.5)
+        ports = [w["port"] for w in workers]
+        first = asyncio.run(_first_requests(ports))
+        while not all(_fully_ready(w["log"]) for w in workers):
+            if time.time() > deadline:
+                raise RuntimeError("workers did not finish warming up")
+            time.sleep(0.5)
+        latencies = asyncio.run(_drive(ports, sessions, seconds))
+        memory = [worker_memory(w["proc"].pid) for w in workers]
+    finally:
+        for w in workers:
+            w["proc"].terminate()
+        for w in workers:
+            w["proc"].wait(timeout=30)
+    latencies.sort()
+    return {
+        "loader": loader,
+        "workers": count,
+        "sessions": sessions,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1) if latencies else None,
+        "first_request_s": round(max(first), 2),
+        "per_worker": memory,
+        "total_pss_mb": round(sum(m["pss_mb"] for m in memory), 1),
+    }
+
+
+def report(results):
+    lines = [f"{'loader':<9} {'workers':>7} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'first s':>8} "
+             f"{'RSS/worker':>11} {'PSS/worker':>11} {'anon/worker':>12} {'PSS total':>10}"]
+    for r in results:
+        mem = r["per_worker"]
+        avg = {k: sum(m[k] for m in mem) / len(mem) for k in mem[0]}
+        lines.append(f"{r['loader']:<9} {r['workers']:>7} {r['rps']:>7} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+                     f"{r['first_request_s']:>8} {avg['rss_mb']:>11.0f} {avg['pss_mb']:>11.0f} "
+                     f"{avg['anonymous_mb']:>12.0f} {r['total_pss_mb']:>10.0f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Requests/s and memory per worker for several server processes")
+    parser.add_argument("--data", default=os.environ.get("DASHBOARD_DATA", "MS_copy_DeID_Complete.csv"))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--loaders", nargs="+", default=["snapshot", "shared"],
+                        choices=["csv", "snapshot", "stream", "shared"])
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions, spread over the workers")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--out", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as log_dir:
+        for loader in args.loaders:
+            for count in args.workers:
+                result = run_config(loader, count, os.path.abspath(args.data), args.sessions, args.seconds, log_dir)
+                print(json.dumps(result), file=sys.stderr)
+                results.append(result)
+    print(report(results))
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(results, fh, indent=1, sort_keys=True)
+            fh.write("\n")
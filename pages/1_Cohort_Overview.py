@@ -0,0 +1,139 @@
+# Cohort Overview page
+# run -
+# streamlit run team2.py  (this page shows up in the sidebar)
+import time
+run_start = time.perf_counter()
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from cohort import (COMPLICATIONS, DIMENSIONS, INTERVALS, breakdown, count_patients, downsample, get_cohort_cube,
+                    get_cube_cells, interval_histogram, interval_summary, monthly_trend, risk_distribution, rows_in_range,
+                    slice_cube)
+from data_loader import load_patients
+from terms import get_term_index
+from theme import get_theme_css
+from warmup import placeholder, progress_panel, start_warmup
+
+TOP_TERMS = 15
+
+st.set_page_config(page_title="Cohort Overview", layout="wide")
+st.markdown(get_theme_css(), unsafe_allow_html=True)
+
+#__________________Loading the data set______________
+data = load_patients()
+st.subheader("Cohort Overview")
+# Cube and term index come from the background warmup; until then this page only
+# shows its progress (and reruns itself when they are ready)
+warmup = start_warmup(data, run_start)
+progress_panel(warmup)
+if not warmup.ready("cohort_cube", "term_index"):
+    placeholder(warmup, "Cohort charts")
+    st.stop()
+cube = get_cohort_cube(data)
+
+#__________________Surgery date filter__________________
+dated = cube["SurgeryMonth"].dropna()
+filter_col, undated_col = st.columns([3, 1])
+if len(dated):
+    first_month, last_month = dated.min().date(), (dated.max() + pd.offsets.MonthEnd(0)).date()
+    with filter_col:
+        date_range = st.date_input("Surgery date range", value=(first_month, last_month),
+                                   min_value=first_month, max_value=last_month)
+    start, end = (date_range + (last_month,))[:2] if isinstance(date_range, tuple) else (date_range, last_month)
+else:
+    start = end = None
+with undated_col:
+    include_undated = st.checkbox("Include patients without a surgery date", value=True)
+
+#__________________Abnormality / syndrome filter__________________
+terms = get_term_index(data)
+term_counts = terms.counts()
+with st.expander("Filter by abnormality or syndrome"):
+    all_col, any_col = st.columns(2)
+    label = lambda t: f"{t} ({term_counts[t]:,})"
+    all_of = all_col.multiselect("Has all of", list(term_counts.index), format_func=label, key="terms_all")
+    any_of = any_col.multiselect("And at least one of", list(term_counts.index), format_func=label, key="terms_any")
+matched = terms.match(all_of, any_of)
+if matched is not None:
+    cube = get_cube_cells(data).cube(matched)
+
+# Charts and rates are read from the cached cube, never from the raw frame. The cube
+# counts surgeries, so a patient with several surgeries counts once per surgery
+cohort = slice_cube(cube, start, end, include_undated)
+total = int(cohort["Surgeries"].sum())
+if total == 0:
+    st.info("No patients match these filters.")
+    st.stop()
+
+# Rows behind the cube slice, for distinct patients and the per-row charts below: a range
+# scan over the surgery date index (cohort.SurgeryDates), or the term matches checked against it
+cohort_rows = rows_in_range(data, matched, start, end, include_undated)
+
+#__________________Headline rates__________________
+metric_cols = st.columns(3 + len(COMPLICATIONS))
+metric_cols[0].metric("Patients", f"{count_patients(data, cohort_rows):,}")
+metric_cols[1].metric("Surgeries", f"{total:,}")
+metric_cols[2].metric("Premature", f"{cohort['Premature'].sum() / total:.1%}", help="Share of surgeries")
+for box, name in zip(metric_cols[3:], COMPLICATIONS):
+    box.metric(name, f"{cohort[name].sum() / total:.1%}", help="Complications per surgery")
+
+#__________________Demographics__________________
+demo_cols = st.columns(3)
+for box, dim in zip(demo_cols, ["Gender_label", "Race_label", "Ethnicity_label"]):
+    title = dim.replace("_label", "")
+    with box:
+        fig = px.bar(breakdown(cohort, dim), x=dim, y="Surgeries", title=title, labels={dim: title})
+        st.plotly_chart(fig)
+
+#__________________Complications and risk__________________
+left, right = st.columns(2)
+with left:
+    by = st.selectbox("Complication rates by", DIMENSIONS, format_func=lambda d: d.replace("_label", ""))
+    rates = breakdown(cohort, by).melt(id_vars=by, value_vars=[f"{c} rate" for c in COMPLICATIONS],
+                                       var_name="Complication", value_name="Rate")
+    rates["Complication"] = rates["Complication"].str.replace(" rate", "")
+    fig = px.bar(rates, x="Complication", y="Rate", color=by, barmode="group", title="Complication rates")
+    fig.update_yaxes(tickformat=".0%")
+    st.plotly_chart(fig)
+with right:
+    fig = px.bar(risk_distribution(cohort), x="RiskBin", y="Surgeries", title="Risk score distribution",
+                 labels={"RiskBin": "Risk score (0-10)"})
+    st.plotly_chart(fig)
+
+#__________________Time from surgery__________________
+summary = interval_summary(data.df, cohort_rows)
+interval_cols = st.columns(len(INTERVALS))
+for box, record in zip(interval_cols, summary.to_dict("records")):
+    if not record["Surgeries"]:
+        box.metric(f"Median {record['Interval'].lower()}", "—", help="No surgery with both dates recorded")
+        continue
+    box.metric(f"Median {record['Interval'].lower()}", f"{record['Median days']:.1f} days",
+               help=f"{record['Surgeries']:,} surgeries with both dates recorded; interquartile range "
+                    f"{record['25th percentile']:.1f}-{record['75th percentile']:.1f} days")
+interval = st.selectbox("Distribution of", list(INTERVALS))
+histogram = interval_histogram(data.df, cohort_rows, INTERVALS[interval])
+if len(histogram):
+    fig = px.bar(histogram, x="Days", y="Surgeries", title=f"{interval} (days)",
+                 labels={"Days": "Days after surgery"})
+    fig.update_traces(marker_line_width=0)
+    st.plotly_chart(fig)
+else:
+    st.caption(f"No surgery in this cohort has both dates recorded for {interval.lower()}.")
+
+#__________________Abnormalities and syndromes__________________
+terms_in_cohort = terms.co_occurrence(cohort_rows)
+terms_in_cohort = terms_in_cohort.drop([t for t in all_of if t in terms_in_cohort.index]).head(TOP_TERMS)
+if len(terms_in_cohort):
+    title = "Other terms in this cohort" if all_of else "Most frequent terms"
+    fig = px.bar(terms_in_cohort.rename_axis("Term").reset_index(), x="Rows", y="Term", orientation="h", title=title)
+    fig.update_yaxes(autorange="reversed")
+    st.plotly_chart(fig)
+
+#__________________Surgeries over time__________________
+trend_by = st.selectbox("Split surgeries by", [None, *DIMENSIONS],
+                        format_func=lambda d: "Nothing" if d is None else d.replace("_label", ""))
+trend = downsample(monthly_trend(cohort, trend_by), group=trend_by)
+fig = px.line(trend, x="SurgeryMonth", y="Surgeries", color=trend_by, title="Surgeries per month")
+st.plotly_chart(fig)
@@ -0,0 +1,66 @@
+# Compare Patients page
+# run -
+# streamlit run team2.py  (this page shows up in the sidebar)
+import re
+
+import streamlit as st
+
+from components import comparison_html
+from data_loader import load_patients
+from instrumentation import markdown, stage
+from patient_finder import get_patient_finder, patient_picker
+from patient_index import get_patient_index
+from risk_engine import risk_for
+from theme import get_theme_css
+from view_model import views_for
+
+MAX_PATIENTS = 6
+
+st.set_page_config(page_title="Compare Patients", layout="wide")
+st.markdown(get_theme_css(), unsafe_allow_html=True)
+
+#__________________Loading the data set______________
+data = load_patients()
+patient_index = get_patient_index(data)
+
+st.subheader("Compare Patients")
+
+
+def add_patient(pat_id):
+    # Runs before the text area is created on the next rerun, so it may change its value
+    current = st.session_state.get("compare_ids", "").strip()
+    st.session_state["compare_ids"] = f"{current}, {pat_id}" if current else pat_id
+
+
+#__________________Which patients__________________
+with st.expander("Find a patient to add"):
+    picked = patient_picker(get_patient_finder(data))
+    if picked is not None:
+        st.button(f"Add {picked}", on_click=add_patient, args=(picked,))
+raw_ids = st.text_area("Patient IDs", key="compare_ids", height=80,
+                       placeholder="PatIDs separated by commas, spaces or new lines")
+pat_ids = list(dict.fromkeys(i for i in re.split(r"[\s,;]+", raw_ids) if i))
+if len(pat_ids) > MAX_PATIENTS:
+    st.warning(f"Showing the first {MAX_PATIENTS} of {len(pat_ids)} patients.")
+    pat_ids = pat_ids[:MAX_PATIENTS]
+if not pat_ids:
+    st.info("Enter two or more patient IDs to compare them side by side.")
+    st.stop()
+
+#__________________One batched lookup, one shared render__________________
+with stage("compare_lookup"):
+    rows = patient_index.latest_rows_for(pat_ids)
+    found = rows[rows >= 0]
+    # Works from the patients' own rows while the full tables are still warming up
+    views = views_for(data, found)
+    scored = [risk_for(data, row) for row in found.tolist()]
+    patients = tuple((view, score, tuple(factors)) for view, (score, factors) in zip(views.views(found), scored))
+unknown = [pat_id for pat_id, row in zip(pat_ids, rows) if row < 0]
+if unknown:
+    st.warning(f"Not found: {', '.join(unknown)}")
+if not patients:
+    st.stop()
+
+with stage("compare_render"):
+    markdown(comparison_html(patients), unsafe_allow_html=True)
+st.caption("Each patient's most recent encounter.")
@@ -0,0 +1,150 @@
+# patient_finder.py
+# Server-side patient search so the browser only ever receives one page of IDs
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from patient_index import get_patient_index
+
+PAGE_SIZE = 50
+# Attributes that can narrow the search (taken from each patient's latest encounter)
+FILTER_COLUMNS = ["Gender_label", "Race_label", "Premature_label", "Syndrome_Present_bool"]
+
+
+class PatientFinder:
+    """Prefix/substring search over the sorted PatID list, returning bounded pages"""
+
+    def __init__(self, df, index):
+        latest = index.latest_rows()
+        self.ids = index.ids
+        self.attributes = {}
+        for col in FILTER_COLUMNS:
+            if col in df.columns:
+                values = df[col]
+                # Label columns stay categorical: comparing and listing values works on the codes
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    self.attributes[col] = values.array.take(latest)
+                else:
+                    self.attributes[col] = values.to_numpy()[latest]
+        self._subsets = {}
+        self._options = {}
+        self._lock = threading.Lock()  # the finder is shared by every session
+
+    def options(self, col):
+        # Asked for on every rerun, so computed once per finder
+        with self._lock:
+            if col not in self._options:
+                values = self.attributes[col]
+                self._options[col] = [True, False] if values.dtype == bool else sorted(pd.unique(values[pd.notna(values)]))
+            return list(self._options[col])
+
+    def _subset(self, filters, haystack=False):
+        """IDs (still sorted), plus a newline-joined haystack for substring search if asked for"""
+        key = tuple(sorted(filters.items()))
+        with self._lock:
+            subset = self._subsets.get(key)
+        if subset is None:
+            ids = self.ids
+            if filters:
+                mask = np.ones(len(ids), dtype=bool)
+                for col, value in filters.items():
+                    mask &= np.asarray(self.attributes[col] == value)
+                ids = ids[mask]
+            subset = [ids, None, None]
+            with self._lock:
+                # Only a handful of filter combinations are live at once
+                if len(self._subsets) >= 8:
+                    self._subsets.pop(next(iter(self._subsets)))
+                self._subsets[key] = subset
+        if haystack and subset[1] is None:
+            # Built on the first substring search only: the empty first page does not need it
+            ids = subset[0]
+            lengths = np.fromiter((len(i) + 1 for i in ids), dtype=np.int64, count=len(ids))
+            subset[2] = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+            subset[1] = "\n".join(ids)
+        return subset
+
+    def search(self, query="", filters=None, page=0, page_size=PAGE_SIZE, prefix=False):
+        """Return (ids on this page, whether more pages exist)"""
+        query = query.strip().replace("\n", "")
+        ids, haystack, starts = self._subset(filters or {}, haystack=bool(query) and not prefix)
+        first = page * page_size
+        if not query:
+            return list(ids[first:first + page_size]), len(ids) > first + page_size
+        if prefix:
+            lo, hi = np.searchsorted(ids, [query, query + "\uffff"])
+            return list(ids[lo + first:min(hi, lo + first + page_size)]), hi > lo + first + page_size
+
+        # Walk str.find hits through the joined IDs; each hit jumps to the next ID so
+        # a patient is only counted once. Stops one match past the requested page.
+        found = []
+        pos = haystack.find(query)
+        skipped = 0
+        while pos != -1:
+            slot = int(np.searchsorted(starts, pos, side="right")) - 1
+            if skipped < first:
+                skipped += 1
+            else:
+                if len(found) == page_size:
+                    return found, True
+                found.append(ids[slot])
+            if slot + 1 >= len(starts):
+                break
+            pos = haystack.find(query, int(starts[slot + 1]))
+        return found, False
+
+
+def get_patient_finder(data):
+    # No patcher: after an ingest it is rebuilt from the patched index (array gathers only)
+    return data.derived("patient_finder", lambda d: PatientFinder(d.df, get_patient_index(d)))
+
+
+def patient_picker(finder, label="Select Patient ID"):
+    """Search box + attribute filters + one page of results; returns the chosen PatID"""
+    search_col, mode_col = st.columns([3, 1])
+    with search_col:
+        query = st.text_input("Search Patient ID", key="finder_query", placeholder="Type part of a Patient ID")
+    with mode_col:
+        prefix = st.radio("Match", ["Contains", "Starts with"], key="finder_mode", horizontal=True) == "Starts with"
+
+    filters = {}
+    with st.expander("Filter patients"):
+        filter_cols = st.columns(len(finder.attributes) or 1)
+        for col, box in zip(finder.attributes, filter_cols):
+            with box:
+                choice = st.selectbox(
+                    col.replace("_label", "").replace("_bool", "").replace("_", " "),
+                    ["Any"] + finder.options(col),
+                    format_func=lambda v: {True: "Yes", False: "No"}.get(v, v) if isinstance(v, bool) else v,
+                    key=f"finder_{col}",
+                )
+            if choice != "Any":
+                filters[col] = choice
+
+    # Back to the first page whenever the search itself changes
+    search_key = (query, prefix, tuple(sorted(filters.items())))
+    if st.session_state.get("finder_key") != search_key:
+        st.session_state["finder_key"] = search_key
+        st.session_state["finder_page"] = 0
+    page = st.session_state["finder_page"]
+
+    matches, has_more = finder.search(query, filters, page=page, prefix=prefix)
+    if not matches:
+        st.info("No patients match this search.")
+        return None
+
+    pick_col, prev_col, next_col = st.columns([6, 1, 1])
+    with pick_col:
+        selected = st.selectbox(label, matches, key="finder_pick")
+    with prev_col:
+        if st.button("◀ Prev", disabled=page == 0):
+            st.session_state["finder_page"] = page - 1
+            st.rerun()
+    with next_col:
+        if st.button("Next ▶", disabled=not has_more):
+            st.session_state["finder_page"] = page + 1
+            st.rerun()
+    st.caption(f"Page {page + 1} · {len(matches)} patients shown" + (" · more on the next page" if has_more else ""))
+    return selected
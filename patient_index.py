@@ -0,0 +1,166 @@
+# patient_index.py
+# PatID -> row position lookup, built once per data version and patched on ingest
+import copy
+
+import numpy as np
+import pandas as pd
+
+from data_loader import grow, register_patcher
+
+
+def _surgery_keys(df, rows=None):
+    """CardSurgDt (of `rows`, default all) as int64 sort keys, or None without the column.
+
+    NaT is the int64 minimum, so undated encounters sort first and never become a
+    patient's latest row while a dated one exists.
+    """
+    if "CardSurgDt" not in df.columns:
+        return None
+    dates = df["CardSurgDt"] if rows is None else df["CardSurgDt"].iloc[rows]
+    return dates.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+class PatientIndex:
+    """Sorted patient IDs plus each patient's encounter rows.
+
+    Rows of one patient are stored contiguously in `order`, oldest surgery first,
+    so looking a patient up is a binary search over the sorted IDs and a slice -
+    no scan of the frame, and no per-patient Python objects, so every array can
+    be shared between server processes (shared.py). Patients touched by an
+    ingested delta keep their rows in `_overlay` instead, and patients it adds
+    sit in the small sorted `_added_ids`, which avoids regrouping or re-sorting
+    the whole registry.
+    """
+    __slots__ = ("_ids", "_sorted_slots", "_order", "_starts", "_counts", "_latest", "_overlay",
+                 "_added_ids", "_added_slots")
+
+    def __init__(self, df):
+        codes, uniques = pd.factorize(df["PatID"], sort=True)
+        surg = _surgery_keys(df)
+        if surg is not None:
+            order = np.lexsort((surg, codes))
+        else:
+            order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes, minlength=len(uniques))
+
+        self._ids = np.asarray(uniques, dtype=object)
+        self._sorted_slots = np.arange(len(self._ids), dtype=np.int64)  # slot of each entry of `_ids`
+        self._order = order.astype(np.int64)
+        self._counts = counts
+        self._starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+        self._latest = self._order[self._starts + self._counts - 1]
+        self._overlay = {}
+        self._added_ids = np.empty(0, dtype=object)
+        self._added_slots = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._ids) + len(self._added_ids)
+
+    def _merged(self):
+        """(sorted IDs, slot of each) over the built and the added patients"""
+        if not len(self._added_ids):
+            return self._ids, self._sorted_slots
+        where = np.searchsorted(self._ids, self._added_ids)
+        # Object dtype: an attached index stores IDs fixed-width, which would truncate longer new IDs
+        return (np.insert(self._ids.astype(object, copy=False), where, self._added_ids),
+                np.insert(self._sorted_slots, where, self._added_slots))
+
+    @property
+    def ids(self):
+        """Every patient ID, sorted"""
+        return self._merged()[0]
+
+    def _find(self, pat_id):
+        """Slot of `pat_id`, or -1 if unknown"""
+        for ids, slots in ((self._ids, self._sorted_slots), (self._added_ids, self._added_slots)):
+            pos = int(np.searchsorted(ids, pat_id))
+            if pos < len(ids) and ids[pos] == pat_id:
+                return int(slots[pos])
+        return -1
+
+    def __contains__(self, pat_id):
+        return self._find(pat_id) >= 0
+
+    def _slot(self, pat_id):
+        i = self._find(pat_id)
+        if i < 0:
+            raise KeyError(pat_id)
+        return i
+
+    def rows(self, pat_id):
+        """Row positions of every encounter for a patient, oldest surgery first (undated ones before that)"""
+        i = self._slot(pat_id)
+        if i in self._overlay:
+            return self._overlay[i]
+        start = self._starts[i]
+        return self._order[start:start + self._counts[i]]
+
+    def latest_row(self, pat_id):
+        """Row position of the patient's most recent encounter"""
+        return int(self._latest[self._slot(pat_id)])
+
+    def latest_rows_for(self, pat_ids):
+        """Latest encounter row for each of several patients in one pass (-1 if unknown)"""
+        rows = np.full(len(pat_ids), -1, dtype=np.int64)
+        if not len(pat_ids):
+            return rows
+        wanted = np.asarray(pat_ids, dtype=object)
+        for ids, slots in ((self._ids, self._sorted_slots), (self._added_ids, self._added_slots)):
+            if not len(ids):
+                continue
+            pos = np.searchsorted(ids, wanted).clip(max=len(ids) - 1)
+            known = ids[pos] == wanted
+            rows[known] = self._latest[slots[pos[known]]]
+        return rows
+
+    def latest_rows(self):
+        """Most recent encounter row for every patient, aligned with `ids`"""
+        return self._latest[self._merged()[1]]
+
+    def patched(self, df, batch):
+        """Copy of the index including the batch's appended rows.
+
+        Updated rows keep their position and key, so only appends matter. Cost is
+        per appended row (and per patient added since the index was built); the
+        built arrays are shared, `_latest` grows in place (data_loader.grow).
+        """
+        if not len(batch.appended):
+            return self
+        new = copy.copy(self)
+        new._overlay = dict(self._overlay)
+        dated = "CardSurgDt" in df.columns
+        latest = {}  # slot -> latest row, for slots this batch touches
+        added = {}  # patients new in this batch -> slot
+        pat_ids = batch.rows["PatID"].to_numpy(dtype=object)[len(batch.updated):]
+        for pos, pat_id in zip(batch.appended.tolist(), pat_ids):
+            slot = added.get(pat_id, self._find(pat_id))
+            if slot < 0:
+                slot = len(self) + len(added)
+                added[pat_id] = slot
+                new._overlay[slot] = np.array([pos], dtype=np.int64)
+                latest[slot] = pos
+                continue
+            rows = np.append(new._overlay[slot] if slot in new._overlay else self.rows(pat_id), pos)
+            if dated:
+                rows = rows[np.argsort(_surgery_keys(df, rows), kind="stable")]
+            new._overlay[slot] = rows
+            latest[slot] = rows[-1]
+        first_new = len(self)
+        new._latest = grow(self._latest, np.array([latest[s] for s in range(first_new, first_new + len(added))],
+                                                  dtype=np.int64))
+        for slot, row in latest.items():
+            if slot < first_new:
+                new._latest[slot] = row
+        if added:
+            new_ids = np.array(sorted(added), dtype=object)
+            where = np.searchsorted(self._added_ids, new_ids)
+            new._added_ids = np.insert(self._added_ids, where, new_ids)
+            new._added_slots = np.insert(self._added_slots, where, [added[i] for i in new_ids])
+        return new
+
+
+def get_patient_index(data):
+    return data.derived("patient_index", lambda d: PatientIndex(d.df))
+
+
+register_patcher("patient_index", lambda index, old, new, batch: index.patched(new.df, batch))
@@ -0,0 +1,125 @@
+# risk_engine.py
+# Cohort-wide risk scores: the same weights as the manual picker, derived from the data
+import numpy as np
+import pandas as pd
+
+from data_loader import ABNORMALITY_COLUMNS, ABSENT_TERMS, grow, named_terms, register_patcher
+
+WEIGHTS = {"Premature": 2.5, "Low birth weight": 2.0, "Co-morbidity": 1.5, "Genetic syndrome": 1.5, "Recent infection": 1.0, "Post-op bleed": 3.0}
+RISK_FACTORS = list(WEIGHTS)
+MAX_SCORE = 10.0
+
+NCAA_COLUMNS = [c for c in ABNORMALITY_COLUMNS if c.startswith("NCAA")]
+INFECTION_FLAGS = ["CompCLABSI", "CompUTI", "CompWoundInf"]
+BIRTH_WEIGHT_COLUMN = "BirthWtKg"
+LOW_BIRTH_WEIGHT_KG = 2.5
+
+
+def clamp_score(score):
+    return np.clip(score, 0.0, MAX_SCORE)
+
+
+def score_selection(selection):
+    """Score for a manually picked list of risk factors"""
+    return float(clamp_score(sum(WEIGHTS.get(x, 0) for x in selection)))
+
+
+def _flag(df, col):
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return (df[col] == 1).fillna(False).to_numpy(dtype=bool)
+
+
+def _present(df, col):
+    """True where a free-text term column holds a real value (not NULL/0/placeholder)"""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    values = df[col]
+    return (values.notna() & ~values.isin(ABSENT_TERMS)).to_numpy(dtype=bool)
+
+
+def _named_term(df, col):
+    """True where a term column names an actual term; blanks and placeholders such as
+    "No syndromic abnormality identified" or "Column Not Found" do not count"""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return named_terms(df[col])
+
+
+def _has_date(df, col):
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return df[col].notna().to_numpy(dtype=bool)
+
+
+def derive_factors(df):
+    """Boolean matrix (rows x RISK_FACTORS) of which factors each row has"""
+    n = len(df)
+    if BIRTH_WEIGHT_COLUMN in df.columns:
+        low_weight = (pd.to_numeric(df[BIRTH_WEIGHT_COLUMN], errors="coerce") < LOW_BIRTH_WEIGHT_KG).to_numpy(dtype=bool)
+    else:
+        low_weight = np.zeros(n, dtype=bool)
+    comorbidity = np.zeros(n, dtype=bool)
+    for col in NCAA_COLUMNS:
+        comorbidity |= _present(df, col)
+    syndrome = _present(df, "ChromAbTerm") | _named_term(df, "SyndromeTerm")
+    infection = _has_date(df, "CompSepsisDt")
+    for col in INFECTION_FLAGS:
+        infection = infection | _flag(df, col)
+
+    columns = {
+        "Premature": _flag(df, "Premature"),
+        "Low birth weight": low_weight,
+        "Co-morbidity": comorbidity,
+        "Genetic syndrome": syndrome,
+        "Recent infection": infection,
+        "Post-op bleed": _has_date(df, "CompReopBleedDtTm"),
+    }
+    return np.column_stack([columns[f] for f in RISK_FACTORS]) if n else np.zeros((0, len(RISK_FACTORS)), dtype=bool)
+
+
+def _score(factors):
+    weights = np.array([WEIGHTS[f] for f in RISK_FACTORS], dtype=np.float32)
+    return clamp_score(factors.astype(np.float32) @ weights)
+
+
+class RiskScores:
+    """Per-row factor flags and clamped 0-10 scores, aligned with the frame"""
+    __slots__ = ("factors", "scores")
+
+    def __init__(self, df):
+        self._set(derive_factors(df))
+
+    def _set(self, factors):
+        self.factors = factors
+        self.scores = _score(factors)
+
+    def factors_for(self, row):
+        return [f for f, on in zip(RISK_FACTORS, self.factors[row]) if on]
+
+    def patched(self, batch):
+        """Copy with only the batch's updated and appended rows re-derived (in place, see data_loader.grow)"""
+        factors = derive_factors(batch.rows)
+        scores = _score(factors)
+        new = RiskScores.__new__(RiskScores)
+        new.factors = grow(self.factors, factors[len(batch.updated):])
+        new.factors[batch.updated] = factors[:len(batch.updated)]
+        new.scores = grow(self.scores, scores[len(batch.updated):])
+        new.scores[batch.updated] = scores[:len(batch.updated)]
+        return new
+
+
+def risk_for(data, row):
+    """(score, factors) of one row without waiting for the cohort-wide scores"""
+    if data.is_built("risk_scores"):
+        risk = get_risk_scores(data)
+        return float(risk.scores[row]), risk.factors_for(row)
+    risk = RiskScores(data.df.iloc[row:row + 1])
+    return float(risk.scores[0]), risk.factors_for(0)
+
+
+def get_risk_scores(data):
+    return data.derived("risk_scores", lambda d: RiskScores(d.df))
+
+
+register_patcher("risk_scores", lambda risk, old, new, batch: risk.patched(batch))
@@ -0,0 +1,218 @@
+# shared.py
+# Shared-data mode for running several server processes: the prepared frame and its
+# indexes are published once as memory-mapped files, and every worker attaches to the
+# same pages instead of parsing and indexing its own copy
+# run -
+# python shared.py [data.csv]    publish ahead of starting the workers (else the first worker does)
+# DASHBOARD_LOADER=shared streamlit run team2.py --server.port 8501    (one per worker)
+import argparse
+import fcntl
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from cohort import SurgeryDates, get_surgery_dates
+from data_loader import (DATA_PATH, SNAPSHOT_SCHEMA, LoadedData, _load_from_snapshot, data_version,
+                         read_snapshot, snapshot_path)
+from ingest import apply_pending_deltas, read_manifest
+from patient_index import PatientIndex, get_patient_index
+from risk_engine import RiskScores, get_risk_scores
+from terms import TermIndex, get_term_index
+from view_model import ViewTable, get_view_table
+
+logger = logging.getLogger(__name__)
+
+# Derived structures published with the frame. Their arrays are mapped read-only;
+# everything else a worker builds (search, cube, warmup) is small or per-session.
+SHARED = {
+    "patient_index": (PatientIndex, get_patient_index),
+    "risk_scores": (RiskScores, get_risk_scores),
+    "surgery_dates": (SurgeryDates, get_surgery_dates),
+    "term_index": (TermIndex, get_term_index),
+    "view_table": (ViewTable, get_view_table),
+}
+FRAME = "frame.arrow"
+MANIFEST = "manifest.json"
+
+
+def shared_dir(path):
+    return os.path.splitext(path)[0] + ".shared"
+
+
+def head_version(path, base_version):
+    """Version a worker should attach to: the file's content plus every ingested delta"""
+    manifest = read_manifest(path)
+    deltas = len(manifest["entries"]) if manifest["base_version"] == base_version else 0
+    return f"{base_version}+{deltas}" if deltas else base_version
+
+
+def _published(directory):
+    """Whether `directory` holds a complete publish in the current frame schema"""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as fh:
+            return json.load(fh).get("schema") == SNAPSHOT_SCHEMA
+    except FileNotFoundError:
+        return False
+
+
+#__________________Writing__________________
+
+def _write_columns(target, columns):
+    """List of 1-D arrays -> one uncompressed Arrow file; text is stored as large_string"""
+    arrays = [pa.array(col, type=pa.large_string()) if col.dtype == object else pa.array(col) for col in columns]
+    table = pa.table(arrays, names=[str(i) for i in range(len(arrays))])
+    with pa.OSFile(target, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _save(obj, directory, name):
+    """Every ndarray slot of `obj` as .npy (list-of-array slots as Arrow), the rest pickled"""
+    state = {}
+    for slot in type(obj).__slots__:
+        value = getattr(obj, slot)
+        if isinstance(value, np.ndarray):
+            # Object arrays cannot be mapped; IDs are short, so fixed-width text is fine
+            np.save(os.path.join(directory, f"{name}.{slot}.npy"), value.astype(str) if value.dtype == object else value)
+        elif isinstance(value, list) and value and all(isinstance(v, np.ndarray) for v in value):
+            _write_columns(os.path.join(directory, f"{name}.{slot}.arrow"), value)
+        else:
+            state[slot] = value
+    with open(os.path.join(directory, f"{name}.pickle"), "wb") as fh:
+        pickle.dump(state, fh)
+
+
+def _write_frame(data, target):
+    if not data.deltas:
+        # The snapshot already is the prepared frame: link it, so the pages are shared with it too
+        try:
+            os.link(snapshot_path(data.path), target)
+            return
+        except OSError:
+            pass
+    table = pa.Table.from_pandas(data.df, preserve_index=False)
+    with pa.OSFile(target, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def publish(path=DATA_PATH, version=None):
+    """Write the frame and SHARED structures for the current head version, unless a
+    worker already did. Returns the directory workers attach to."""
+    base = data_version(path)
+    version = version or head_version(path, base)
+    root = shared_dir(path)
+    os.makedirs(root, exist_ok=True)
+    directory = os.path.join(root, version)
+    with open(os.path.join(root, ".lock"), "w") as lock:
+        # One publisher at a time; workers arriving meanwhile wait here, then attach
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if _published(directory):
+            return directory
+        start = time.perf_counter()
+        df, missing = _load_from_snapshot(path, base)
+        data = apply_pending_deltas(LoadedData(df=df, version=base, load_seconds=0.0, missing_columns=missing, path=path), path)
+        if data.version != version:
+            # Another delta was ingested meanwhile: publish the newer head instead
+            version, directory = data.version, os.path.join(root, data.version)
+            if _published(directory):
+                return directory
+        tmp = directory + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        _write_frame(data, os.path.join(tmp, FRAME))
+        for name, (_, build) in SHARED.items():
+            _save(build(data), tmp, name)
+        with open(os.path.join(tmp, MANIFEST), "w") as fh:
+            json.dump({"version": version, "schema": SNAPSHOT_SCHEMA, "rows": len(data.df),
+                       "missing_columns": list(missing), "structures": list(SHARED), "published_at": time.time()},
+                      fh, indent=1)
+        shutil.rmtree(directory, ignore_errors=True)  # published in an older schema
+        os.replace(tmp, directory)
+        # Older versions go; workers still mapping them keep their (unlinked) files until they move on
+        for old in os.listdir(root):
+            if old not in (version, ".lock") and not old.endswith(".tmp"):
+                shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+        logger.info("Published %s (%d rows) to %s in %.2fs", version, len(data.df), directory, time.perf_counter() - start)
+    return directory
+
+
+#__________________Attaching__________________
+
+def _read_columns(source):
+    """Inverse of `_write_columns`: text stays Arrow (views of the mapped file), numbers become numpy views"""
+    table = pa.ipc.open_file(pa.memory_map(source)).read_all()
+    columns = []
+    for col in table.columns:
+        if pa.types.is_large_string(col.type):
+            columns.append(pd.arrays.ArrowStringArray(col))
+        else:
+            columns.append(col.to_numpy())
+    return columns
+
+
+def _attach_structure(cls, directory, name):
+    with open(os.path.join(directory, f"{name}.pickle"), "rb") as fh:
+        state = pickle.load(fh)
+    obj = cls.__new__(cls)
+    for slot in cls.__slots__:
+        stem = os.path.join(directory, f"{name}.{slot}")
+        if slot in state:
+            value = state[slot]
+        elif os.path.exists(stem + ".npy"):
+            value = np.load(stem + ".npy", mmap_mode="r")
+        else:
+            value = _read_columns(stem + ".arrow")
+        setattr(obj, slot, value)
+    return obj
+
+
+def attach(path, version):
+    """LoadedData whose frame and SHARED structures are read-only maps of the published files"""
+    start = time.perf_counter()
+    directory = os.path.join(shared_dir(path), version)
+    if not _published(directory):
+        directory = publish(path, version)
+    with open(os.path.join(directory, MANIFEST)) as fh:
+        manifest = json.load(fh)
+    df = read_snapshot(os.path.join(directory, FRAME))
+    structures = {name: _attach_structure(cls, directory, name) for name, (cls, _) in SHARED.items()}
+    elapsed = time.perf_counter() - start
+    version = manifest["version"]
+    data = LoadedData(df=df, version=version, load_seconds=elapsed, missing_columns=tuple(manifest["missing_columns"]),
+                      deltas=int(version.partition("+")[2] or 0), path=path)
+    for name, structure in structures.items():
+        data.derived(name, lambda d, s=structure: s)
+    logger.info("Attached %s (%d rows) from %s in %.3fs", version, len(df), directory, elapsed)
+    return data
+
+
+@st.cache_resource(show_spinner="Attaching to the shared registry...", max_entries=1)
+def _attached(path, version):
+    return attach(path, version)
+
+
+def load_shared(path=DATA_PATH):
+    """data_loader.load_patients for DASHBOARD_LOADER=shared.
+
+    Deltas are not patched per worker (that would copy the mapped arrays into each
+    process): the first worker to see a new delta publishes the new head version
+    and every worker re-attaches to it.
+    """
+    return _attached(path, head_version(path, data_version(path)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the prepared registry for DASHBOARD_LOADER=shared workers")
+    parser.add_argument("path", nargs="?", default=DATA_PATH)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    directory = publish(args.path)
+    size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+    print(f"Published {directory} ({size / 1e6:,.0f} MB) in {time.perf_counter() - start:.1f}s")
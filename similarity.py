@@ -0,0 +1,141 @@
+# similarity.py
+# "Similar patients": nearest neighbours over an encoded feature vector per patient
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import ABSENT_TERMS
+from patient_index import get_patient_index
+from risk_engine import NCAA_COLUMNS, _flag, _named_term, _present
+
+logger = logging.getLogger(__name__)
+
+FEATURE_VERSION = 2  # bump when the encoding changes so persisted indexes are rebuilt
+CATEGORICAL = ["Gender_label", "Race_label", "Ethnicity_label"]
+NUMERIC = ["AgeAtSurgeryDays", "Shunt Size"]
+TOP_NCAA_TERMS = 12  # most frequent non-cardiac anomaly terms, one feature each
+NCAA_WEIGHT = 0.5    # a differing anomaly term counts half as much as a differing sex/race
+LEAF_SIZE = 40
+
+
+class FeatureEncoder:
+    """Registry rows -> fixed-width float32 vectors, fitted once per data version.
+
+    Weighted so that one differing category, flag or 1 IQR of age/shunt size
+    each add about 1 to the squared distance.
+    """
+
+    def __init__(self, df):
+        self.categories = {col: list(df[col].cat.categories) for col in CATEGORICAL if col in df.columns}
+        self.numeric = {}
+        for col in NUMERIC:
+            if col in df.columns:
+                values = pd.to_numeric(df[col], errors="coerce").astype("float64")
+                q1, median, q3 = values.quantile([0.25, 0.5, 0.75]).fillna(0.0)
+                self.numeric[col] = (median, (q3 - q1) or 1.0)
+        terms = pd.concat([df[col] for col in NCAA_COLUMNS if col in df.columns], ignore_index=True)
+        terms = terms[terms.notna() & ~terms.isin(ABSENT_TERMS)]
+        self.terms = list(terms.value_counts().index[:TOP_NCAA_TERMS])
+
+    def transform(self, df):
+        n = len(df)
+        parts = []
+        for col, categories in self.categories.items():
+            codes = pd.Categorical(df[col], categories=categories).codes
+            onehot = np.zeros((n, len(categories)), dtype=np.float32)
+            onehot[np.flatnonzero(codes >= 0), codes[codes >= 0]] = np.sqrt(0.5)
+            parts.append(onehot)
+        for col, (median, scale) in self.numeric.items():
+            values = pd.to_numeric(df[col], errors="coerce").astype("float64").fillna(median).to_numpy()
+            parts.append(((values - median) / scale).astype(np.float32)[:, None])
+        flags = [_flag(df, "Premature"), _present(df, "ChromAbTerm"), _named_term(df, "SyndromeTerm")]
+        parts.append(np.column_stack(flags).astype(np.float32))
+        if self.terms:
+            ncaa = np.zeros((n, len(self.terms)), dtype=np.float32)
+            for col in NCAA_COLUMNS:
+                if col in df.columns:
+                    codes = pd.Categorical(df[col], categories=self.terms).codes
+                    ncaa[np.flatnonzero(codes >= 0), codes[codes >= 0]] = NCAA_WEIGHT
+            parts.append(ncaa)
+        return np.hstack(parts)
+
+
+class SimilarPatients:
+    """KD-tree over every patient's latest encounter.
+
+    The features are mostly one-hot, i.e. axis aligned, which suits a KD-tree: at
+    1M rows it answers in ~4 ms where a ball tree needed ~40 ms.
+    """
+    __slots__ = ("version", "encoder", "ids", "rows", "tree")
+
+    def __init__(self, df, index, version):
+        self.version = version
+        self.encoder = FeatureEncoder(df)
+        self.ids = index.ids
+        self.rows = index.latest_rows()
+        # sklearn takes ~1 s to import; only paid once someone asks for similar patients
+        from sklearn.neighbors import KDTree
+        self.tree = KDTree(self.encoder.transform(df.iloc[self.rows]), leaf_size=LEAF_SIZE)
+
+    def query(self, df, row, k=10, exclude=None):
+        """(rows, distances) of the `k` patients closest to encounter `row`, nearest first.
+
+        `exclude` (usually the patient's own ID) is skipped, so one extra neighbour is fetched.
+        """
+        # A one-row slice is a view; a list take would copy from every 1M-row column
+        point = self.encoder.transform(df.iloc[row:row + 1])
+        distances, slots = self.tree.query(point, k=min(k + 1, len(self.rows)))
+        keep = self.ids[slots[0]] != exclude
+        return self.rows[slots[0]][keep][:k], distances[0][keep][:k]
+
+
+#__________________Built once per data version, persisted next to the data__________________
+
+def index_path(data):
+    return os.path.splitext(data.path)[0] + ".similar.joblib" if data.path else None
+
+
+def _load_or_build(data):
+    import joblib
+    path = index_path(data)
+    if path and os.path.exists(path):
+        try:
+            stored = joblib.load(path)
+            if stored.get("feature_version") == FEATURE_VERSION and stored["model"].version == data.version:
+                return stored["model"]
+        except Exception:
+            # A truncated or incompatible file is just rebuilt
+            logger.exception("Ignoring unreadable similarity index %s", path)
+    model = SimilarPatients(data.df, get_patient_index(data), data.version)
+    if path:
+        try:
+            joblib.dump({"feature_version": FEATURE_VERSION, "model": model}, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        except OSError:
+            logger.exception("Could not persist similarity index to %s", path)
+    return model
+
+
+def get_similar_patients(data):
+    # No patcher: a tree cannot take inserts, so an ingested delta rebuilds it on next use
+    return data.derived("similar_patients", _load_or_build)
+
+
+def outcomes_table(views, risk, rows, distances):
+    """Display frame for neighbours: identity, distance and what happened to them"""
+    patients = views.views(rows)
+    return pd.DataFrame({
+        "PatID": [v.pat_id for v in patients],
+        "Distance": np.round(distances, 2),
+        "Risk": np.round(risk.scores[rows], 1),
+        "Surgery": [v.surgery_date for v in patients],
+        "Sepsis": [v.sepsis_date for v in patients],
+        "Post-op bleed": [v.bleed_date for v in patients],
+        "Cardiac arrest": [v.cardiac_arrest_date for v in patients],
+        "CLABSI": [v.clabsi for v in patients],
+        "UTI": [v.uti for v in patients],
+        "Wound infection": [v.wound_infection for v in patients],
+        "Discharge": [v.discharge_date for v in patients],
+    })
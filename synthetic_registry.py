@@ -0,0 +1,94 @@
+# synthetic_registry.py
+# Fake registry exports with the real column layout, for benchmarks and load tests
+# run -
+# python synthetic_registry.py 100k registry_100k.csv [--seed 0]
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DISCHARGE_COLUMN, NO_SYNDROME, FETAL_DRUG_EXPOSURE
+
+CHUNK_ROWS = 100_000
+REPEAT_PATIENTS = 0.1  # share of rows that are a further encounter of an earlier patient
+NCAA_TERMS = ["Hypospadias", "Cleft lip", "Tracheomalacia", "Inguinal hernia", "Duodenal atresia",
+              "Hydronephrosis", "NULL", "0", None, None, None, None]
+CHROM_TERMS = ["No chromosomal abnormality identified"] * 8 + ["Trisomy 21", "22q11 deletion"]
+SYNDROME_TERMS = [NO_SYNDROME] * 8 + ["DiGeorge syndrome", FETAL_DRUG_EXPOSURE]
+NOTE_WORDS = np.array(("hypoplastic left heart aortic atresia mitral stenosis restrictive septum "
+                       "Norwood Sano shunt desaturation episode \"managed\" with O2, resolved").split())
+
+
+def parse_size(text):
+    """'1k' / '100k' / '1M' / '2500' -> row count"""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def _maybe_dates(rng, base, days, share, fmt):
+    values = (base + pd.to_timedelta(days, unit="D")).strftime(fmt).to_numpy(dtype=object)
+    values[rng.random(len(values)) > share] = None
+    return values
+
+
+def _notes(rng, n, words, share=1.0):
+    # A few hundred distinct notes reused across rows keeps generation fast at 1M rows
+    pool = [" ".join(rng.choice(NOTE_WORDS, words)) for _ in range(256)]
+    pool[1::4] = [p + "\nfollow-up: stable" for p in pool[1::4]]  # embedded line breaks, as in the export
+    notes = np.array(pool, dtype=object)[rng.integers(0, len(pool), n)]
+    notes[rng.random(n) > share] = None
+    return notes
+
+
+def generate(n, seed=0, first_row=0):
+    """`n` registry rows; rows from different chunks never share a PatID by accident"""
+    rng = np.random.default_rng([seed, first_row])
+    pat_ids = np.char.add("P", (np.arange(first_row, first_row + n) * 7919 % 10_000_019).astype(str)).astype(object)
+    repeat = np.flatnonzero(rng.random(n) < REPEAT_PATIENTS)
+    repeat = repeat[repeat > 0]
+    pat_ids[repeat] = pat_ids[rng.integers(0, repeat)]  # re-use an earlier patient of this chunk
+    surgery = pd.Timestamp("2008-01-01") + pd.to_timedelta(rng.integers(0, 6000, n), unit="D")
+    age = rng.integers(1, 180, n)
+    return pd.DataFrame({
+        "PatID": pat_ids,
+        "Gender": rng.choice([0, 1, np.nan], n, p=[0.47, 0.5, 0.03]),
+        "Race": rng.choice([1, 2, 3, 4, 5, 6, 7, np.nan], n, p=[0.55, 0.18, 0.08, 0.02, 0.01, 0.01, 0.1, 0.05]),
+        "Ethnicity": rng.choice([0, 1, 2], n, p=[0.75, 0.2, 0.05]),
+        "Premature": rng.choice([0, 1, np.nan], n, p=[0.78, 0.2, 0.02]),
+        "BirthWtKg": np.round(rng.normal(3.1, 0.6, n), 2),
+        "DOB": (surgery - pd.to_timedelta(age, unit="D")).strftime("%m/%d/%Y"),
+        "AgeAtSurgeryDays": age,
+        "Shunt Size": rng.choice([3.0, 3.5, 4.0, np.nan], n, p=[0.3, 0.4, 0.2, 0.1]),
+        "CardSurgDt": surgery.strftime("%m/%d/%Y"),
+        "CompReopBleedDtTm": _maybe_dates(rng, surgery, rng.integers(1, 10, n) + rng.random(n), 0.08, "%m/%d/%Y %H:%M"),
+        "CompSepsisDt": _maybe_dates(rng, surgery, rng.integers(2, 30, n), 0.1, "%m/%d/%Y"),
+        "CardArrestDtTm": _maybe_dates(rng, surgery, rng.integers(0, 20, n) + rng.random(n), 0.05, "%m/%d/%Y %H:%M"),
+        DISCHARGE_COLUMN: _maybe_dates(rng, surgery, rng.integers(10, 120, n), 0.95, "%m/%d/%Y"),
+        "CompCLABSI": rng.choice([0, 1], n, p=[0.95, 0.05]),
+        "CompUTI": rng.choice([0, 1], n, p=[0.96, 0.04]),
+        "CompWoundInf": rng.choice([0, 1], n, p=[0.97, 0.03]),
+        "SyndromeTerm": rng.choice(np.array(SYNDROME_TERMS, dtype=object), n),
+        "ChromAbTerm": rng.choice(np.array(CHROM_TERMS, dtype=object), n),
+        **{f"NCAA{i}": rng.choice(np.array(NCAA_TERMS, dtype=object), n) for i in range(1, 6)},
+        "Cardiac Anatomy Notes": _notes(rng, n, 40),
+        "SH Notes": _notes(rng, n, 20, share=0.4),
+    })
+
+
+def write_csv(path, n, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write `n` rows in chunks, so memory stays flat for large sizes"""
+    for first in range(0, n, chunk_rows):
+        chunk = generate(min(chunk_rows, n - first), seed, first)
+        chunk.to_csv(path, mode="w" if first == 0 else "a", header=first == 0, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic registry export")
+    parser.add_argument("size", help="row count, e.g. 1k, 100k, 1M")
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_csv(args.path, parse_size(args.size), args.seed)
+    print(f"Wrote {parse_size(args.size):,} rows to {args.path}")
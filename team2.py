@@ -1,454 +1,138 @@
 # app.py
 # run - 
 # streamlit run team2.py
-import streamlit as st
-import datetime as dt
-import math
-import pandas as pd
-import plotly.express as px
+import time
+run_start = time.perf_counter()
 
-#__________________Loading the data set______________
+import streamlit as st
 
-df = pd.read_csv("MS_copy_DeID_Complete.csv")
-df['PatID'] = df['PatID'].astype(str)
-def get_patient_value(data, key, default="_"):
-    val = data[key] 
-    if pd.isna(val):
-        return default
-    return val
-#__________________Data Preparation__________________
-
-df['Gender_label'] = df['Gender'].map({0: "Girl", 1: "Boy"}).fillna("Unknown")
-df['Premature_label'] = df['Premature'].map({0: "No", 1: "Yes"}).fillna("Unknown")
-
-race_map = {1: 'White',2: 'Black',3: 'Asian', 4: 'American Indian', 5: 'Native Hawaiian', 6: 'Other Pacific Islander'}
-df['Race_label'] = df['Race'].map(race_map).fillna('Other/Unknown')
-
-ethnicity_map = { 0: 'Non-Hispanic', 1: 'Hispanic/Latino', 2: 'Other/Unknown' }
-df['Ethnicity_label'] = df['Ethnicity'].map(ethnicity_map).fillna('Other/Unknown')
-
-if 'SyndromeTerm' in df.columns:
-    df['Syndrome_Present_bool'] = df['SyndromeTerm'] != "No syndromic abnormality identified"    
-    df['Fetal_Drug_Exposure_label'] = df['SyndromeTerm'].apply(
-        lambda x: "Yes" if x == "Fetal drug exposure" else "No")
-else:
-    st.warning("Warning: 'SyndromeTerm' column not found. Using default values.")
-    df['SyndromeTerm'] = "Column Not Found"
-    df['Syndrome_Present_bool'] = False
-    df['Fetal_Drug_Exposure_label'] = "No"
+from components import gauge_svg, intervals_html, shunt_scale_html, timeline_html
+from data_loader import load_patients
+from instrumentation import debug_panel, end_run, markdown, record_duration, stage, start_run, timed
+from patient_finder import get_patient_finder, patient_picker
+from patient_index import get_patient_index
+from risk_engine import RISK_FACTORS, get_risk_scores, risk_for, score_selection
+from similarity import get_similar_patients, outcomes_table
+from theme import get_theme_css, theme_marker
+from view_model import get_view_table, views_for
+from warmup import placeholder, progress_panel, start_warmup
 
 st.set_page_config(page_title="Pediatric Dashboard", layout="wide")
+# Stage timings and markdown payload per rerun (instrumentation.py)
+run = start_run(run_start)
 
-# ----------------- THEME FUNCTION -----------------
-def get_theme_css(sex):
-    """Generate theme CSS based on gender selection"""
-    if sex == "Boy":
-        # Boy theme - Blue colors
-        theme = {
-            "bg": "#EFF4F8",
-            "panel": "#E8F1FA",
-            "border": "#B8D4E8",
-            "ink": "#1b1e28",
-            "pill": "#EAF3FF",
-            "pillborder": "#C7DBFF",
-            "hover": "#D6EBFF",
-            "selected": "#C7E3FF",
-            "card_shadow": "#d0e0f0",
-            "panel_border": "#A8C8E0",
-            "header_bg": "#A8C8E8",
-            "header_border": "#8BB5D8",
-            "iconbox1_border": "#7BB3D0",
-            "iconbox1_bg": "#C8E3F5",
-            "iconbox2_border": "#9DB8C8",
-            "iconbox2_bg": "#D0E8F5",
-            "iconbox3_border": "#6BA5C8",
-            "iconbox3_bg": "#B8DDF5",
-            "eventbox_shadow": "#d0e0f0"
-        }
-    else:
-        # Girl theme - Pink colors (default)
-        theme = {
-            "bg": "#F6EFEF",
-            "panel": "#FBECEC",
-            "border": "#E1C1C3",
-            "ink": "#1b1e28",
-            "pill": "#EAF3FF",
-            "pillborder": "#C7DBFF",
-            "hover": "#EEF4FF",
-            "selected": "#FFE7EC",
-            "card_shadow": "#f6d8da",
-            "panel_border": "#e8c7cf",
-            "header_bg": "#f7c8d8",
-            "header_border": "#eab2c6",
-            "iconbox1_border": "#E7B6C0",
-            "iconbox1_bg": "#FFD7E2",
-            "iconbox2_border": "#F0C994",
-            "iconbox2_bg": "#FFE8C6",
-            "iconbox3_border": "#B6D7FF",
-            "iconbox3_bg": "#D0E9FF",
-            "eventbox_shadow": "#f6d8da"
-        }
-    
-    return f"""
-<style>
-
-/* Keep Streamlit header visible */
-#MainMenu {{visibility: visible !important;}}
-.block-container{{padding-top:6px !important; max-width:1320px;}}
-
-.block-container {{
-        padding-top: 3rem !important;
-    }}
-
-/* Theme - {'Boy' if sex == 'Boy' else 'Girl'} */
-:root{{
-  --bg:{theme['bg']}; --panel:{theme['panel']}; --border:{theme['border']}; --ink:{theme['ink']};
-  --pill:{theme['pill']}; --pillborder:{theme['pillborder']}; --hover:{theme['hover']}; --selected:{theme['selected']};
-}}
-[data-testid="stAppViewContainer"]{{background:var(--bg);}}
-h1,h2,h3,h4,p,div,span{{color:var(--ink);}}
-
-/* Cards & layout bits */
-.card{{background:#fff;border:2px solid var(--border);border-radius:16px;padding:12px 14px;box-shadow:0 2px 0 {theme['card_shadow']} inset;margin-bottom:12px;}}
-.pinkpanel{{background:var(--panel);border:2px solid {theme['panel_border']};border-radius:10px;overflow:hidden;}}
-.headerpink{{background:{theme['header_bg']};border-bottom:2px solid {theme['header_border']};padding:10px 14px;font-weight:900;text-align:center;}}
-.pill-blue{{display:inline-block;padding:6px 14px;border-radius:999px;background:#d6e7ff;border:1px solid #bcd6ff;font-weight:900;}}
-.iconrow{{display:flex;gap:14px;justify-content:center;padding:12px 0 6px;}}
-.iconbox, .iconbox2, .iconbox3{{
-  width:70px;height:70px;display:flex;align-items:center;justify-content:center;border-radius:12px;font-size:36px;
-}}
-.iconbox{{border:2px solid {theme['iconbox1_border']};background:{theme['iconbox1_bg']};}}
-.iconbox2{{border:2px solid {theme['iconbox2_border']};background:{theme['iconbox2_bg']};}}
-.iconbox3{{border:2px solid {theme['iconbox3_border']};background:{theme['iconbox3_bg']};}}
-.sel{{ outline:3px solid #3B82F6; box-shadow:0 0 0 2px #93C5FD inset; }}
-
-.right{{text-align:right;}} .center{{text-align:center;}} .red{{color:#C6002A;font-weight:900;}}
-
-/* Timeline */
-.timelinewrap{{padding:12px;}}
-.vert{{position:relative;height:520px;margin:0 24px;}}
-.vert:before{{content:"";position:absolute;left:50%;top:18px;bottom:18px;width:2px;background:#111;transform:translateX(-50%);}}
-.vert:after{{content:"";position:absolute;left:40px;right:40px;top:6px;height:2px;background:#111;}}
-.hbot{{position:absolute;left:40px;right:40px;bottom:6px;height:2px;background:#111;}}
-.tick{{position:absolute;left:50%;transform:translateX(-50%);}}
-.tick .dot{{position:absolute;left:-4px;top:-4px;width:8px;height:8px;background:#111;border-radius:50%;}}
-.tick .lbl{{position:absolute;left:20px;top:-10px;width:230px;font-weight:700;}}
-
-
-/* Event-look boxes */
-.eventbox{{border:2px solid var(--border);border-radius:16px;padding:12px;background:#fff;box-shadow:0 2px 0 {theme['eventbox_shadow']} inset;}}
-.eventtitle{{font-weight:900;margin:10px 0 6px;}}
-.addbtn{{display:inline-block;background:#fff;border:2px solid var(--border);border-radius:999px;padding:8px 20px;font-weight:900;box-shadow:0 2px 0 {theme['eventbox_shadow']} inset;}}
-
-/* ===== DROPDOWN STYLES - HIGH CONTRAST WHITE BACKGROUND ===== */
-.stSelectbox div[data-baseweb="select"] > div,
-.stMultiSelect div[data-baseweb="select"] > div{{
-  background:#FFFFFF !important; 
-  background-color:#FFFFFF !important; 
-  color:#1B1E28 !important; 
-  border-color:#C4C4C4 !important;
-  min-height:44px; 
-  font-weight:800; 
-  border-width:2px !important;
-}}
-.stSelectbox svg, .stMultiSelect svg{{ 
-  fill:#1B1E28 !important; 
-  color:#1B1E28 !important; 
-}}
-div[data-baseweb="select"] input{{ 
-  color:#1B1E28 !important; 
-  font-weight:800; 
-  background:#FFFFFF !important;
-  background-color:#FFFFFF !important;
-}}
-div[data-baseweb="select"] input::placeholder{{ 
-  color:#8A8A8A !important; 
-}}
-
-/* Dropdown menu popover - FORCE WHITE BACKGROUND */
-div[data-baseweb="popover"]{{ 
-  z-index: 9999 !important; 
-  background:#FFFFFF !important;
-  background-color:#FFFFFF !important;
-}}
-div[data-baseweb="popover"] > div{{
-  background:#FFFFFF !important;
-  background-color:#FFFFFF !important;
-}}
-div[data-baseweb="menu"]{{
-  background:#FFFFFF !important; 
-  background-color:#FFFFFF !important;
-  color:#1B1E28 !important; 
-  border:2px solid #C4C4C4 !important;
-  border-radius:12px !important; 
-  box-shadow:0 12px 30px rgba(0,0,0,0.25) !important;
-}}
-div[data-baseweb="menu"] ul{{ 
-  background:#FFFFFF !important; 
-  background-color:#FFFFFF !important;
-  padding:6px !important; 
-}}
-div[data-baseweb="menu"] li, 
-div[data-baseweb="menu"] [role="option"],
-div[data-baseweb="menu"] > ul > li,
-div[data-baseweb="menu"] ul li{{
-  background:#FFFFFF !important; 
-  background-color:#FFFFFF !important;
-  color:#1B1E28 !important; 
-  font-weight:900 !important;
-  font-size:15px !important; 
-  padding:10px 12px !important; 
-  border-radius:8px !important;
-}}
-div[data-baseweb="menu"] li:hover, 
-div[data-baseweb="menu"] [role="option"]:hover,
-div[data-baseweb="menu"] > ul > li:hover,
-div[data-baseweb="menu"] ul li:hover{{
-  background:#E8E8E8 !important; 
-  background-color:#E8E8E8 !important;
-  color:#1B1E28 !important;
-}}
-div[data-baseweb="menu"] li[aria-selected="true"], 
-div[data-baseweb="menu"] [role="option"][aria-selected="true"],
-div[data-baseweb="menu"] > ul > li[aria-selected="true"],
-div[data-baseweb="menu"] ul li[aria-selected="true"]{{
-  background:#3B82F6 !important; 
-  background-color:#3B82F6 !important;
-  color:#FFFFFF !important; 
-  box-shadow: inset 4px 0 0 #1E40AF;
-}}
-
-/* Force text color in dropdown options - override ALL nested elements */
-div[data-baseweb="menu"] li *,
-div[data-baseweb="menu"] [role="option"] *,
-div[data-baseweb="menu"] span,
-div[data-baseweb="menu"] div,
-div[data-baseweb="menu"] p,
-div[data-baseweb="menu"] li span,
-div[data-baseweb="menu"] li div{{
-  color:#1B1E28 !important;
-}}
-
-/* Override any dark theme styles on popover children - but preserve hover/selected */
-div[data-baseweb="popover"] > div{{
-  background-color:#FFFFFF !important;
-}}
-div[data-baseweb="popover"] ul{{
-  background-color:#FFFFFF !important;
-}}
-div[data-baseweb="popover"] li:not(:hover):not([aria-selected="true"]){{
-  background-color:#FFFFFF !important;
-  color:#1B1E28 !important;
-}}
-
-/* Target BaseWeb select dropdown specifically */
-[data-baseweb="select"] [role="listbox"],
-[data-baseweb="select"] [role="option"]{{
-  background:#FFFFFF !important;
-  background-color:#FFFFFF !important;
-  color:#1B1E28 !important;
-}}
-
-/* Multiselect tags */
-.stMultiSelect [data-baseweb="tag"]{{
-  background:#3B82F6 !important; 
-  background-color:#3B82F6 !important;
-  color:#FFFFFF !important; 
-  border-radius:12px !important; 
-  font-weight:900 !important;
-}}
-
-.stMultiSelect [data-baseweb="tag"]{{
-  background:#3B82F6 !important; 
-  background-color:#3B82F6 !important;
-  color:#FFFFFF !important; 
-  border-radius:12px !important; 
-  font-weight:900 !important;
-}}
-
-/* ===== FIX FOR DISABLED TEXT BOXES (Dark/Light Mode) ===== */
-[data-testid="stTextInput"] input:disabled {{
-    background-color: #FFFFFF !important;
-    color: #1B1E28 !important;
-    -webkit-text-fill-color: #1B1E28 !important;
-    font-weight: 800 !important;
-    border-color: #C4C4C4 !important;
-    border-width: 2px !important;
-}}
-
-
-/* ===== FIX FOR DISABLED TEXT AREA (Dark/Light Mode) ===== */
-[data-testid="stTextArea"] textarea:disabled {{
-    background-color: #FFFFFF !important;
-    color: #1B1E28 !important;
-    -webkit-text-fill-color: #1B1E28 !important;
-    font-weight: 800 !important;
-    border-color: #C4C4C4 !important;
-    border-width: 2px !important;
-}}
-</style>
-"""
-# ----------------- INITIALIZE SEX SELECTION -----------------
-# Get current sex from session state, default to "Girl"
-current_sex = st.session_state.get("sex", "Girl")
-
-# ----------------- APPLY THEME CSS -----------------
-st.markdown(get_theme_css(current_sex), unsafe_allow_html=True)
-
-# ----------------- TITLE -----------------
-st.subheader("Pediatric Dashboard")
-#__________________New Patient Selector__________________
-patient_list = df['PatID'].unique()
-selected_patient_id = st.selectbox("Select Patient ID", patient_list)
-
-# __________________Get all data for the selected patient__________________
-patient_data = df[df['PatID'] == selected_patient_id].iloc[0]
-
-
-# ----------------- HELPERS -----------------
-def gauge_svg(score_0_to_10: float, large: bool = False) -> str:
-    """Generate gauge SVG - larger version for top display"""
-    if large:
-        angle_deg = 180 - max(0, min(10, score_0_to_10)) * 18.0
-        cx, cy, r = 200, 180, 100
-        x2 = cx + r * math.cos(math.radians(angle_deg))
-        y2 = cy - r * math.sin(math.radians(angle_deg))
-        return f"""
-        <svg width="400" height="220" viewBox="0 0 400 220">
-          <path d="M30 180 A170 170 0 0 1 370 180" fill="none" stroke="#FFE0E0" stroke-width="40" />
-          <path d="M30 180 A170 170 0 0 1 250 50" fill="none" stroke="#E15259" stroke-width="40" stroke-linecap="round"/>
-          <path d="M250 50 A170 170 0 0 1 370 180" fill="none" stroke="#9DB7FF" stroke-width="40" stroke-linecap="round"/>
-          <line x1="{cx}" y1="{cy}" x2="{x2}" y2="{y2}" stroke="#1B1E28" stroke-width="8" stroke-linecap="round"/>
-          <circle cx="{cx}" cy="{cy}" r="14" fill="#1B1E28"/>
-        </svg>
-        """
-    else:
-        angle_deg = 180 - max(0, min(10, score_0_to_10)) * 18.0
-        cx, cy, r = 130, 120, 65
-        x2 = cx + r * math.cos(math.radians(angle_deg))
-        y2 = cy - r * math.sin(math.radians(angle_deg))
-        return f"""
-        <svg width="260" height="140" viewBox="0 0 260 140">
-          <path d="M20 120 A110 110 0 0 1 240 120" fill="none" stroke="#FFE0E0" stroke-width="26" />
-          <path d="M20 120 A110 110 0 0 1 160 35" fill="none" stroke="#E15259" stroke-width="26" stroke-linecap="round"/>
-          <path d="M160 35 A110 110 0 0 1 240 120" fill="none" stroke="#9DB7FF" stroke-width="26" stroke-linecap="round"/>
-          <line x1="{cx}" y1="{cy}" x2="{x2}" y2="{y2}" stroke="#1B1E28" stroke-width="6" stroke-linecap="round"/>
-          <circle cx="{cx}" cy="{cy}" r="10" fill="#1B1E28"/>
-        </svg>
-        """
-
-# ================= RISK SECTION - TOP PRIORITY =================
-st.markdown('<div style="margin-bottom:12px;"><h2 style="font-size:28px;font-weight:900;color:#C6002A;margin:4px 0 8px 0;text-align:center;text-shadow:1px 1px 2px rgba(0,0,0,0.1);">⚠️ PATIENT RISK ASSESSMENT ⚠️</h2></div>', unsafe_allow_html=True)
-
-# Calculate risk score first (needed for display)
-weights = {"Premature":2.5,"Low birth weight":2.0,"Co-morbidity":1.5,"Genetic syndrome":1.5,"Recent infection":1.0,"Post-op bleed":3.0}
-risk_selection = st.multiselect(
-    "**🔴 SELECT RISK FACTORS**",
-    ["Premature","Low birth weight","Co-morbidity","Genetic syndrome","Recent infection","Post-op bleed"],
-    default=[],
-    key="risk_factors_top"
-)
-risk_score = max(0.0, min(10.0, sum(weights.get(x,0) for x in risk_selection)))
-risk_percentage = int((risk_score / 10.0) * 100)
-
-# Large risk display at top - MAIN ATTRACTION
-st.markdown('<div style="background:linear-gradient(135deg, #fff5f5 0%, #ffe8e8 100%);border:3px solid #C6002A;border-radius:16px;padding:16px 8px;margin:8px 0 20px 0;box-shadow:0 4px 12px rgba(198,0,42,0.15);">', unsafe_allow_html=True)
-risk_col1, risk_col2, risk_col3 = st.columns([1.5, 1.4, 1])
-with risk_col1:
-    st.markdown(f'<div style="text-align:center;padding:12px 0;"><div style="font-size:72px;font-weight:900;color:#C6002A;line-height:1;text-shadow:2px 2px 4px rgba(0,0,0,0.1);">{risk_percentage}%</div><div style="font-size:24px;font-weight:800;margin-top:8px;color:#8B0000;letter-spacing:2px;">RISK LEVEL</div></div>', unsafe_allow_html=True)
-with risk_col2:
-    st.markdown('<div style="text-align:center;padding:8px 0;">', unsafe_allow_html=True)
-    st.markdown(gauge_svg(risk_score, large=True), unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-with risk_col3:
-    st.markdown(f'<div style="text-align:center;padding:12px 0;"><div style="font-size:48px;font-weight:900;color:#1B1E28;line-height:1.1;">{risk_score:.1f}</div><div style="font-size:20px;font-weight:700;margin-top:6px;color:#555;">/ 10.0</div><div style="font-size:15px;font-weight:700;margin-top:10px;color:#666;text-transform:uppercase;letter-spacing:1px;">Risk Score</div></div>', unsafe_allow_html=True)
-st.markdown('</div>', unsafe_allow_html=True)
-
-st.markdown('<div style="height:2px;background:linear-gradient(to right, transparent, #ddd, transparent);margin:8px 0 12px 0;"></div>', unsafe_allow_html=True)
-
-# ----------------- COLUMNS -----------------
-col_left, col_mid, col_right = st.columns([1.1, 1.2, 1.2])
-
-# ================= LEFT COLUMN =================
-with col_left:
-
-    st.markdown('<div class="pinkpanel">', unsafe_allow_html=True)
-    st.markdown('<div class="headerpink">Patient Info</div>', unsafe_allow_html=True)
+#__________________Loading the data set______________
+# Parsing, typing and the *_label columns live in data_loader.py and are cached
+# across reruns/sessions until the CSV changes; exports ingested with ingest.py
+# are applied on the next rerun without a reload
+with stage("data_load"):
+    data = load_patients()
+df = data.df
+if "SyndromeTerm" in data.missing_columns:
+    st.warning("Warning: 'SyndromeTerm' column not found. Using default values.")
+deltas = f" + {data.deltas} delta export(s)" if data.deltas else ""
+st.sidebar.caption(f"Registry: {len(df):,} rows · loaded in {data.load_seconds:.2f}s · version {data.version[:8]}{deltas}")
+
+# ----------------- PAGE SECTIONS (fragments) -----------------
+# Each section is an st.fragment: a widget inside one only reruns that section,
+# not the whole script. Inputs are passed in explicitly.
+
+@st.fragment
+@timed("risk_panel")
+def risk_panel(registry_score, registry_factors):
+    """Risk factor picker + gauge; a factor click only reruns this fragment"""
+    # Registry score comes from risk_engine.py (this row alone until the cohort-wide
+    # scores are built); picking factors overrides it
+    risk_selection = st.multiselect(
+        "**🔴 SELECT RISK FACTORS**",
+        RISK_FACTORS,
+        default=[],
+        key="risk_factors_top"
+    )
+    manual_score = score_selection(risk_selection)
+    risk_score = manual_score if risk_selection else registry_score
+    risk_percentage = int((risk_score / 10.0) * 100)
+    st.caption(
+        f"Registry score: **{registry_score:.1f}** / 10 ({', '.join(registry_factors) or 'no factors recorded'})"
+        + (f" · Manual override: **{manual_score:.1f}** / 10" if risk_selection else " · select factors above to override")
+    )
 
-    if get_patient_value(patient_data,"Premature_label") == "Yes":
-        st.markdown('<div style="padding:6px 10px;"><span style="display:inline-block;padding:6px 12px;border-radius:999px;background:#EEF0F3;border:1px solid #D7DBE0;font-weight:800;font-size:12px;">Premature</span></div>', unsafe_allow_html=True)
+    # Large risk display at top - MAIN ATTRACTION
+    markdown('<div style="background:linear-gradient(135deg, #fff5f5 0%, #ffe8e8 100%);border:3px solid #C6002A;border-radius:16px;padding:16px 8px;margin:8px 0 20px 0;box-shadow:0 4px 12px rgba(198,0,42,0.15);">', unsafe_allow_html=True)
+    risk_col1, risk_col2, risk_col3 = st.columns([1.5, 1.4, 1])
+    with risk_col1:
+        markdown(f'<div style="text-align:center;padding:12px 0;"><div style="font-size:72px;font-weight:900;color:#C6002A;line-height:1;text-shadow:2px 2px 4px rgba(0,0,0,0.1);">{risk_percentage}%</div><div style="font-size:24px;font-weight:800;margin-top:8px;color:#8B0000;letter-spacing:2px;">RISK LEVEL</div></div>', unsafe_allow_html=True)
+    with risk_col2:
+        markdown('<div style="text-align:center;padding:8px 0;">', unsafe_allow_html=True)
+        markdown(gauge_svg(risk_score, large=True), unsafe_allow_html=True)
+        markdown('</div>', unsafe_allow_html=True)
+    with risk_col3:
+        markdown(f'<div style="text-align:center;padding:12px 0;"><div style="font-size:48px;font-weight:900;color:#1B1E28;line-height:1.1;">{risk_score:.1f}</div><div style="font-size:20px;font-weight:700;margin-top:6px;color:#555;">/ 10.0</div><div style="font-size:15px;font-weight:700;margin-top:10px;color:#666;text-transform:uppercase;letter-spacing:1px;">Risk Score</div></div>', unsafe_allow_html=True)
+    markdown('</div>', unsafe_allow_html=True)
+
+    markdown('<div style="height:2px;background:linear-gradient(to right, transparent, #ddd, transparent);margin:8px 0 12px 0;"></div>', unsafe_allow_html=True)
+
+
+@st.fragment
+@timed("patient_info")
+def patient_info(view):
+    """Left column: demographics, sex icons/theme and the shunt scale"""
+    markdown('<div class="pinkpanel">', unsafe_allow_html=True)
+    markdown('<div class="headerpink">Patient Info</div>', unsafe_allow_html=True)
+
+    if view.premature == "Yes":
+        markdown('<div style="padding:6px 10px;"><span style="display:inline-block;padding:6px 12px;border-radius:999px;background:#EEF0F3;border:1px solid #D7DBE0;font-weight:800;font-size:12px;">Premature</span></div>', unsafe_allow_html=True)
     else:
-        st.markdown('<div style="height: 38px; padding:6px 10px;"></div>', unsafe_allow_html=True)
+        markdown('<div style="height: 38px; padding:6px 10px;"></div>', unsafe_allow_html=True)
     
     # --- Sex selector (Girl/Boy) + highlight icon ---
-    st.text_input("Sex", value=get_patient_value(patient_data, 'Gender_label'), disabled=True)
+    st.text_input("Sex", value=view.sex, disabled=True)
 
-    sex = get_patient_value(patient_data, 'Gender_label')
+    sex = view.sex
     sel_girl = " sel" if sex == "Girl" else ""
     sel_boy  = " sel" if sex == "Boy" else ""
 
-    st.markdown(f"""
+    markdown(f"""
     <div class="iconrow">
       <div class="iconbox{sel_girl}">♀️</div>
       <div class="iconbox2">👶</div>
       <div class="iconbox3{sel_boy}">♂️</div>
     </div>
     """, unsafe_allow_html=True)
-    current_sex = sex
-# ----------------- APPLY THEME CSS -----------------
-    st.markdown(get_theme_css(current_sex), unsafe_allow_html=True)
+    markdown(theme_marker(sex), unsafe_allow_html=True)
 
     # Inner white card with ONLY the inputs
     with st.container():
-        st.markdown('<div class="card">', unsafe_allow_html=True)
+        markdown('<div class="card">', unsafe_allow_html=True)
 
 #---------------Getting all the left colmun categories from the dataset-------------
-        st.text_input("Race", value=get_patient_value(patient_data, 'Race_label'), disabled=True)
-        st.text_input("Ethnicity", value=get_patient_value(patient_data, 'Ethnicity_label'), disabled=True)
-        st.text_input("Date of Birth", value=get_patient_value(patient_data, 'DOB'), disabled=True)
-        st.text_input("Age at Surgery (days)", value=get_patient_value(patient_data, 'AgeAtSurgeryDays'), disabled=True)
-
-        shunt_size_val = get_patient_value(patient_data, 'Shunt Size', default="N/A")
-
-        # Shunt size scale (visual)
-        st.markdown(f"""
-        <div style="margin-top:10px;">
-          <div><b>Shunt Size</b></div>
-          <div class="card" style="border-radius:14px;">
-            <svg width="300" height="70" viewBox="0 0 300 70">
-              <line x1="20" y1="45" x2="280" y2="45" stroke="#111" stroke-width="2"/>
-              <g fill="#111" font-size="12" text-anchor="middle">
-                <line x1="20" y1="38" x2="20" y2="52" stroke="#111" stroke-width="2"/><text x="20" y="65">0</text>
-                <line x1="95" y1="38" x2="95" y2="52" stroke="#111" stroke-width="2"/><text x="95" y="65">1</text>
-                <line x1="170" y1="38" x2="170" y2="52" stroke="#111" stroke-width="2"/><text x="170" y="65">2</text>
-                <line x1="245" y1="38" x2="245" y2="52" stroke="#111" stroke-width="2"/><text x="245" y="65">3</text>
-                <line x1="280" y1="38" x2="280" y2="52" stroke="#111" stroke-width="2"/><text x="280" y="65">4</text>
-              </g>
-              <polygon points="262,18 268,30 256,30" fill="#111"/>
-              <line x1="262" y1="30" x2="262" y2="46" stroke="#111" stroke-width="2"/>
-            </svg>
-            <div class="center"><span class="red">{shunt_size_val} MM</span></div>
-        
-          </div>
-        </div>
-        """, unsafe_allow_html=True)
-
-        st.markdown('</div>', unsafe_allow_html=True)  # close white card
-    st.markdown('</div>', unsafe_allow_html=True)      # close pinkpanel
-
-# ================= MIDDLE COLUMN =================
-with col_mid:
-    
-    cardiac_arrest_date = get_patient_value(patient_data, 'CardArrestDtTm', default="N/A")
-    sepsis_date = get_patient_value(patient_data, 'CompSepsisDt', default="N/A")
-    cardiac_details = get_patient_value(patient_data, "Cardiac Anatomy Notes", default = "N/A")
-    suddenHypoxemia_Notes = get_patient_value(patient_data, "SH Notes", default = "N/A")
-    clabsi_label = "Yes" if get_patient_value(patient_data, 'CompCLABSI', 0) == 1 else "No"
-    uti_label = "Yes" if get_patient_value(patient_data, 'CompUTI', 0) == 1 else "No"
-    wound_label = "Yes" if get_patient_value(patient_data, 'CompWoundInf', 0) == 1 else "No"
-
-    st.markdown('<div class="eventtitle">Cardiac Event</div>', unsafe_allow_html=True)
-    st.markdown((
+        st.text_input("Race", value=view.race, disabled=True)
+        st.text_input("Ethnicity", value=view.ethnicity, disabled=True)
+        st.text_input("Date of Birth", value=view.dob, disabled=True)
+        st.text_input("Age at Surgery (days)", value=view.age_at_surgery, disabled=True)
+
+        # Shunt size scale (visual) - marker follows the recorded size
+        markdown(shunt_scale_html(view.shunt_size), unsafe_allow_html=True)
+
+        markdown('</div>', unsafe_allow_html=True)  # close white card
+    markdown('</div>', unsafe_allow_html=True)      # close pinkpanel
+
+
+@st.fragment
+@timed("events_panel")
+def events_panel(view):
+    """Middle column: cardiac/septic events, syndrome toggle and abnormalities"""
+    sex = view.sex
+    cardiac_arrest_date = view.cardiac_arrest_date
+    sepsis_date = view.sepsis_date
+    cardiac_details = view.cardiac_notes
+    suddenHypoxemia_Notes = view.sh_notes
+    clabsi_label = view.clabsi
+    uti_label = view.uti
+    wound_label = view.wound_infection
+
+    markdown('<div class="eventtitle">Cardiac Event</div>', unsafe_allow_html=True)
+    markdown((
         '<div class="eventbox">'
         f'<div class="center" style="font-size:20px;font-weight:900;">💔 &nbsp; Date & Time - {cardiac_arrest_date} </div>'
         '<div style="height:10px;"></div>'
@@ -460,8 +144,8 @@ with col_mid:
         f'<div class="center" style="font-style:italic;font-weight:700;">{cardiac_details}</div>'
         '</div>'), unsafe_allow_html=True)
 
-    st.markdown('<div class="eventtitle">Septic Event</div>', unsafe_allow_html=True)
-    st.markdown(
+    markdown('<div class="eventtitle">Septic Event</div>', unsafe_allow_html=True)
+    markdown(
         f'<div class="eventbox">'
         f'<div class="center" style="font-size:20px;font-weight:900;">🚩 &nbsp; Date & Time - {sepsis_date}</div>'
         '<div style="height:10px;"></div>'
@@ -480,35 +164,22 @@ with col_mid:
     #---------------------------------------------------------------------------------
 
     # 1. Syndrome Present
-    syn_val = get_patient_value(patient_data, 'Syndrome_Present_bool', default=False)
-    syn_label = "Yes" if syn_val else "No"
+    syn_val = view.syndrome_present
+    syn_label = view.syndrome_label
     # 2. Fetal Drug Selectbox
-    fd_label = get_patient_value(patient_data, 'Fetal_Drug_Exposure_label', default='No')
-    # 3. Abnormalities Text Area
+    fd_label = view.fetal_drug_exposure
 
     syn = st.toggle("Syndrome Present", value=syn_val)
 
     # 2. Fetal Drug Selectbox
     st.text_input("Fetal Drug Exposure", value=fd_label, disabled=True)
-    all_abnormalities = [
-        
-        get_patient_value(patient_data, 'NCAA1', default="NULL"),
-        get_patient_value(patient_data, 'NCAA2', default="NULL"),
-        get_patient_value(patient_data, 'NCAA3', default="NULL"),
-        get_patient_value(patient_data, 'NCAA4', default="NULL"),
-        get_patient_value(patient_data, 'NCAA5', default="NULL"),
-        get_patient_value(patient_data, 'ChromAbTerm', default="—")
-    ]
-    ignore_values = {"NULL", "—", None, "", "0", "No chromosomal abnormality identified"} 
-    valid_abnormalities = [ab for ab in all_abnormalities if ab not in ignore_values]
-    final_ab_string = ", ".join(valid_abnormalities)
-    if not final_ab_string:
-        final_ab_string = "None reported" 
+    # 3. Abnormalities Text Area - NCAA1-5/ChromAbTerm are joined once per data version (view_model.py)
+    final_ab_string = view.abnormalities
     ab = st.text_area("Abnormalities / Etc.", value=final_ab_string, height=160, disabled=True)
 
     #ab = st.text_area("Abnormalities / Etc.", value=final_ab_string, height=120, disabled=True)
     abb = final_ab_string
-    st.markdown(
+    markdown(
         f'<div class="card">'
         f'<div style="text-decoration:underline;font-weight:900;">Syndrome Present: {syn_label}</div>'
         f'Sex: {sex}<br>'
@@ -518,31 +189,104 @@ with col_mid:
         unsafe_allow_html=True
     )
 
-#-------------------------------------------------------------------------------------------
 
-# ================= RIGHT COLUMN =================
+@st.fragment
+@timed("timeline_panel")
+def timeline_panel(view):
+    """Right column: vertical timeline of dated events and the days between them"""
+    # Events are placed by their actual dates (components.timeline_html)
+    markdown(timeline_html(view.timeline_events), unsafe_allow_html=True)
+    # Intervals are computed once at load (data_loader.INTERVAL_COLUMNS)
+    markdown(intervals_html(view.intervals), unsafe_allow_html=True)
+
+
+@st.fragment
+@timed("similar_panel")
+def similar_panel(warmup, row, pat_id):
+    """Nearest past patients and their outcomes; the index is only built once asked for"""
+    if not st.toggle("Show similar patients", key="similar_on"):
+        return
+    if not warmup.ready("view_table", "risk_scores"):
+        placeholder(warmup, "Similar patients")
+        return
+    views, risk = get_view_table(data), get_risk_scores(data)
+    k = st.slider("Number of similar patients", 5, 25, 10, key="similar_k")
+    with st.spinner("Indexing patients..."):
+        similar = get_similar_patients(data)
+    rows, distances = similar.query(df, row, k, exclude=pat_id)
+    st.dataframe(outcomes_table(views, risk, rows, distances), hide_index=True)
+    if st.button("Compare side by side", key="similar_compare"):
+        ids = [pat_id, *views.column("pat_id")[rows][:5]]
+        st.session_state["compare_ids"] = ", ".join(ids)
+        st.switch_page("pages/2_Compare_Patients.py")
+
+
+# ----------------- APPLY THEME CSS -----------------
+# One memoized stylesheet holds both themes (theme.py); the patient's sex only
+# toggles a marker class further down
+with stage("css"):
+    markdown(get_theme_css(), unsafe_allow_html=True)
+
+# Per-version structures: only the picker's index and search are built before the
+# first paint; display labels, cohort risk scores and aggregates are built by a
+# background thread (warmup.py) and the patient renders from its own rows meanwhile
+with stage("prep"):
+    patient_index = get_patient_index(data)
+    finder = get_patient_finder(data)
+
+# ----------------- TITLE -----------------
+st.subheader("Pediatric Dashboard")
+with stage("patient_lookup"):
+    #__________________New Patient Selector__________________
+    # Search runs server-side; only one page of matching IDs is sent to the browser
+    selected_patient_id = patient_picker(finder)
+
+    # __________________Get all data for the selected patient__________________
+    # Index lookup instead of scanning the PatID column; patients with several
+    # encounters get a picker (most recent surgery selected by default)
+    if selected_patient_id is not None:
+        encounter_rows = patient_index.rows(selected_patient_id)
+        views = views_for(data, encounter_rows)
+        if len(encounter_rows) > 1:
+            encounter_pos = st.selectbox(
+                "Encounter",
+                list(encounter_rows),
+                index=len(encounter_rows) - 1,
+                format_func=lambda pos: f"Surgery {views.view(pos).surgery_date}",
+            )
+        else:
+            encounter_pos = encounter_rows[0]
+        # Display-ready record (view_model.py) - no pandas access while rendering
+        patient_view = views.view(encounter_pos)
+if selected_patient_id is None:
+    progress_panel(start_warmup(data, run_start))
+    end_run(run)
+    debug_panel()
+    st.stop()
+
+
+# ================= RISK SECTION - TOP PRIORITY =================
+markdown('<div style="margin-bottom:12px;"><h2 style="font-size:28px;font-weight:900;color:#C6002A;margin:4px 0 8px 0;text-align:center;text-shadow:1px 1px 2px rgba(0,0,0,0.1);">⚠️ PATIENT RISK ASSESSMENT ⚠️</h2></div>', unsafe_allow_html=True)
+
+risk_panel(*risk_for(data, encounter_pos))
+
+# ----------------- COLUMNS -----------------
+col_left, col_mid, col_right = st.columns([1.1, 1.2, 1.2])
+with col_left:
+    patient_info(patient_view)
+with col_mid:
+    events_panel(patient_view)
 with col_right:
+    timeline_panel(patient_view)
 
-    surg_date_val = get_patient_value(patient_data, 'CardSurgDt', default="N/A")
-    bleed_date_val = get_patient_value(patient_data, 'CompReopBleedDtTm', default="N/A")
-    sepsis_date_val = get_patient_value(patient_data, 'CompSepsisDt', default="N/A")
-    discharge_date_val = get_patient_value(patient_data, 'End of Interstage/BTTS Period/Admission', default="N/A")
-    
-    timeline_html = f"""
-    <div class="card">
-        <div class="center" style="font-weight:900;">Vertical<br>Timeline of<br>Events</div>
-        <div class="timelinewrap">
-            <div class="vert">
-                <div class="hbot"></div>
-                <div class="tick" style="top:40px;"><div class="dot"></div><div class="lbl"><b>Discharge</b><br>{discharge_date_val}</div></div>
-                <div class="tick" style="top:170px;"><div class="dot"></div><div class="lbl"><b>Sepsis Found and Treated</b><br>{sepsis_date_val}</div></div>
-                <div class="tick" style="top:300px;"><div class="dot"></div><div class="lbl"><b>Bleed Present</b><br>{bleed_date_val}</div></div>
-                <div class="tick" style="top:420px;"><div class="dot"></div><div class="lbl"><b>Surgery Completion</b><br>{surg_date_val}</div></div>
-            </div>
-        </div>
-    </div>
-    """
-    st.markdown(timeline_html, unsafe_allow_html=True)
+# The patient is on screen: time to first paint, vs `fully_ready` from the warmup
+record_duration("first_paint", time.perf_counter() - run_start)
+# Started only now: the thread competes for the GIL with the render above
+warmup = start_warmup(data, run_start)
+progress_panel(warmup)
 
+# ----------------- SIMILAR PATIENTS -----------------
+similar_panel(warmup, encounter_pos, selected_patient_id)
 
-    
+end_run(run)
+debug_panel()
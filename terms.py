@@ -0,0 +1,154 @@
+# terms.py
+# Inverted index over the abnormality / syndrome term columns: term -> sorted row IDs
+import re
+
+import numpy as np
+import pandas as pd
+
+from data_loader import ABNORMALITY_COLUMNS, grow, normalize_term, register_patcher
+
+TERM_COLUMNS = [*ABNORMALITY_COLUMNS, "SyndromeTerm"]
+
+
+class TermIndex:
+    """Every normalized term mapped to the sorted rows that mention it.
+
+    Postings are stored CSR style - one int32 row array sliced by `_starts` - so
+    an AND is an intersection of sorted arrays and an OR a union; both take
+    milliseconds at 1M rows. `codes` keeps the terms of each row for
+    co-occurrence counts and patching.
+    """
+    __slots__ = ("terms", "labels", "codes", "_term_ids", "_rows", "_starts", "_overlay")
+
+    def __init__(self, df):
+        self.terms, self.labels, self._term_ids = [], [], {}
+        self.codes = self._encode(df)
+        self._build_postings()
+        self._overlay = {}  # term id -> postings rewritten by ingested deltas, instead of `_rows`
+
+    def _encode(self, df):
+        """(rows x TERM_COLUMNS) term ids, -1 where empty; a term repeated within a row is kept once"""
+        codes = np.full((len(df), len(TERM_COLUMNS)), -1, dtype=np.int32)
+        for j, col in enumerate(TERM_COLUMNS):
+            if col not in df.columns:
+                continue
+            # Normalize the distinct values only; the column itself is never touched row by row
+            raw, uniques = pd.factorize(df[col])
+            lookup = np.array([self._term_id(value) for value in uniques] + [-1], dtype=np.int32)
+            codes[:, j] = lookup[raw]
+        codes.sort(axis=1)
+        codes[:, 1:][codes[:, 1:] == codes[:, :-1]] = -1
+        return codes
+
+    def _term_id(self, value):
+        key = normalize_term(value)
+        if not key:
+            return -1
+        if key not in self._term_ids:
+            self._term_ids[key] = len(self.terms)
+            self.terms.append(key)
+            self.labels.append(re.sub(r"\s+", " ", str(value)).strip())  # first spelling seen
+        return self._term_ids[key]
+
+    def _build_postings(self):
+        flat = self.codes.ravel()
+        present = np.flatnonzero(flat >= 0)
+        term_of = flat[present]
+        # Stable sort by term keeps each term's rows in ascending order
+        order = np.argsort(term_of, kind="stable")
+        self._rows = (present[order] // len(TERM_COLUMNS)).astype(np.int32)
+        counts = np.bincount(term_of, minlength=len(self.terms))
+        self._starts = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return normalize_term(term) in self._term_ids
+
+    def _postings(self, tid):
+        if tid in self._overlay:
+            return self._overlay[tid]
+        if tid + 1 >= len(self._starts):
+            return np.empty(0, dtype=np.int32)  # first seen in a delta
+        return self._rows[self._starts[tid]:self._starts[tid + 1]]
+
+    def rows(self, term):
+        """Sorted rows mentioning `term` (any spelling); empty for unknown terms"""
+        tid = self._term_ids.get(normalize_term(term))
+        if tid is None:
+            return np.empty(0, dtype=np.int32)
+        return self._postings(tid)
+
+    def counts(self):
+        """Rows per term, most frequent first, indexed by display label"""
+        sizes = np.zeros(len(self.terms), dtype=np.int64)
+        sizes[:len(self._starts) - 1] = np.diff(self._starts)
+        for tid, rows in self._overlay.items():
+            sizes[tid] = len(rows)
+        counts = pd.Series(sizes, index=self.labels, name="Rows")
+        return counts.sort_values(ascending=False, kind="stable")
+
+    def match(self, all_of=(), any_of=()):
+        """Rows mentioning every term in `all_of` and at least one in `any_of`.
+
+        Sorted int32 rows; None when both lists are empty (no term filter).
+        """
+        if not all_of and not any_of:
+            return None
+        postings = [self.rows(t) for t in all_of]
+        if any_of:
+            # Union through a row bitmap: linear, where merging sorted arrays would sort
+            hit = np.zeros(len(self.codes), dtype=bool)
+            for term in any_of:
+                hit[self.rows(term)] = True
+            postings.append(np.flatnonzero(hit).astype(np.int32))
+        # Smallest first, so every step only shrinks the result; each step keeps the
+        # rows found in the next posting by binary search
+        postings.sort(key=len)
+        result = postings[0]
+        for other in postings[1:]:
+            if not len(result) or not len(other):
+                return result[:0]
+            pos = np.searchsorted(other, result).clip(max=len(other) - 1)
+            result = result[other[pos] == result]
+        return result
+
+    def co_occurrence(self, rows=None):
+        """Rows per term within `rows` (default all rows), most frequent first"""
+        codes = self.codes if rows is None else self.codes[rows]
+        codes = codes[codes >= 0]
+        counts = pd.Series(np.bincount(codes, minlength=len(self.terms)), index=self.labels, name="Rows")
+        return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+    def patched(self, batch):
+        """Copy with the batch's rows re-encoded; new terms extend the vocabulary.
+
+        Only the postings of terms the batch adds or removes are rewritten (into
+        `_overlay`), at the cost of those postings rather than of the index.
+        """
+        new = TermIndex.__new__(TermIndex)
+        new.terms, new.labels, new._term_ids = list(self.terms), list(self.labels), dict(self._term_ids)
+        new._rows, new._starts, new._overlay = self._rows, self._starts, dict(self._overlay)
+        fresh = new._encode(batch.rows)
+        split = len(batch.updated)
+        before = self.codes[batch.updated]  # gathered before the in-place write below
+        new.codes = grow(self.codes, fresh[split:])
+        new.codes[batch.updated] = fresh[:split]
+        changed = np.sort(batch.changed).astype(np.int32)
+        touched = np.unique(np.concatenate([before.ravel(), fresh.ravel()]))
+        for tid in touched[touched >= 0].tolist():
+            rows = self._postings(tid) if tid < len(self.terms) else np.empty(0, dtype=np.int32)
+            if len(rows):
+                pos = np.searchsorted(changed, rows).clip(max=len(changed) - 1)
+                rows = rows[changed[pos] != rows]
+            added = np.sort(batch.changed[(fresh == tid).any(axis=1)]).astype(np.int32)
+            new._overlay[tid] = np.insert(rows, np.searchsorted(rows, added), added)
+        return new
+
+
+def get_term_index(data):
+    return data.derived("term_index", lambda d: TermIndex(d.df))
+
+
+register_patcher("term_index", lambda index, old, new, batch: index.patched(batch))
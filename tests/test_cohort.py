@@ -0,0 +1,20 @@
+# Cohort aggregates (cohort.py)
+import numpy as np
+import pandas as pd
+
+from cohort import build_cube, count_patients
+from data_loader import LoadedData, prepare_frame
+
+
+def test_repeat_patient_counts_once_per_surgery():
+    df = prepare_frame(pd.DataFrame({
+        "PatID": ["A", "A", "B"], "Gender": 0, "Race": 1, "Ethnicity": 0, "Premature": [1, 1, 0],
+        "CardSurgDt": ["01/05/2020", "03/09/2021", "02/02/2020"],
+    }))
+    data = LoadedData(df=df, version="test", load_seconds=0.0)
+    cube = build_cube(df, np.zeros(len(df)))
+    assert cube["Surgeries"].sum() == 3
+    assert cube["Premature"].sum() == 2
+    assert count_patients(data, np.arange(3)) == 2
+    assert count_patients(data, np.array([0, 1])) == 1
+    assert count_patients(data, np.array([], dtype=np.int64)) == 0
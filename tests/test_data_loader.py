@@ -0,0 +1,75 @@
+# Date parsing, derived columns and the streaming loader's record index (data_loader.py)
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import LazyText, _record_bounds, parse_dates
+
+
+def _dates(*values):
+    return list(parse_dates(pd.Series(values, dtype=object)))
+
+
+def test_mixed_formats():
+    assert _dates("01/02/2020", "01/02/2020 10:30", "2021-03-04", " 2021-03-04 ") == [
+        np.datetime64("2020-01-02"), np.datetime64("2020-01-02T10:30"),
+        np.datetime64("2021-03-04"), np.datetime64("2021-03-04")]
+
+
+def test_two_digit_years():
+    assert _dates("01/02/20", "1/2/99", "12/31/05 08:15") == [
+        np.datetime64("2020-01-02"), np.datetime64("1999-01-02"), np.datetime64("2005-12-31T08:15")]
+
+
+def test_blank_unparseable_and_out_of_range():
+    parsed = _dates("", None, "unknown", "01/02/1500", "01/02/3000", "0020-01-02")
+    assert all(np.isnat(parsed))
+
+
+def test_parsed_dates_pass_through():
+    dates = pd.Series(pd.to_datetime(["2020-01-01", None]))
+    np.testing.assert_array_equal(parse_dates(dates), dates.to_numpy())
+
+
+RECORDS = [
+    ["PatID", "SH Notes", "Cardiac Anatomy Notes"],
+    ["A", "plain", ""],
+    ["B", "two\nlines", "with \"quotes\", and a comma"],
+    ["C", "", "ends in a newline\n"],
+    ["D", "\n\nblank lines inside", "x"],
+]
+
+
+def _write_csv(path, newline):
+    """RECORDS with blank lines between and after them, and quoted newlines in the notes"""
+    out = io.StringIO()
+    csv.writer(out, lineterminator=newline).writerows([[v.replace("\n", newline) for v in r] for r in RECORDS])
+    text = out.getvalue().replace(newline + "B", newline + newline + "B") + newline + newline
+    path.write_bytes(text.encode())
+    return str(path)
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("block_size", [1, 3, 7, 1 << 24])
+def test_record_bounds_match_read_csv(tmp_path, newline, block_size):
+    path = _write_csv(tmp_path / "registry.csv", newline)
+    expected = pd.read_csv(path, dtype=str, keep_default_na=False)
+    starts, stops = _record_bounds(path, block_size)
+    raw = open(path, "rb").read()
+    records = [next(csv.reader(io.StringIO(raw[a:b].decode()))) for a, b in zip(starts.tolist(), stops.tolist())]
+    assert records[0] == list(expected.columns)
+    assert records[1:] == expected.values.tolist()
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_lazy_text_matches_read_csv(tmp_path, newline):
+    path = _write_csv(tmp_path / "registry.csv", newline)
+    expected = pd.read_csv(path, dtype=str)
+    text = LazyText(path, ["SH Notes", "Cardiac Anatomy Notes", "Not In File"])
+    assert len(text) == len(expected)
+    for row in range(len(expected)):
+        assert text.fetch(row) == {col: (None if pd.isna(v) else v)
+                                   for col, v in expected.iloc[row][["SH Notes", "Cardiac Anatomy Notes"]].items()}
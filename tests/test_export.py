@@ -0,0 +1,44 @@
+# Cohort selection for the batch export (export.py)
+import argparse
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import LoadedData, prepare_frame
+from export import _csv_value, _month, _where_item, select_rows
+
+
+@pytest.fixture
+def data():
+    df = prepare_frame(pd.DataFrame({
+        "PatID": ["A", "B", "C", "D"], "Gender": [1, 0, 1, None], "Race": 1, "Ethnicity": 0, "Premature": 0
+    }))
+    return LoadedData(df=df, version="test", load_seconds=0.0)
+
+
+def test_where_coerces_to_column_dtype(data):
+    assert list(select_rows(data, where={"Gender": "1"})[0]) == [0, 2]
+    assert list(select_rows(data, where={"Gender_label": "boy"})[0]) == [0, 2]
+    assert list(select_rows(data, where={"PatID": "B"})[0]) == [1]
+
+
+@pytest.mark.parametrize("where", [{"Sex": "1"}, {"Gender": "Boy"}, {"Gender_label": "x"}, {"Syndrome_Present_bool": "maybe"}])
+def test_where_rejects_values_that_cannot_match(data, where):
+    with pytest.raises(ValueError):
+        select_rows(data, where=where)
+
+
+def test_csv_shunt_size_as_recorded():
+    assert _csv_value(float(np.float32(3.2))) == "3.2"
+    assert _csv_value(float("nan")) == ""
+    assert _csv_value("Girl") == "Girl"
+
+
+def test_cli_option_types():
+    assert _where_item("Gender_label=Girl") == ("Gender_label", "Girl")
+    assert _where_item("SH Notes=a=b") == ("SH Notes", "a=b")
+    assert _month("2015-01") == pd.Timestamp("2015-01-01")
+    for parse, text in [(_where_item, "Gender"), (_where_item, "=1"), (_month, "2015-13"), (_month, "soon")]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse(text)
@@ -0,0 +1,122 @@
+# Delta exports upserted into a loaded registry (ingest.py)
+import numpy as np
+import pandas as pd
+
+from data_loader import (ABNORMALITY_COLUMNS, DASHBOARD_COLUMNS, LoadedData, _load_from_csv, _load_streaming,
+                         prepare_frame)
+from ingest import apply_delta, ingest_delta, read_delta, read_manifest
+from synthetic_registry import generate
+from view_model import get_view_table
+
+
+def _registry(tmp_path, n=200):
+    path = str(tmp_path / "registry.csv")
+    base = generate(n)
+    base.to_csv(path, index=False)
+    df, missing = _load_from_csv(path)
+    return path, base, LoadedData(df=df, version="test", load_seconds=0.0, missing_columns=missing)
+
+
+def _sparse_update(base, row):
+    """One corrected encounter whose NCAA cells are all blank or "0" - read alone they look numeric"""
+    delta = base.iloc[[row]].copy()
+    delta["CompUTI"] = 1
+    delta[ABNORMALITY_COLUMNS[:5]] = np.nan
+    delta["NCAA1"] = "0"
+    return delta
+
+
+def _check_update(data, new, row):
+    assert len(new.df) == len(data.df)
+    assert new.df["CompUTI"].iloc[row] == 1
+    assert new.df["NCAA1"].iloc[row] == "0"
+    assert pd.isna(new.df["NCAA2"].iloc[row])
+    for col in data.df.columns:
+        assert new.df[col].dtype == data.df[col].dtype, col
+
+
+def test_sparse_update_delta(tmp_path):
+    path, base, data = _registry(tmp_path)
+    delta_csv = str(tmp_path / "delta.csv")
+    _sparse_update(base, 5).to_csv(delta_csv, index=False)
+    ingest_delta(delta_csv, path)
+    entry = read_manifest(path)["entries"][0]
+    _check_update(data, apply_delta(data, read_delta(path, entry, DASHBOARD_COLUMNS)), 5)
+
+
+def test_delta_with_numeric_text_columns(tmp_path):
+    # Deltas ingested before the text columns were read as str hold them as floats
+    path, base, data = _registry(tmp_path)
+    delta = _sparse_update(base, 7)
+    delta["NCAA1"] = 0.0
+    _check_update(data, apply_delta(data, prepare_frame(delta.reset_index(drop=True))), 7)
+
+
+def test_delta_notes_replace_lazy_text(tmp_path):
+    # Stream loader: notes stay in the CSV, so a corrected row must not read them from there
+    path = str(tmp_path / "registry.csv")
+    base = generate(50)
+    base.to_csv(path, index=False)
+    df, missing, text = _load_streaming(path)
+    data = LoadedData(df=df, version="test", load_seconds=0.0, missing_columns=missing, text=text, path=path)
+    views = get_view_table(data)
+    delta = base.iloc[[3]].copy()
+    delta["SH Notes"] = "Corrected note"
+    delta["Cardiac Anatomy Notes"] = np.nan
+    appended = base.iloc[[4]].assign(PatID="NEW", **{"SH Notes": "New patient"})
+    delta = prepare_frame(pd.concat([delta, appended], ignore_index=True))
+    new = apply_delta(data, delta)
+    assert new.text.fetch(3) == {"Cardiac Anatomy Notes": None, "SH Notes": "Corrected note"}
+    assert new.text.fetch(len(base))["SH Notes"] == "New patient"
+    assert data.text.fetch(3)["SH Notes"] != "Corrected note"
+    patched = get_view_table(new)
+    assert patched is not views and patched.view(3).sh_notes == "Corrected note"
+
+
+def _delta(base, rows, start, new_patients):
+    """Corrections to `rows` plus `new_patients` appended encounters, some for known patients"""
+    updated = base.iloc[rows].copy()
+    updated["CompUTI"] = 1
+    updated["SyndromeTerm"] = f"Syndrome {start}"
+    appended = base.iloc[-new_patients:].assign(PatID=[f"NEW{start + i}" for i in range(new_patients)])
+    appended.loc[appended.index[::2], "PatID"] = base["PatID"].iloc[rows[0]]
+    return prepare_frame(pd.concat([updated, appended], ignore_index=True))
+
+
+def test_patched_structures_match_rebuilds(tmp_path):
+    from cohort import build_cube, get_cohort_cube
+    from patient_index import PatientIndex, get_patient_index
+    from risk_engine import RiskScores, get_risk_scores
+    from terms import TermIndex, get_term_index
+    from view_model import ViewTable
+
+    path, base, data = _registry(tmp_path)
+    for build in (get_patient_index, get_risk_scores, get_term_index, get_cohort_cube, get_view_table):
+        build(data)
+    new = data
+    for i, rows in enumerate([[3, 40], [3, 199], [7]]):
+        previous = new
+        new = apply_delta(new, _delta(base, rows, 1000 * (i + 1), new_patients=6))
+        if i:
+            # Later deltas grow the previous version's spare rows instead of copying the column
+            assert np.shares_memory(new.df["CompUTI"].array._data, previous.df["CompUTI"].array._data)
+    df = new.df
+    assert len(df) > len(base) + 9  # each delta adds 3 patients and encounters for a known one
+
+    index, fresh = get_patient_index(new), PatientIndex(df)
+    np.testing.assert_array_equal(index.ids, fresh.ids)
+    np.testing.assert_array_equal(index.latest_rows(), fresh.latest_rows())
+    for pat_id in fresh.ids:
+        np.testing.assert_array_equal(index.rows(pat_id), fresh.rows(pat_id))
+    risk, fresh = get_risk_scores(new), RiskScores(df)
+    np.testing.assert_array_equal(risk.factors, fresh.factors)
+    np.testing.assert_array_equal(risk.scores, fresh.scores)
+    terms, fresh = get_term_index(new), TermIndex(df)
+    pd.testing.assert_series_equal(terms.counts().sort_index(), fresh.counts().sort_index())
+    for term in fresh.terms:
+        np.testing.assert_array_equal(terms.rows(term), fresh.rows(term))
+    assert list(terms.rows("Syndrome 1000")) == [40]  # row 3 was corrected again
+    for patched, rebuilt in zip(get_view_table(new)._columns, ViewTable(df)._columns):
+        np.testing.assert_array_equal(patched, rebuilt)
+    cube = build_cube(df, RiskScores(df).scores)
+    pd.testing.assert_frame_equal(get_cohort_cube(new), cube, check_dtype=False)
@@ -0,0 +1,28 @@
+# PatID -> encounter rows (patient_index.py)
+import numpy as np
+import pandas as pd
+
+from ingest import DeltaBatch
+from patient_index import PatientIndex
+
+
+def _frame(ids, dates):
+    return pd.DataFrame({"PatID": ids, "CardSurgDt": pd.to_datetime(dates)})
+
+
+def test_undated_encounter_is_not_latest():
+    index = PatientIndex(_frame(["A", "A", "A", "B"], ["2021-05-01", None, "2020-01-01", None]))
+    assert list(index.rows("A")) == [1, 2, 0]
+    assert index.latest_row("A") == 0
+    assert index.latest_row("B") == 3
+
+
+def test_patched_keeps_undated_first():
+    df = _frame(["A", "A"], ["2021-05-01", "2020-01-01"])
+    index = PatientIndex(df)
+    df = pd.concat([df, _frame(["A"], [None])], ignore_index=True)
+    batch = DeltaBatch(updated=np.array([], dtype=np.int64), appended=np.array([2]), old_rows=df.iloc[[]],
+                       rows=df.iloc[[2]])
+    patched = index.patched(df, batch)
+    assert list(patched.rows("A")) == [2, 1, 0]
+    assert patched.latest_row("A") == 0
@@ -0,0 +1,27 @@
+# Vectorized risk scores (risk_engine.py)
+import numpy as np
+import pandas as pd
+
+from data_loader import NO_SYNDROME, prepare_frame
+from risk_engine import RiskScores
+
+
+def _frame(**columns):
+    base = {"PatID": ["A", "B", "C", "D"], "Gender": 0, "Race": 1, "Ethnicity": 0, "Premature": 0}
+    return prepare_frame(pd.DataFrame({**base, **columns}))
+
+
+def test_syndrome_needs_a_named_term():
+    df = _frame(SyndromeTerm=["DiGeorge syndrome", NO_SYNDROME, None, "  "])
+    np.testing.assert_array_equal(RiskScores(df).scores, [1.5, 0.0, 0.0, 0.0])
+
+
+def test_missing_syndrome_column_scores_nothing():
+    # prepare_frame fills the column with a "Column Not Found" placeholder
+    np.testing.assert_array_equal(RiskScores(_frame()).scores, np.zeros(4))
+
+
+def test_missing_syndrome_column_is_no_syndrome():
+    assert not _frame()["Syndrome_Present_bool"].any()
+    flags = _frame(SyndromeTerm=["DiGeorge syndrome", NO_SYNDROME, None, "Column Not Found"])["Syndrome_Present_bool"]
+    assert list(flags) == [True, False, False, False]
@@ -0,0 +1,26 @@
+# Per-patient display records (view_model.py)
+import numpy as np
+
+from data_loader import LoadedData, _load_from_csv
+from synthetic_registry import generate
+from view_model import get_view_table, views_for
+
+
+def _data(tmp_path):
+    path = str(tmp_path / "registry.csv")
+    generate(20).to_csv(path, index=False)
+    df, missing = _load_from_csv(path)
+    return LoadedData(df=df, version="test", load_seconds=0.0, missing_columns=missing)
+
+
+def test_row_views_match_the_full_table(tmp_path):
+    data = _data(tmp_path)
+    rows = np.array([3, 0, 7])
+    before = views_for(data, rows).views(rows)  # table not built yet: formatted row by row
+    assert before == get_view_table(data).views(rows)
+
+
+def test_row_views_without_rows(tmp_path):
+    # e.g. the Compare page before warmup, when none of the entered PatIDs exist
+    views = views_for(_data(tmp_path), np.array([], dtype=np.int64))
+    assert len(views) == 0 and views.views([]) == []
@@ -0,0 +1,313 @@
+# theme.py
+# Boy/Girl dashboard themes: one memoized stylesheet, switched with a class toggle
+import functools
+
+THEMES = {
+    # Boy theme - Blue colors
+    "Boy": {
+        "bg": "#EFF4F8",
+        "panel": "#E8F1FA",
+        "border": "#B8D4E8",
+        "ink": "#1b1e28",
+        "pill": "#EAF3FF",
+        "pillborder": "#C7DBFF",
+        "hover": "#D6EBFF",
+        "selected": "#C7E3FF",
+        "card_shadow": "#d0e0f0",
+        "panel_border": "#A8C8E0",
+        "header_bg": "#A8C8E8",
+        "header_border": "#8BB5D8",
+        "iconbox1_border": "#7BB3D0",
+        "iconbox1_bg": "#C8E3F5",
+        "iconbox2_border": "#9DB8C8",
+        "iconbox2_bg": "#D0E8F5",
+        "iconbox3_border": "#6BA5C8",
+        "iconbox3_bg": "#B8DDF5",
+        "eventbox_shadow": "#d0e0f0"
+    },
+    # Girl theme - Pink colors (default)
+    "Girl": {
+        "bg": "#F6EFEF",
+        "panel": "#FBECEC",
+        "border": "#E1C1C3",
+        "ink": "#1b1e28",
+        "pill": "#EAF3FF",
+        "pillborder": "#C7DBFF",
+        "hover": "#EEF4FF",
+        "selected": "#FFE7EC",
+        "card_shadow": "#f6d8da",
+        "panel_border": "#e8c7cf",
+        "header_bg": "#f7c8d8",
+        "header_border": "#eab2c6",
+        "iconbox1_border": "#E7B6C0",
+        "iconbox1_bg": "#FFD7E2",
+        "iconbox2_border": "#F0C994",
+        "iconbox2_bg": "#FFE8C6",
+        "iconbox3_border": "#B6D7FF",
+        "iconbox3_bg": "#D0E9FF",
+        "eventbox_shadow": "#f6d8da"
+    },
+}
+DEFAULT_THEME = "Girl"
+
+# {palettes} is filled in by get_theme_css()
+STYLESHEET = """
+<style>
+
+/* Keep Streamlit header visible */
+#MainMenu {visibility: visible !important;}
+.block-container{padding-top:6px !important; max-width:1320px;}
+
+.block-container {
+        padding-top: 3rem !important;
+    }
+
+{palettes}
+[data-testid="stAppViewContainer"]{background:var(--bg);}
+h1,h2,h3,h4,p,div,span{color:var(--ink);}
+
+/* Cards & layout bits */
+.card{background:#fff;border:2px solid var(--border);border-radius:16px;padding:12px 14px;box-shadow:0 2px 0 var(--card-shadow) inset;margin-bottom:12px;}
+.pinkpanel{background:var(--panel);border:2px solid var(--panel-border);border-radius:10px;overflow:hidden;}
+.headerpink{background:var(--header-bg);border-bottom:2px solid var(--header-border);padding:10px 14px;font-weight:900;text-align:center;}
+.pill-blue{display:inline-block;padding:6px 14px;border-radius:999px;background:#d6e7ff;border:1px solid #bcd6ff;font-weight:900;}
+.iconrow{display:flex;gap:14px;justify-content:center;padding:12px 0 6px;}
+.iconbox, .iconbox2, .iconbox3{
+  width:70px;height:70px;display:flex;align-items:center;justify-content:center;border-radius:12px;font-size:36px;
+}
+.iconbox{border:2px solid var(--iconbox1-border);background:var(--iconbox1-bg);}
+.iconbox2{border:2px solid var(--iconbox2-border);background:var(--iconbox2-bg);}
+.iconbox3{border:2px solid var(--iconbox3-border);background:var(--iconbox3-bg);}
+.sel{ outline:3px solid #3B82F6; box-shadow:0 0 0 2px #93C5FD inset; }
+
+.right{text-align:right;} .center{text-align:center;} .red{color:#C6002A;font-weight:900;}
+/* Label on the left, value on the right (intervals, printed summaries) */
+.field{display:flex;justify-content:space-between;gap:12px;padding:3px 0;}
+.field span{color:#555;}
+
+/* Timeline */
+.timelinewrap{padding:12px;}
+.vert{position:relative;height:520px;margin:0 24px;}
+.vert:before{content:"";position:absolute;left:50%;top:18px;bottom:18px;width:2px;background:#111;transform:translateX(-50%);}
+.vert:after{content:"";position:absolute;left:40px;right:40px;top:6px;height:2px;background:#111;}
+.hbot{position:absolute;left:40px;right:40px;bottom:6px;height:2px;background:#111;}
+.tick{position:absolute;left:50%;transform:translateX(-50%);}
+.tick .dot{position:absolute;left:-4px;top:-4px;width:8px;height:8px;background:#111;border-radius:50%;}
+.tick .lbl{position:absolute;left:20px;top:-10px;width:230px;font-weight:700;}
+
+
+/* Event-look boxes */
+.eventbox{border:2px solid var(--border);border-radius:16px;padding:12px;background:#fff;box-shadow:0 2px 0 var(--eventbox-shadow) inset;}
+.eventtitle{font-weight:900;margin:10px 0 6px;}
+.addbtn{display:inline-block;background:#fff;border:2px solid var(--border);border-radius:999px;padding:8px 20px;font-weight:900;box-shadow:0 2px 0 var(--eventbox-shadow) inset;}
+
+/* Side-by-side patient comparison */
+.comparewrap{overflow-x:auto;}
+.compare{border-collapse:separate;border-spacing:8px 0;}
+.compare th, .compare td{vertical-align:top;padding:6px 8px;border-bottom:1px solid var(--border);}
+.compare thead th{background:var(--header-bg);border-radius:10px 10px 0 0;font-weight:900;text-align:center;}
+.compare tbody th{text-align:left;white-space:nowrap;font-weight:900;}
+.compare td{min-width:280px;max-width:320px;background:#fff;font-weight:700;}
+
+/* ===== DROPDOWN STYLES - HIGH CONTRAST WHITE BACKGROUND ===== */
+.stSelectbox div[data-baseweb="select"] > div,
+.stMultiSelect div[data-baseweb="select"] > div{
+  background:#FFFFFF !important; 
+  background-color:#FFFFFF !important; 
+  color:#1B1E28 !important; 
+  border-color:#C4C4C4 !important;
+  min-height:44px; 
+  font-weight:800; 
+  border-width:2px !important;
+}
+.stSelectbox svg, .stMultiSelect svg{ 
+  fill:#1B1E28 !important; 
+  color:#1B1E28 !important; 
+}
+div[data-baseweb="select"] input{ 
+  color:#1B1E28 !important; 
+  font-weight:800; 
+  background:#FFFFFF !important;
+  background-color:#FFFFFF !important;
+}
+div[data-baseweb="select"] input::placeholder{ 
+  color:#8A8A8A !important; 
+}
+
+/* Dropdown menu popover - FORCE WHITE BACKGROUND */
+div[data-baseweb="popover"]{ 
+  z-index: 9999 !important; 
+  background:#FFFFFF !important;
+  background-color:#FFFFFF !important;
+}
+div[data-baseweb="popover"] > div{
+  background:#FFFFFF !important;
+  background-color:#FFFFFF !important;
+}
+div[data-baseweb="menu"]{
+  background:#FFFFFF !important; 
+  background-color:#FFFFFF !important;
+  color:#1B1E28 !important; 
+  border:2px solid #C4C4C4 !important;
+  border-radius:12px !important; 
+  box-shadow:0 12px 30px rgba(0,0,0,0.25) !important;
+}
+div[data-baseweb="menu"] ul{ 
+  background:#FFFFFF !important; 
+  background-color:#FFFFFF !important;
+  padding:6px !important; 
+}
+div[data-baseweb="menu"] li, 
+div[data-baseweb="menu"] [role="option"],
+div[data-baseweb="menu"] > ul > li,
+div[data-baseweb="menu"] ul li{
+  background:#FFFFFF !important; 
+  background-color:#FFFFFF !important;
+  color:#1B1E28 !important; 
+  font-weight:900 !important;
+  font-size:15px !important; 
+  padding:10px 12px !important; 
+  border-radius:8px !important;
+}
+div[data-baseweb="menu"] li:hover, 
+div[data-baseweb="menu"] [role="option"]:hover,
+div[data-baseweb="menu"] > ul > li:hover,
+div[data-baseweb="menu"] ul li:hover{
+  background:#E8E8E8 !important; 
+  background-color:#E8E8E8 !important;
+  color:#1B1E28 !important;
+}
+div[data-baseweb="menu"] li[aria-selected="true"], 
+div[data-baseweb="menu"] [role="option"][aria-selected="true"],
+div[data-baseweb="menu"] > ul > li[aria-selected="true"],
+div[data-baseweb="menu"] ul li[aria-selected="true"]{
+  background:#3B82F6 !important; 
+  background-color:#3B82F6 !important;
+  color:#FFFFFF !important; 
+  box-shadow: inset 4px 0 0 #1E40AF;
+}
+
+/* Force text color in dropdown options - override ALL nested elements */
+div[data-baseweb="menu"] li *,
+div[data-baseweb="menu"] [role="option"] *,
+div[data-baseweb="menu"] span,
+div[data-baseweb="menu"] div,
+div[data-baseweb="menu"] p,
+div[data-baseweb="menu"] li span,
+div[data-baseweb="menu"] li div{
+  color:#1B1E28 !important;
+}
+
+/* Override any dark theme styles on popover children - but preserve hover/selected */
+div[data-baseweb="popover"] > div{
+  background-color:#FFFFFF !important;
+}
+div[data-baseweb="popover"] ul{
+  background-color:#FFFFFF !important;
+}
+div[data-baseweb="popover"] li:not(:hover):not([aria-selected="true"]){
+  background-color:#FFFFFF !important;
+  color:#1B1E28 !important;
+}
+
+/* Target BaseWeb select dropdown specifically */
+[data-baseweb="select"] [role="listbox"],
+[data-baseweb="select"] [role="option"]{
+  background:#FFFFFF !important;
+  background-color:#FFFFFF !important;
+  color:#1B1E28 !important;
+}
+
+/* Multiselect tags */
+.stMultiSelect [data-baseweb="tag"]{
+  background:#3B82F6 !important; 
+  background-color:#3B82F6 !important;
+  color:#FFFFFF !important; 
+  border-radius:12px !important; 
+  font-weight:900 !important;
+}
+
+.stMultiSelect [data-baseweb="tag"]{
+  background:#3B82F6 !important; 
+  background-color:#3B82F6 !important;
+  color:#FFFFFF !important; 
+  border-radius:12px !important; 
+  font-weight:900 !important;
+}
+
+/* ===== FIX FOR DISABLED TEXT BOXES (Dark/Light Mode) ===== */
+[data-testid="stTextInput"] input:disabled {
+    background-color: #FFFFFF !important;
+    color: #1B1E28 !important;
+    -webkit-text-fill-color: #1B1E28 !important;
+    font-weight: 800 !important;
+    border-color: #C4C4C4 !important;
+    border-width: 2px !important;
+}
+
+
+/* ===== FIX FOR DISABLED TEXT AREA (Dark/Light Mode) ===== */
+[data-testid="stTextArea"] textarea:disabled {
+    background-color: #FFFFFF !important;
+    color: #1B1E28 !important;
+    -webkit-text-fill-color: #1B1E28 !important;
+    font-weight: 800 !important;
+    border-color: #C4C4C4 !important;
+    border-width: 2px !important;
+}
+</style>
+"""
+
+
+def _palette(name):
+    colors = THEMES[name]
+    return "".join(f"--{key.replace('_', '-')}:{value};" for key, value in colors.items())
+
+
+@functools.lru_cache(maxsize=None)
+def get_theme_css():
+    """The whole dashboard stylesheet, built once per process.
+
+    Both palettes are CSS variables; the Girl palette is the default and the Boy
+    palette applies while a `.theme-boy` marker is on the page (see theme_marker).
+    """
+    palettes = (
+        f":root{{{_palette(DEFAULT_THEME)}}}\n"
+        f":root:has(.theme-boy){{{_palette('Boy')}}}"
+    )
+    return STYLESHEET.replace("{palettes}", palettes)
+
+
+# Layout of exported summary cards (components.summary_card_html), one per printed page
+PRINT_RULES = """
+<style>
+@page{size:A4 landscape;margin:10mm;}
+body{font-family:sans-serif;margin:0;}
+.summary{background:var(--bg);padding:12px 16px;break-after:page;-webkit-print-color-adjust:exact;print-color-adjust:exact;}
+.summary h2{margin:0 0 8px;font-weight:900;}
+.summary h2 small{margin-left:16px;font-size:16px;font-weight:700;color:#555;}
+.summaryrisk{display:flex;align-items:center;gap:24px;}
+.summarycols{display:grid;grid-template-columns:1.1fr 1.2fr 1.2fr;gap:16px;}
+</style>
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def get_print_css():
+    """Stylesheet for exported summaries: every card carries its own palette, since
+    one document holds girls and boys alike"""
+    palettes = (
+        f".summary{{{_palette(DEFAULT_THEME)}}}\n"
+        f".summary.theme-boy{{{_palette('Boy')}}}"
+    )
+    return STYLESHEET.replace("{palettes}", palettes) + PRINT_RULES
+
+
+def theme_marker(sex):
+    """Tiny element that flips the page to the patient's theme"""
+    return '<div class="theme-boy"></div>' if sex == "Boy" else '<div class="theme-girl"></div>'
+
+
+if __name__ == "__main__":
+    # Per-rerun CSS payload: before this module team2.py sent a full stylesheet twice
+    print(f"stylesheet: {len(get_theme_css().encode())} bytes, marker: {len(theme_marker('Boy').encode())} bytes")
@@ -0,0 +1,248 @@
+# view_model.py
+# Display-ready, immutable per-patient records built once per data version
+# (and patched row-wise when a delta export is ingested)
+import dataclasses
+
+import numpy as np
+import pandas as pd
+
+from data_loader import (ABNORMALITY_COLUMNS, ABSENT_TERMS, DISCHARGE_COLUMN, format_date, format_days, grow,
+                         register_patcher)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class PatientView:
+    """Everything the dashboard panels print for one encounter, already formatted"""
+    pat_id: str
+    sex: str
+    premature: str
+    race: str
+    ethnicity: str
+    dob: str
+    age_at_surgery: str
+    shunt_size: float  # NaN when not recorded; the shunt scale formats it
+    cardiac_arrest_date: str
+    cardiac_notes: str
+    sh_notes: str
+    sepsis_date: str
+    clabsi: str
+    uti: str
+    wound_infection: str
+    syndrome_present: bool
+    syndrome_label: str
+    fetal_drug_exposure: str
+    abnormalities: str
+    surgery_date: str
+    bleed_date: str
+    discharge_date: str
+    # Days from surgery to each event (data_loader.INTERVAL_COLUMNS), formatted
+    days_to_bleed: str
+    days_to_sepsis: str
+    days_to_discharge: str
+    # Raw event times (ns since epoch, None if missing) for placing timeline ticks
+    surgery_ns: object
+    bleed_ns: object
+    sepsis_ns: object
+    discharge_ns: object
+
+    @property
+    def timeline_events(self):
+        """(label, date text, ns) tuples, latest event first - see components.timeline_html"""
+        return (
+            ("Discharge", self.discharge_date, self.discharge_ns),
+            ("Sepsis Found and Treated", self.sepsis_date, self.sepsis_ns),
+            ("Bleed Present", self.bleed_date, self.bleed_ns),
+            ("Surgery Completion", self.surgery_date, self.surgery_ns),
+        )
+
+    @property
+    def intervals(self):
+        """(label, formatted days) from surgery to each later event"""
+        return (
+            ("Surgery to bleed", self.days_to_bleed),
+            ("Surgery to sepsis", self.days_to_sepsis),
+            ("Surgery to discharge", self.days_to_discharge),
+        )
+
+
+FIELDS = [f.name for f in dataclasses.fields(PatientView)]
+EVENT_FIELDS = {name for name in FIELDS if name.endswith("_ns")}
+
+
+#__________________Vectorized formatting__________________
+
+def _format_unique(df, col, fmt=str, default="_"):
+    """Format each distinct value once and broadcast back to the rows.
+
+    Missing values (and a missing column) become `default`. Rows sharing a value
+    also share one string object, which keeps the table small.
+    """
+    if col not in df.columns:
+        return np.full(len(df), default, dtype=object)
+    codes, uniques = pd.factorize(df[col])
+    labels = np.array([fmt(u) for u in uniques] + [default], dtype=object)
+    return labels[codes]
+
+
+def _yes_no(df, col):
+    if col not in df.columns:
+        return np.full(len(df), "No", dtype=object)
+    return np.where((df[col] == 1).fillna(False).to_numpy(dtype=bool), "Yes", "No").astype(object)
+
+
+NAT_NS = np.iinfo(np.int64).min  # how NaT looks as int64
+
+
+def _event_ns(df, col):
+    # Kept as int64 (NaT -> NAT_NS) instead of a column of Python ints
+    if col not in df.columns:
+        return np.full(len(df), NAT_NS, dtype=np.int64)
+    return df[col].to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def _abnormalities(df):
+    """Comma-joined NCAA1-5 / ChromAbTerm terms, skipping placeholders"""
+    joined = np.full(len(df), "", dtype=object)
+    for col in ABNORMALITY_COLUMNS:
+        terms = _format_unique(df, col, default="")
+        terms[pd.Series(terms).isin(ABSENT_TERMS).to_numpy()] = ""
+        sep = np.where((joined != "") & (terms != ""), ", ", "")
+        joined = joined + sep + terms
+    joined[joined == ""] = "None reported"
+    return joined
+
+
+def build_columns(df):
+    """Formatted column arrays for every PatientView field, aligned with the frame rows"""
+    def dates(col, default="N/A"):
+        return _format_unique(df, col, format_date, default)
+
+    shunt = df["Shunt Size"].to_numpy(dtype=np.float64, na_value=np.nan) if "Shunt Size" in df.columns else np.full(len(df), np.nan)
+    syndrome = df["Syndrome_Present_bool"].to_numpy(dtype=bool) if "Syndrome_Present_bool" in df.columns else np.zeros(len(df), dtype=bool)
+    columns = {
+        "pat_id": df["PatID"].to_numpy(dtype=object),
+        "sex": _format_unique(df, "Gender_label"),
+        "premature": _format_unique(df, "Premature_label"),
+        "race": _format_unique(df, "Race_label"),
+        "ethnicity": _format_unique(df, "Ethnicity_label"),
+        "dob": dates("DOB", "_"),
+        "age_at_surgery": _format_unique(df, "AgeAtSurgeryDays"),
+        "shunt_size": shunt,
+        "cardiac_arrest_date": dates("CardArrestDtTm"),
+        "cardiac_notes": _format_unique(df, "Cardiac Anatomy Notes", default="N/A"),
+        "sh_notes": _format_unique(df, "SH Notes", default="N/A"),
+        "sepsis_date": dates("CompSepsisDt"),
+        "clabsi": _yes_no(df, "CompCLABSI"),
+        "uti": _yes_no(df, "CompUTI"),
+        "wound_infection": _yes_no(df, "CompWoundInf"),
+        "syndrome_present": syndrome,
+        "syndrome_label": np.where(syndrome, "Yes", "No").astype(object),
+        "fetal_drug_exposure": _format_unique(df, "Fetal_Drug_Exposure_label", default="No"),
+        "abnormalities": _abnormalities(df),
+        "surgery_date": dates("CardSurgDt"),
+        "bleed_date": dates("CompReopBleedDtTm"),
+        "discharge_date": dates(DISCHARGE_COLUMN),
+        "days_to_bleed": _format_unique(df, "DaysToBleed", format_days, "N/A"),
+        "days_to_sepsis": _format_unique(df, "DaysToSepsis", format_days, "N/A"),
+        "days_to_discharge": _format_unique(df, "DaysToDischarge", format_days, "N/A"),
+        "surgery_ns": _event_ns(df, "CardSurgDt"),
+        "bleed_ns": _event_ns(df, "CompReopBleedDtTm"),
+        "sepsis_ns": _event_ns(df, "CompSepsisDt"),
+        "discharge_ns": _event_ns(df, DISCHARGE_COLUMN),
+    }
+    return [columns[name] for name in FIELDS]
+
+
+def _scalar(name, value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if name in EVENT_FIELDS and value == NAT_NS:
+        return None
+    return value
+
+
+# Note fields the stream loader leaves on disk (data_loader.LazyText)
+LAZY_FIELDS = {"cardiac_notes": "Cardiac Anatomy Notes", "sh_notes": "SH Notes"}
+
+
+class ViewTable:
+    """Column-wise store of formatted fields; `view(row)` is a handful of array reads
+    (plus one small file read per view when the notes are kept on disk)"""
+    __slots__ = ("_columns", "_text")
+
+    def __init__(self, df, text=None):
+        # Built with spare rows (data_loader.grow), so the first ingested delta appends
+        # in place instead of copying every object column on the ingest path
+        self._columns = [grow(col, col[:0]) for col in build_columns(df)]
+        self._text = text
+
+    def __len__(self):
+        return len(self._columns[0])
+
+    def _record(self, i):
+        return PatientView(*(_scalar(name, col[i]) for name, col in zip(FIELDS, self._columns)))
+
+    def view(self, row):
+        return self._with_notes(self._record(row), row)
+
+    def views(self, rows):
+        """Views for several rows; each column is gathered once for the whole batch"""
+        rows = np.asarray(rows, dtype=np.int64)
+        gathered = [col[rows] for col in self._columns]
+        return [self._with_notes(PatientView(*(_scalar(name, col[i]) for name, col in zip(FIELDS, gathered))), row)
+                for i, row in enumerate(rows.tolist())]
+
+    def _with_notes(self, view, row):
+        if self._text is None:
+            return view
+        notes = self._text.fetch(row)
+        return dataclasses.replace(view, **{
+            field: notes[col] for field, col in LAZY_FIELDS.items() if notes.get(col) is not None})
+
+    def column(self, name):
+        return self._columns[FIELDS.index(name)]
+
+    def patched(self, batch, text=None):
+        """Copy with only the batch's updated and appended rows re-formatted (in place, see data_loader.grow)"""
+        fresh = build_columns(batch.rows)
+        new = ViewTable.__new__(ViewTable)
+        new._text = text
+        new._columns = []
+        split = len(batch.updated)
+        for col, values in zip(self._columns, fresh):
+            col = grow(col, values[split:])
+            col[batch.updated] = values[:split]
+            new._columns.append(col)
+        return new
+
+
+class RowViews(ViewTable):
+    """The same `view(row)` for a handful of rows, formatted on the spot - what the
+    patient panels use while the full table is still being built (warmup.py)"""
+    __slots__ = ("_positions",)
+
+    def __init__(self, df, rows, text=None):
+        rows = [int(r) for r in rows]
+        # One-row slices are views; a list take would copy from every column of the frame
+        super().__init__(pd.concat([df.iloc[r:r + 1] for r in rows]) if rows else df.iloc[:0], text)
+        self._positions = {row: i for i, row in enumerate(rows)}
+
+    def view(self, row):
+        return self._with_notes(self._record(self._positions[int(row)]), row)
+
+    def views(self, rows):
+        return [self.view(row) for row in rows]
+
+
+def views_for(data, rows):
+    """Full table once it is built, otherwise a RowViews over `rows` (never blocks on the build)"""
+    if data.is_built("view_table"):
+        return get_view_table(data)
+    return RowViews(data.df, rows, data.text)
+
+
+def get_view_table(data):
+    return data.derived("view_table", lambda d: ViewTable(d.df, d.text))
+
+
+register_patcher("view_table", lambda views, old, new, batch: views.patched(batch, new.text))
@@ -0,0 +1,108 @@
+# warmup.py
+# Background precomputation: cohort-wide structures are built off the render path,
+# so the first patient is on screen before the whole registry is prepared
+import logging
+import threading
+import time
+
+import streamlit as st
+
+from cohort import get_cohort_cube, get_patient_codes, get_surgery_dates
+from instrumentation import record_duration
+from risk_engine import get_risk_scores
+from terms import get_term_index
+from view_model import get_view_table
+
+logger = logging.getLogger(__name__)
+
+# (derived name, label, builder) in build order. The patient index and search are
+# not here: the picker needs them before anything can be shown.
+STEPS = [
+    ("view_table", "Display labels", get_view_table),
+    ("risk_scores", "Risk scores", get_risk_scores),
+    ("cohort_cube", "Cohort aggregates", get_cohort_cube),
+    ("term_index", "Abnormality index", get_term_index),
+    ("surgery_dates", "Surgery date index", get_surgery_dates),
+    ("patient_codes", "Patient counts", get_patient_codes),
+]
+POLL_SECONDS = 1.0
+
+
+class Warmup:
+    """One background thread per data version running STEPS in order.
+
+    Builders go through `data.derived`, so a session that needs a structure
+    before the thread reaches it builds it itself and the thread finds it done.
+    """
+
+    def __init__(self, data, started):
+        self.data = data
+        self.started = started
+        self.seconds = {}  # name -> build time in the thread
+        self.errors = {}
+        self.ready_seconds = None  # `started` -> every step finished
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"warmup-{data.version[:8]}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        for name, label, build in STEPS:
+            start = time.perf_counter()
+            try:
+                build(self.data)
+            except Exception as exc:
+                # Left unbuilt: the page that needs it builds it (and shows the error) itself
+                logger.exception("Warmup step %s failed", name)
+                self.errors[name] = exc
+            self.seconds[name] = time.perf_counter() - start
+        self.ready_seconds = time.perf_counter() - self.started
+        record_duration("fully_ready", self.ready_seconds)
+        self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def ready(self, *names):
+        return all(self.data.is_built(name) for name in names)
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def progress(self):
+        """(fraction done, label of the step being built or None)"""
+        built = [name for name, _, _ in STEPS if self.data.is_built(name) or name in self.errors]
+        pending = [label for name, label, _ in STEPS if name not in built]
+        return len(built) / len(STEPS), (pending[0] if pending else None)
+
+
+def start_warmup(data, started):
+    """The warmup of this data version, started on first call (`started` = perf_counter
+    at the start of the run that asked, so `fully_ready` compares with `first_paint`)"""
+    return data.derived("warmup", lambda d: Warmup(d, started))
+
+
+def _progress(warmup):
+    if warmup.done:
+        # Placeholders elsewhere on the page are swapped for the real panels
+        st.rerun()
+    fraction, label = warmup.progress()
+    st.progress(fraction, text=f"Preparing registry: {label}…")
+
+
+def progress_panel(warmup, container=None):
+    """Progress bar while the warmup runs; polls, then reruns the page once it is done"""
+    with container or st.sidebar:
+        if warmup.done:
+            if warmup.errors:
+                st.warning(f"Background preparation failed for: {', '.join(warmup.errors)}")
+            return
+        # run_every only while warming up, so finished sessions do not keep polling
+        st.fragment(_progress, run_every=POLL_SECONDS)(warmup)
+
+
+def placeholder(warmup, what):
+    """Stand-in for a panel that needs structures the warmup has not built yet"""
+    fraction, label = warmup.progress()
+    building = f", building {label.lower()}" if label else ""
+    st.info(f"{what} will appear once the registry is prepared ({fraction:.0%}{building}).")